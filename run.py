@@ -1,14 +1,49 @@
-import sys
+import argparse
+import asyncio
 
-from src.orchestrator.main import run_pipeline
+from src.orchestrator.main import arun_batch, run_batch, run_pipeline
 
 
 def main() -> None:
-    if len(sys.argv) < 2:
-        user_query = "Analyze ROAS drop"
+    parser = argparse.ArgumentParser(description="Agentic Facebook performance analyst")
+    parser.add_argument("user_query", nargs="?", default="Analyze ROAS drop")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument(
+        "--batch",
+        metavar="QUERIES_JSONL",
+        help="run every query in a JSONL file against one loaded dataset",
+    )
+    parser.add_argument("--output-dir", help="batch output directory (default: paths.batch_dir)")
+    parser.add_argument(
+        "--async",
+        dest="run_async",
+        action="store_true",
+        help="run batch queries concurrently on one event loop",
+    )
+    parser.add_argument("--concurrency", type=int, help="queries in flight with --async (default: concurrency.max_queries)")
+    parser.add_argument("--serve", action="store_true", help="keep the data loaded and answer queries over HTTP")
+    parser.add_argument("--host", help="--serve address (default: service.host)")
+    parser.add_argument("--port", type=int, help="--serve port (default: service.port)")
+    parser.add_argument("--socket", help="--serve on this Unix socket instead of host / port")
+    args = parser.parse_args()
+
+    if args.serve:
+        from src.orchestrator.service import serve
+
+        serve(args.config, host=args.host, port=args.port, socket_path=args.socket)
+    elif args.batch and args.run_async:
+        asyncio.run(
+            arun_batch(
+                args.batch,
+                config_path=args.config,
+                output_dir=args.output_dir,
+                max_concurrent_queries=args.concurrency,
+            )
+        )
+    elif args.batch:
+        run_batch(args.batch, config_path=args.config, output_dir=args.output_dir)
     else:
-        user_query = sys.argv[1]
-    run_pipeline(user_query)
+        run_pipeline(args.user_query, config_path=args.config)
 
 
 if __name__ == "__main__":
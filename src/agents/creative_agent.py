@@ -1,10 +1,13 @@
+import asyncio
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
 import pandas as pd
 import logging
 
 from src.utils.logging_utils import log_event
+from src.utils.memo import JsonMemo, memo_key
+from src.utils.tracing import span
 
 
 @dataclass
@@ -16,30 +19,87 @@ class CreativeRecommendation:
     new_primary_text: str
     new_cta: str
     rationale: str
+    # how many underperforming rows share this creative and the dates they span
+    row_count: int = 1
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+
+
+CREATIVE_COLUMNS: List[str] = [
+    "campaign_name",
+    "adset_name",
+    "old_message",
+    "new_headline",
+    "new_primary_text",
+    "new_cta",
+    "rationale",
+    "row_count",
+    "first_date",
+    "last_date",
+]
+
+# one recommendation per unique creative when deduplicating
+CREATIVE_KEY: List[str] = ["campaign_name", "adset_name", "old_message", "audience_type"]
+
+# generated text fields; these are what the memo stores per creative key
+GENERATED_COLUMNS: List[str] = ["new_headline", "new_primary_text", "new_cta", "rationale"]
+
+# bump when the generation logic changes so memoised output is not reused
+GENERATOR_VERSION = "template-v1"
+
+DEFAULT_MESSAGE = "Our new collection is here."
+NEW_CTA = "Shop now"
+RATIONALE = (
+    "Existing message appears to underperform on CTR/ROAS. "
+    "Headline emphasises urgency, body text adds value, CTA is explicit."
+)
+
+
+def _text_column(df: pd.DataFrame, column: str, default: str) -> pd.Series:
+    """`str(row.get(column, default))` for every row, as one column operation."""
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[column].astype(str).astype(object)
+
+
+def _date_text(value: Any) -> Optional[str]:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
 
 
 class CreativeAgent:
-    def __init__(self, logger: logging.Logger, low_ctr_threshold: float, low_roas_threshold: float) -> None:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        low_ctr_threshold: float,
+        low_roas_threshold: float,
+        dedupe: bool = False,
+        memo_path: Optional[str] = None,
+        memo_max_entries: int = 10000,
+    ) -> None:
         self.logger = logger
         self.low_ctr_threshold = low_ctr_threshold
         self.low_roas_threshold = low_roas_threshold
+        self.dedupe = dedupe
+        self.memo = JsonMemo(memo_path, max_entries=memo_max_entries) if memo_path else None
 
     def _generate_for_row(self, row: pd.Series) -> CreativeRecommendation:
+        """Single-row reference for `generate_frame`, which must match it."""
         base_message = str(row.get("creative_message", "")).strip()
         if not base_message:
-            base_message = "Our new collection is here."
+            base_message = DEFAULT_MESSAGE
 
         campaign_name = str(row.get("campaign_name", "Unknown Campaign"))
         adset_name = str(row.get("adset_name", "Unknown Adset"))
 
         new_headline = f"{campaign_name}: Limited time offer"
         new_primary_text = f"{base_message} Now with special pricing for {row.get('audience_type', 'your audience')}."
-        new_cta = "Shop now"
+        new_cta = NEW_CTA
 
-        rationale = (
-            "Existing message appears to underperform on CTR/ROAS. "
-            "Headline emphasises urgency, body text adds value, CTA is explicit."
-        )
+        rationale = RATIONALE
 
         return CreativeRecommendation(
             campaign_name=campaign_name,
@@ -49,21 +109,187 @@ class CreativeAgent:
             new_primary_text=new_primary_text,
             new_cta=new_cta,
             rationale=rationale,
+            first_date=_date_text(row.get("date")),
+            last_date=_date_text(row.get("date")),
         )
 
-    def generate(self, df: pd.DataFrame) -> List[CreativeRecommendation]:
-        mask_low = (df["ctr"] < self.low_ctr_threshold) | (df["roas"] < self.low_roas_threshold)
-        candidates = df[mask_low]
+    def _identities(self, candidates: pd.DataFrame) -> pd.DataFrame:
+        """Creative identity columns (plus date) for each candidate row, as text."""
+        base_message = _text_column(candidates, "creative_message", "").str.strip()
+        identities = pd.DataFrame(
+            {
+                "campaign_name": _text_column(candidates, "campaign_name", "Unknown Campaign"),
+                "adset_name": _text_column(candidates, "adset_name", "Unknown Adset"),
+                "old_message": base_message.mask(base_message == "", DEFAULT_MESSAGE),
+                "audience_type": _text_column(candidates, "audience_type", "your audience"),
+            }
+        )
+        identities["date"] = candidates["date"] if "date" in candidates.columns else None
+        return identities
+
+    @staticmethod
+    def _render(identities: pd.DataFrame) -> pd.DataFrame:
+        """Generated text for each identity row, as whole-column string operations."""
+        return pd.DataFrame(
+            {
+                "new_headline": identities["campaign_name"] + ": Limited time offer",
+                "new_primary_text": identities["old_message"]
+                + " Now with special pricing for "
+                + identities["audience_type"]
+                + ".",
+                "new_cta": NEW_CTA,
+                "rationale": RATIONALE,
+            },
+            index=identities.index,
+            columns=GENERATED_COLUMNS,
+        )
+
+    def _render_memoized(self, identities: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+        """`_render` backed by the persistent memo; returns (texts, memo hits)."""
+        assert self.memo is not None
+        keys = [
+            memo_key([GENERATOR_VERSION, *parts])
+            for parts in identities[CREATIVE_KEY].itertuples(index=False, name=None)
+        ]
+        cached = [self.memo.get(k) for k in keys]
+        hit_mask = pd.Series([c is not None for c in cached], index=identities.index)
+
+        texts = pd.DataFrame(index=identities.index, columns=GENERATED_COLUMNS, dtype=object)
+        if hit_mask.any():
+            texts.loc[hit_mask] = [
+                [c[col] for col in GENERATED_COLUMNS] for c in cached if c is not None
+            ]
+        if (~hit_mask).any():
+            fresh = self._render(identities[~hit_mask])
+            texts.loc[~hit_mask] = fresh.to_numpy()
+            for key, record in zip(
+                (k for k, c in zip(keys, cached) if c is None), fresh.to_dict(orient="records")
+            ):
+                self.memo.put(key, record)
+            self.memo.save()
+        return texts, int(hit_mask.sum())
+
+    def generate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Recommendations for low CTR / ROAS rows as a frame.
+
+        Builds every text column with whole-column string operations instead
+        of one `pd.Series` and dataclass per row; the values are identical to
+        `_generate_for_row`. Columns are `CREATIVE_COLUMNS`; the index is the
+        label of the input row each recommendation was first seen on.
+
+        With `dedupe`, rows are grouped by creative identity (`CREATIVE_KEY`)
+        first, so each creative that ran on several dates is generated once,
+        with `row_count` and the first / last affected date.
+        """
+        with span("creative.generate", agent="CreativeAgent", input_rows=len(df)) as sp:
+            frame, rows, memo_hits = self._generate_frame(df)
+            sp.rows = len(frame)
 
-        recs = [self._generate_for_row(row) for _, row in candidates.iterrows()]
         log_event(
             self.logger,
             agent="CreativeAgent",
             stage="generate",
             event="generated_creatives",
-            extra={"count": len(recs)},
+            extra={
+                "count": len(frame),
+                "rows": rows,
+                "deduplicated": self.dedupe,
+                "memo_hits": memo_hits,
+            },
+        )
+        return frame
+
+    def _generate_frame(self, df: pd.DataFrame) -> tuple[pd.DataFrame, int, int]:
+        """`generate_frame` body; returns (frame, low rows, memo hits)."""
+        mask_low = (df["ctr"] < self.low_ctr_threshold) | (df["roas"] < self.low_roas_threshold)
+        identities = self._identities(df[mask_low])
+
+        if self.dedupe:
+            identities = (
+                identities.assign(source_row=identities.index)
+                .groupby(CREATIVE_KEY, sort=False)
+                .agg(
+                    row_count=("old_message", "size"),
+                    first_date=("date", "min"),
+                    last_date=("date", "max"),
+                    source_row=("source_row", "first"),
+                )
+                .reset_index()
+                .set_index("source_row")
+            )
+        else:
+            identities = identities.assign(row_count=1, first_date=identities["date"], last_date=identities["date"])
+        if not identities.index.is_unique:
+            identities = identities.reset_index(drop=True)
+        identities.index.name = None
+
+        memo_hits = 0
+        if self.memo is not None and self.dedupe:
+            texts, memo_hits = self._render_memoized(identities)
+        else:
+            texts = self._render(identities)
+
+        frame = pd.concat([identities, texts], axis=1)
+        frame["first_date"] = frame["first_date"].map(_date_text).astype(object)
+        frame["last_date"] = frame["last_date"].map(_date_text).astype(object)
+        frame["row_count"] = frame["row_count"].astype(int)
+        return frame[CREATIVE_COLUMNS], int(mask_low.sum()), memo_hits
+
+    def merge_frames(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        """One `generate_frame` result from the results of disjoint slices
+        of the same rows (labelled as in the whole frame, as shards are).
+
+        Recommendations come back in source-row order; with `dedupe`, a
+        creative seen in several slices is merged into one, with the row
+        counts added and the widest date span. `new_primary_text` carries
+        the audience, so the grouping is `CREATIVE_KEY`.
+        """
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame(columns=CREATIVE_COLUMNS)
+        frame = pd.concat(frames).sort_index(kind="stable")
+        if not self.dedupe or len(frames) == 1:
+            return frame
+        identity = ["campaign_name", "adset_name", "old_message", "new_primary_text"]
+        spans = {"row_count": "sum", "first_date": "min", "last_date": "max"}
+        merged = (
+            frame.assign(source_row=frame.index)
+            .groupby(identity, sort=False, dropna=False)
+            .agg(
+                **{c: (c, spans.get(c, "first")) for c in CREATIVE_COLUMNS if c not in identity},
+                source_row=("source_row", "first"),
+            )
+            .reset_index()
+            .set_index("source_row")
         )
-        return recs
+        merged.index.name = None
+        return merged[CREATIVE_COLUMNS]
+
+    def generate(self, df: pd.DataFrame) -> List[CreativeRecommendation]:
+        return self.from_frame(self.generate_frame(df))
+
+    async def agenerate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Async `generate_frame`; the pandas work runs in a worker thread so
+        the event loop keeps serving other queries."""
+        return await asyncio.to_thread(self.generate_frame, df)
+
+    async def agenerate(self, df: pd.DataFrame) -> List[CreativeRecommendation]:
+        return self.from_frame(await self.agenerate_frame(df))
+
+    @staticmethod
+    def from_frame(frame: pd.DataFrame) -> List[CreativeRecommendation]:
+        return [CreativeRecommendation(**record) for record in frame.to_dict(orient="records")]
+
+    @staticmethod
+    def frame_to_dict(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        return frame.to_dict(orient="records")
+
+    @staticmethod
+    def iter_records(frame: pd.DataFrame, chunk_size: int = 10_000) -> Iterator[Dict[str, Any]]:
+        """`frame_to_dict` one slice at a time, so writers never hold the
+        whole list of records."""
+        for start in range(0, len(frame), chunk_size):
+            yield from frame.iloc[start : start + chunk_size].to_dict(orient="records")
 
     def to_dict(self, recs: List[CreativeRecommendation]) -> List[Dict[str, Any]]:
         return [
@@ -75,6 +301,9 @@ class CreativeAgent:
                 "new_primary_text": r.new_primary_text,
                 "new_cta": r.new_cta,
                 "rationale": r.rationale,
+                "row_count": r.row_count,
+                "first_date": r.first_date,
+                "last_date": r.last_date,
             }
             for r in recs
         ]
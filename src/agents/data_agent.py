@@ -1,9 +1,60 @@
-from dataclasses import dataclass
-from typing import Dict, Any
+import contextvars
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from src.utils.schema import validate_schema, SchemaValidationResult
+from src.utils import partitions
+from src.utils.aggregate_state import AggregateState, load_state, resume_offset, save_state, source_offset
+from src.utils.aggregation import ROW_COUNT, AggregationEngine, RowStats, key_name
+from src.utils.cube import AggregateCube, CubeStore
+from src.utils.frame_cache import FrameCache
+from src.utils.partitions import DateRange, Partition
+from src.utils.segments import SegmentScan, SegmentScanner
+from src.utils.significance import ClaimTable
+from src.utils.tracing import span
+from src.utils.schema import (
+    COLUMN_DTYPES,
+    SchemaValidationResult,
+    coerce_dtypes,
+    read_csv_options,
+    validate_schema,
+)
+
+BAD_FILE_POLICIES = ("fail", "skip")
+
+
+class _ByteRange(io.RawIOBase):
+    """Bytes `start` to `end` of an open binary file, as a readable stream."""
+
+    def __init__(self, f: Any, start: int, end: int) -> None:
+        f.seek(start)
+        self._f = f
+        self._left = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._f.read(min(len(buffer), self._left))
+        buffer[: len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+def _date_label(value: Any) -> Any:
+    """ISO date string for timestamps; other values are returned unchanged."""
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def _by_date(series: pd.Series) -> Dict[str, float]:
+    return {_date_label(k): float(v) for k, v in series.dropna().items()}
 
 
 @dataclass
@@ -15,47 +66,606 @@ class DataSummary:
     low_ctr_rows: pd.DataFrame
     full_df: pd.DataFrame
     schema_result: SchemaValidationResult
+    # Dataset-level facts for the report; filled in both batch and streaming mode
+    # so the report does not need to rescan `full_df`.
+    overview: Dict[str, Any] = field(default_factory=dict)
+    # Partial aggregates per grouping key (see AggregationEngine); downstream
+    # agents read these instead of grouping `full_df` again.
+    aggregates: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    # Period-over-period segment deltas (see SegmentScanner); None when the
+    # scan is disabled or the data covers fewer than two dates.
+    segment_scan: Optional[SegmentScan] = None
+    # Persisted aggregate cube (see AggregateCube); None when disabled.
+    cube: Optional[AggregateCube] = None
+    # Partitioned sources only: schema result per file read, keyed by path,
+    # and the partition counts ({"total", "read", "skipped_bad"}).
+    file_schemas: Dict[str, SchemaValidationResult] = field(default_factory=dict)
+    partitions: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _PartitionRead:
+    """One partition after reading: its schema result and either the rows
+    (batch mode) or their partial aggregates (streaming / incremental)."""
+
+    partition: Partition
+    schema_result: SchemaValidationResult
+    frame: Optional[pd.DataFrame] = None
+    aggregates: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    stats: RowStats = field(default_factory=RowStats)
+    low_rows: Optional[pd.DataFrame] = None
+
+
+def _combine_schema_results(results: List[SchemaValidationResult]) -> SchemaValidationResult:
+    """One result for many files: ok only if every file is; missing and
+    extra columns are unioned, and the first mismatch per column is kept."""
+    missing: set = set()
+    extra: set = set()
+    mismatches: Dict[str, str] = {}
+    errors: List[str] = []
+    for r in results:
+        missing.update(r.missing)
+        extra.update(r.extra)
+        for col, message in r.dtype_mismatches.items():
+            mismatches.setdefault(col, message)
+        if r.error:
+            errors.append(r.error)
+    return SchemaValidationResult(
+        ok=all(r.ok for r in results),
+        missing=sorted(missing),
+        extra=sorted(extra),
+        dtype_mismatches=mismatches,
+        error="; ".join(errors) or None,
+    )
 
 
 class DataAgent:
-    def __init__(self, date_column: str = "date") -> None:
+    def __init__(
+        self,
+        date_column: str = "date",
+        streaming: bool = False,
+        chunk_size: int = 100_000,
+        low_ctr_threshold: Optional[float] = None,
+        low_roas_threshold: Optional[float] = None,
+        cache_dir: Optional[str] = None,
+        incremental: bool = False,
+        state_path: Optional[str] = None,
+        segment_scanner: Optional[SegmentScanner] = None,
+        cube_store: Optional[CubeStore] = None,
+        date_range: Optional[DateRange] = None,
+        read_workers: int = 4,
+        on_bad_file: str = "fail",
+        max_low_rows_per_adset: Optional[int] = None,
+    ) -> None:
+        if incremental and not state_path:
+            raise ValueError("incremental mode needs a state_path")
+        if on_bad_file not in BAD_FILE_POLICIES:
+            raise ValueError(f"on_bad_file must be one of {BAD_FILE_POLICIES}, got {on_bad_file!r}")
         self.date_column = date_column
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.low_ctr_threshold = low_ctr_threshold
+        self.low_roas_threshold = low_roas_threshold
+        self.cache = FrameCache(cache_dir) if cache_dir else None
+        self.incremental = incremental
+        self.state_path = state_path
+        self.segment_scanner = segment_scanner
+        self.cube_store = cube_store
+        self.date_range = date_range or DateRange()
+        self.read_workers = max(1, read_workers)
+        self.on_bad_file = on_bad_file
+        self.max_low_rows_per_adset = max_low_rows_per_adset
+        keys: List[Any] = [date_column, "campaign_name"]
+        if segment_scanner is not None:
+            # one date x all-dimensions table; every segment is a rollup of it
+            keys.append(segment_scanner.base_key)
+        if cube_store is not None and cube_store.base_key not in keys:
+            keys.append(cube_store.base_key)
+        if not any(isinstance(k, tuple) and {date_column, "campaign_name"} <= set(k) for k in keys):
+            # per-campaign sums for a date window (see `window`) roll up from it
+            keys.append((date_column, "campaign_name"))
+        self.engine = AggregationEngine(keys=keys)
+
+    def _parse_csv(self, path: str) -> pd.DataFrame:
+        with span("data.parse_csv") as sp:
+            header = pd.read_csv(path, nrows=0)
+            try:
+                df = pd.read_csv(path, **read_csv_options(header.columns))
+            except (ValueError, TypeError):
+                # some column does not fit the spec; load untyped and let
+                # validate_schema report the mismatch
+                df = coerce_dtypes(pd.read_csv(path))
+            sp.rows = len(df)
+        return df
+
+    def _read_frame(self, path: str) -> pd.DataFrame:
+        if self.cache is None:
+            return self._parse_csv(path)
+        with span("data.cache_load") as sp:
+            df = self.cache.load(path)
+            sp.attrs["hit"] = df is not None
+        if df is None:
+            df = self._parse_csv(path)
+            self.cache.store(path, df)
+        # entries written before the typed schema existed are upgraded here
+        return coerce_dtypes(df)
 
     def load_and_validate(self, path: str) -> DataSummary:
-        df = pd.read_csv(path)
-        schema_result = validate_schema(df)
+        if partitions.is_partitioned(path):
+            return self._load_partitioned(path)
+        if self.incremental:
+            return self._load_incremental(path)
+        if self.streaming:
+            return self._load_streaming(path)
+
+        df = self._read_frame(path)
+        with span("data.validate", rows=len(df)):
+            schema_result = validate_schema(df)
 
         if not schema_result.ok:
             # We still return the summary but the orchestrator may decide to abort.
             # This makes behaviour explicit and testable.
             pass
 
-        # compute basic summaries
-        if self.date_column in df.columns:
-            roas_by_date = df.groupby(self.date_column)["roas"].mean().to_dict()
-            ctr_by_date = df.groupby(self.date_column)["ctr"].mean().to_dict()
-        else:
-            roas_by_date = {}
-            ctr_by_date = {}
-
-        top = (
-            df.groupby("campaign_name")["roas"]
-            .mean()
-            .sort_values(ascending=False)
-            .head(3)
-            .to_dict()
+        with span("data.aggregate", rows=len(df)):
+            aggregates = self.engine.partial(df)
+        return self._summarize(
+            aggregates,
+            schema_result=schema_result,
+            low_ctr_rows=self._select_low_rows(df),
+            full_df=df,
+            overview=self._overview(df),
+        )
+
+    def load_rows(self, path: str) -> DataSummary:
+        """Read and validate the rows without aggregating them.
+
+        For callers that aggregate elsewhere (the orchestrator's sharded
+        mode): only `full_df`, `schema_result` and, for partitioned sources,
+        `file_schemas` / `partitions` are filled. Batch mode only.
+        """
+        if self.streaming or self.incremental:
+            raise ValueError("load_rows needs the rows in memory; streaming and incremental mode do not keep them")
+        if partitions.is_partitioned(path):
+            return self._load_partitioned(path, aggregate=False)
+        df = self._read_frame(path)
+        with span("data.validate", rows=len(df)):
+            schema_result = validate_schema(df)
+        return self._rows_only(df, schema_result)
+
+    def _rows_only(self, df: pd.DataFrame, schema_result: SchemaValidationResult) -> DataSummary:
+        return DataSummary(
+            roas_by_date={},
+            ctr_by_date={},
+            top_roas_campaigns={},
+            bottom_roas_campaigns={},
+            low_ctr_rows=df.iloc[0:0],
+            full_df=df,
+            schema_result=schema_result,
+            overview={"rows": len(df)},
+        )
+
+    def partials(self, df: pd.DataFrame) -> Tuple[Dict[str, pd.DataFrame], RowStats, pd.DataFrame]:
+        """Partial aggregates, row stats and low CTR / ROAS rows of `df`;
+        all three merge across frames (chunks, files, shards)."""
+        stats = RowStats()
+        stats.update(df)
+        return (self.engine.partial(df) if len(df) else {}), stats, self._select_low_rows(df)
+
+    def summarize_partials(
+        self,
+        full_df: pd.DataFrame,
+        schema_result: SchemaValidationResult,
+        aggregates: Dict[str, pd.DataFrame],
+        stats: RowStats,
+        low_ctr_rows: pd.DataFrame,
+        segment_scan: Optional[SegmentScan],
+    ) -> DataSummary:
+        """Summary from merged `partials` and a finished segment scan, both
+        computed elsewhere (the orchestrator's sharded mode)."""
+        overview = self._aggregate_overview(aggregates, stats) if stats.rows else {"rows": 0}
+        return self._summarize(
+            aggregates, schema_result, low_ctr_rows, full_df, overview, segment_scan=segment_scan, scan=False
+        )
+
+    def _load_streaming(self, path: str) -> DataSummary:
+        """Aggregate the CSV chunk by chunk instead of materialising it.
+
+        Only additive sums per date / campaign are kept, plus the rows
+        that fall under the low CTR / ROAS thresholds, capped to the worst
+        `max_low_rows_per_adset` per adset (see `_keep_worst`), so peak memory
+        is bounded by the number of keys rather than the number of rows.
+        `full_df` is an empty frame carrying the header only.
+        """
+        header = pd.read_csv(path, nrows=0)
+        # dtypes are enforced by the chunked reader below; a value that does
+        # not fit the spec raises instead of being reported per chunk
+        schema_result = validate_schema(header, check_dtypes=False)
+
+        if not schema_result.ok:
+            return self._summarize({}, schema_result, header, header, {"rows": 0})
+
+        aggregates, stats, low_ctr_rows, _ = self._scan_chunks(path, header)
+        if stats.rows == 0:
+            # header-only file
+            return self._summarize({}, schema_result, header, header, {"rows": 0})
+
+        overview = self._aggregate_overview(aggregates, stats)
+        return self._summarize(aggregates, schema_result, low_ctr_rows, header, overview)
+
+    def _load_incremental(self, path: str) -> DataSummary:
+        """Merge rows newer than the last run into the persisted aggregates.
+
+        The state records how many bytes of the file were ingested. When the
+        file only grew since (an appended export), the run seeks past them
+        and parses just the appended bytes, so a daily run costs one day of
+        parsing. A rewritten file (see `resume_offset`) is parsed in full.
+        Either way rows dated on or before the state's `last_date` are
+        skipped. Bytes appended while the run reads are left for the next
+        run. `full_df` and `low_ctr_rows` hold the newly ingested rows only;
+        the trend views and overview cover the full history through the
+        merged state.
+        """
+        header = pd.read_csv(path, nrows=0)
+        schema_result = validate_schema(header, check_dtypes=False)
+        if not schema_result.ok:
+            return self._summarize({}, schema_result, header, header, {"rows": 0})
+
+        state = self._load_state()
+        start, end = resume_offset(state.source, path), os.path.getsize(path)
+        aggregates, stats, low_ctr_rows, new_rows = self._scan_chunks(
+            path, header, after=state.last_date, keep_rows=True, byte_range=(start, end)
         )
-        bottom = (
-            df.groupby("campaign_name")["roas"]
-            .mean()
-            .sort_values(ascending=True)
-            .head(3)
-            .to_dict()
+        state.source = source_offset(path, end)
+        return self._merge_state(state, aggregates, stats, low_ctr_rows, new_rows, schema_result, header)
+
+    def _load_state(self) -> AggregateState:
+        """The persisted aggregate state; empty (so the history is rebuilt)
+        when it lacks a table this agent aggregates, e.g. after enabling the
+        cube or changing the segment dimensions.
+
+        With a cube store the state's date x dimensions table is the cube's
+        base cuboid, persisted once by the store rather than again in the
+        state; it is taken from the stored cube when that cube ends on the
+        state's last date and holds the same rows.
+        """
+        state = load_state(self.state_path, self.date_column)
+        if state.last_date is not None and self.cube_store is not None:
+            key = key_name(self.cube_store.base_key)
+            cube = self.cube_store.load() if key not in state.aggregates else None
+            if cube is not None and self._cube_matches(cube, state.last_date, state.row_stats.rows):
+                state.aggregates[key] = cube.cuboids[tuple(cube.dimensions)]
+        if state.last_date is not None and any(key_name(k) not in state.aggregates for k in self.engine.keys):
+            return AggregateState()
+        return state
+
+    @staticmethod
+    def _cube_matches(cube: AggregateCube, last_date: Optional[pd.Timestamp], rows: int) -> bool:
+        """Whether `cube` holds exactly the rows of an aggregate state (a
+        batch run in between rebuilds the cube from other data)."""
+        by_date = cube.cuboids.get(())
+        return (
+            cube.last_date == last_date
+            and by_date is not None
+            and int(by_date[ROW_COUNT].sum()) == rows
+        )
+
+    def _merge_state(
+        self,
+        state: AggregateState,
+        aggregates: Dict[str, pd.DataFrame],
+        stats: RowStats,
+        low_ctr_rows: pd.DataFrame,
+        new_rows: pd.DataFrame,
+        schema_result: SchemaValidationResult,
+        header: pd.DataFrame,
+        window: Optional[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]] = None,
+    ) -> DataSummary:
+        """Fold newly ingested aggregates into `state`, persist it and
+        summarise the full history, or only the dates in `window` (start,
+        end): the window narrows the summary, never what is ingested."""
+        previous_last_date, previous_rows = state.last_date, state.row_stats.rows
+        state.aggregates = self.engine.merge(state.aggregates, aggregates)
+        state.row_stats.merge(stats)
+        by_date = state.aggregates.get(self.date_column)
+        if by_date is not None and len(by_date):
+            state.last_date = pd.Timestamp(by_date.index.max())
+        # the cube store persists the cube's base; the state does not keep a second copy
+        shared = [key_name(self.cube_store.base_key)] if self.cube_store is not None else []
+        save_state(self.state_path, state, self.date_column, exclude=shared)
+
+        if state.row_stats.rows == 0:
+            return self._summarize({}, schema_result, header, header, {"rows": 0})
+        overview = self._aggregate_overview(state.aggregates, state.row_stats)
+        overview["new_rows"] = stats.rows
+        windowed = window is not None and window != (None, None)
+        summary = self._summarize(
+            state.aggregates, schema_result, low_ctr_rows, new_rows, overview, scan=not windowed, refresh_cube=False
         )
+        summary.cube = self._refresh_cube(state.aggregates, aggregates, previous_last_date, previous_rows)
+        return self.window(summary, *window) if windowed else summary
+
+    def _load_partitioned(self, source: str, aggregate: bool = True) -> DataSummary:
+        """Load a directory or glob of date-partitioned CSV / Parquet / Feather files.
+
+        Partitions dated outside the date range (see `DateRange`) are never
+        opened. The rest are read by `read_workers` threads and
+        schema-checked one file at a time; `file_schemas` reports every file
+        read. Rows outside the range are dropped as well, for undated or
+        monthly files.
+
+        Incremental runs instead read every partition not yet ingested,
+        whatever the range, so the persisted state always covers the whole
+        source; the range is applied to the summary of that state (see
+        `window`).
+
+        Batch mode concatenates the rows. In streaming and incremental mode
+        each worker reduces its file to partial aggregates, merged as in the
+        chunked path, so only one file per worker is in memory at a time.
+        Files that fail the schema check fail the load, or with
+        `on_bad_file="skip"` are left out.
+        """
+        found = partitions.discover(source)
+        if not found:
+            raise FileNotFoundError(f"no CSV, Parquet or Feather files match {source}")
+        header = coerce_dtypes(pd.DataFrame({c: pd.Series(dtype="object") for c in COLUMN_DTYPES}))
+
+        start, end = self.date_range.resolve(partitions.latest_date(found))
+        window = (start, end)
+        state = self._load_state() if self.incremental else None
+        after = state.last_date if state is not None else None
+        lower = start
+        if state is not None:
+            # every day after the state is ingested, whatever the range; the
+            # range narrows the summary instead. A partition ending on
+            # `after` is done.
+            start = end = None
+            lower = None if after is None else after + pd.Timedelta(1, "ns")
+        selected = partitions.select(found, lower, end)
+
+        reduce = self.streaming or self.incremental  # to partial aggregates on the worker
+        with span("data.read_partitions", files=len(selected), pruned=len(found) - len(selected)) as sp:
+            with ThreadPoolExecutor(max_workers=min(self.read_workers, max(1, len(selected)))) as pool:
+                futures = [
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        self._read_partition,
+                        p,
+                        (start, end, after),
+                        reduce,
+                        self.incremental,
+                    )
+                    for p in selected
+                ]
+                reads = [f.result() for f in futures]
+            good = [r for r in reads if r.schema_result.ok]
+            sp.rows = sum(len(r.frame) if r.frame is not None else r.stats.rows for r in good)
+
+        file_schemas = {str(r.partition.path): r.schema_result for r in reads}
+        counts = {"total": len(found), "read": len(selected), "skipped_bad": 0}
+        bad = [r.schema_result for r in reads if not r.schema_result.ok]
+        if bad and self.on_bad_file == "fail":
+            summary = self._summarize({}, _combine_schema_results(bad), header, header, {"rows": 0})
+        else:
+            counts["skipped_bad"] = len(bad)
+            schema_result = _combine_schema_results([r.schema_result for r in good])
+            summary = self._summarize_partitions(good, schema_result, header, state, aggregate, window)
+        summary.file_schemas = file_schemas
+        summary.partitions = counts
+        return summary
+
+    def _summarize_partitions(
+        self,
+        reads: List[_PartitionRead],
+        schema_result: SchemaValidationResult,
+        header: pd.DataFrame,
+        state: Any,
+        aggregate: bool = True,
+        window: Optional[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]] = None,
+    ) -> DataSummary:
+        def concat(parts: List[Optional[pd.DataFrame]]) -> pd.DataFrame:
+            # per-file categoricals differ, so re-apply the spec after concatenating
+            frames = [p for p in parts if p is not None and not p.empty]
+            return coerce_dtypes(pd.concat(frames, ignore_index=True)) if frames else header
+
+        if not (self.streaming or self.incremental):
+            df = concat([r.frame for r in reads])
+            if not aggregate:
+                return self._rows_only(df, schema_result)
+            with span("data.aggregate", rows=len(df)):
+                aggregates = self.engine.partial(df) if len(df) else {}
+            return self._summarize(aggregates, schema_result, self._select_low_rows(df), df, self._overview(df))
+
+        aggregates: Dict[str, pd.DataFrame] = {}
+        stats = RowStats()
+        for r in reads:
+            aggregates = self.engine.merge(aggregates, r.aggregates)
+            stats.merge(r.stats)
+        low_ctr_rows = concat([r.low_rows for r in reads])
+        if state is None:
+            # rows are not kept, so neither is every low row (see `_keep_worst`)
+            low_ctr_rows = self._keep_worst(low_ctr_rows)
+        if state is not None:
+            new_rows = concat([r.frame for r in reads])
+            return self._merge_state(state, aggregates, stats, low_ctr_rows, new_rows, schema_result, header, window)
+        if stats.rows == 0:
+            return self._summarize({}, schema_result, header, header, {"rows": 0})
+        return self._summarize(aggregates, schema_result, low_ctr_rows, header, self._aggregate_overview(aggregates, stats))
+
+    def _read_partition(
+        self,
+        partition: Partition,
+        bounds: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp], Optional[pd.Timestamp]],
+        aggregate: bool,
+        keep_rows: bool,
+    ) -> _PartitionRead:
+        """Read, check and filter one partition (runs on a worker thread)."""
+        with span("data.read_partition", path=str(partition.path), format=partition.format) as sp:
+            try:
+                if partition.format == "csv":
+                    df = self._read_frame(str(partition.path))
+                else:
+                    df = coerce_dtypes(partitions.read_columnar(partition))
+            except (OSError, ValueError, pd.errors.ParserError) as exc:
+                # unreadable files are reported like schema failures
+                return _PartitionRead(partition, SchemaValidationResult(False, [], [], error=str(exc)))
+            sp.rows = len(df)
+            schema_result = validate_schema(df)
+            if not schema_result.ok:
+                return _PartitionRead(partition, schema_result)
+
+            df = self._in_range(df, *bounds)
+            if not aggregate:
+                return _PartitionRead(partition, schema_result, frame=df)
+            aggregates, stats, low_rows = self.partials(df)
+            if not keep_rows:
+                low_rows = self._keep_worst(low_rows)
+            return _PartitionRead(
+                partition,
+                schema_result,
+                frame=df if keep_rows else None,
+                aggregates=aggregates,
+                stats=stats,
+                low_rows=low_rows,
+            )
+
+    def _in_range(
+        self,
+        df: pd.DataFrame,
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp],
+        after: Optional[pd.Timestamp],
+    ) -> pd.DataFrame:
+        if start is None and end is None and after is None:
+            return df
+        dates = df[self.date_column]
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates <= end
+        if after is not None:
+            mask &= dates > after
+        return df if mask.all() else df[mask]
+
+    def _scan_chunks(
+        self,
+        path: str,
+        header: pd.DataFrame,
+        after: Optional[pd.Timestamp] = None,
+        keep_rows: bool = False,
+        byte_range: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[Dict[str, pd.DataFrame], RowStats, pd.DataFrame, pd.DataFrame]:
+        """Single chunked pass: partial aggregates, row stats, low rows and
+        (optionally) the rows themselves, skipping dates up to `after`.
+        Unless the rows are kept anyway, the low rows are capped per adset
+        as the chunks are merged (see `_keep_worst`). `byte_range` (start,
+        end) reads only those bytes of the file; a non-zero start must fall
+        on a line boundary past the header."""
+        aggregates: Dict[str, pd.DataFrame] = {}
+        stats = RowStats()
+        low_parts: List[pd.DataFrame] = []
+        low_kept, fold_at = 0, self.chunk_size
+        row_parts: List[pd.DataFrame] = []
+
+        options = read_csv_options(header.columns)
+        start, end = byte_range or (0, None)
+        if start:
+            options.update(header=None, names=list(header.columns))
+        with span("data.scan_chunks", chunk_size=self.chunk_size, offset=start) as sp, open(path, "rb") as f:
+            source = io.BufferedReader(_ByteRange(f, start, end)) if end is not None else path
+            # nothing appended: an empty range has no header to parse
+            chunks = pd.read_csv(source, chunksize=self.chunk_size, **options) if end is None or end > start else ()
+            parsed = 0
+            for chunk in chunks:
+                parsed += len(chunk)
+                if after is not None:
+                    chunk = chunk[chunk[self.date_column] > after]
+                    if chunk.empty:
+                        continue
+                stats.update(chunk)
+                aggregates = self.engine.merge(aggregates, self.engine.partial(chunk))
 
-        # low CTR subset is computed by orchestrator based on thresholds;
-        # here we just keep the full DF, but we use a dummy empty frame for the type.
-        low_ctr_rows = df.iloc[0:0].copy()
+                low = self._select_low_rows(chunk)
+                if not low.empty:
+                    low_parts.append(low)
+                    low_kept += len(low)
+                if not keep_rows and self.max_low_rows_per_adset is not None and low_kept > fold_at:
+                    # fold the parts kept so far down to the worst rows per adset
+                    low_parts = [self._keep_worst(pd.concat(low_parts))]
+                    low_kept = len(low_parts[0])
+                    fold_at = max(self.chunk_size, 2 * low_kept)
+                if keep_rows:
+                    row_parts.append(chunk)
+            sp.rows = stats.rows
+            sp.attrs["parsed_rows"] = parsed
+
+        def _concat(parts: List[pd.DataFrame]) -> pd.DataFrame:
+            # chunk categoricals differ, so re-apply the spec after concatenating
+            return coerce_dtypes(pd.concat(parts, ignore_index=True)) if parts else header
+
+        low_rows = _concat(low_parts)
+        return aggregates, stats, low_rows if keep_rows else self._keep_worst(low_rows), _concat(row_parts)
+
+    def _aggregate_overview(
+        self, aggregates: Dict[str, pd.DataFrame], stats: Optional[RowStats] = None
+    ) -> Dict[str, Any]:
+        """Overview from the aggregates; without `stats` the row count comes
+        from the per-date sums and row-level ROAS statistics are left out."""
+        by_date = aggregates.get(self.date_column)
+        if stats is not None:
+            overview = stats.to_overview()
+        else:
+            overview = {"rows": int(by_date[ROW_COUNT].sum()) if by_date is not None else 0}
+        if "campaign_name" in aggregates:
+            overview["campaigns"] = len(aggregates["campaign_name"])
+        if by_date is not None and len(by_date):
+            overview["date_min"] = _date_label(by_date.index.min())
+            overview["date_max"] = _date_label(by_date.index.max())
+        return overview
+
+    def _summarize(
+        self,
+        aggregates: Dict[str, pd.DataFrame],
+        schema_result: SchemaValidationResult,
+        low_ctr_rows: pd.DataFrame,
+        full_df: pd.DataFrame,
+        overview: Dict[str, Any],
+        segment_scan: Optional[SegmentScan] = None,
+        scan: bool = True,
+        refresh_cube: bool = True,
+    ) -> DataSummary:
+        """Derive the summary views from the partial aggregate tables.
+
+        The segment scan runs on the aggregates unless `scan` is false, in
+        which case `segment_scan` (computed elsewhere) is used as is. The
+        cube is rebuilt from the aggregates unless `refresh_cube` is false
+        (incremental runs merge into the stored cube instead).
+        """
+        roas_by_date: Dict[str, float] = {}
+        ctr_by_date: Dict[str, float] = {}
+        by_date = aggregates.get(self.date_column)
+        if by_date is not None:
+            roas_by_date = _by_date(self.engine.ratio(by_date, "roas"))
+            ctr_by_date = _by_date(self.engine.ratio(by_date, "ctr"))
+            totals = by_date.sum()
+            if totals.get("spend", 0) > 0:
+                overview = {**overview, "roas_overall": float(totals["revenue"] / totals["spend"])}
+
+        top: Dict[str, float] = {}
+        bottom: Dict[str, float] = {}
+        by_campaign = aggregates.get("campaign_name")
+        if by_campaign is not None:
+            campaign_roas = self.engine.ratio(by_campaign, "roas").dropna()
+            top = campaign_roas.sort_values(ascending=False).head(3).to_dict()
+            bottom = campaign_roas.sort_values(ascending=True).head(3).to_dict()
+
+        if scan and self.segment_scanner is not None:
+            base = aggregates.get(key_name(self.segment_scanner.base_key))
+            if base is not None:
+                with span("data.segment_scan", rows=len(base)) as sp:
+                    segment_scan = self.segment_scanner.scan(base)
+                    sp.attrs["segments"] = len(segment_scan.segments) if segment_scan is not None else 0
 
         return DataSummary(
             roas_by_date=roas_by_date,
@@ -63,14 +673,181 @@ class DataAgent:
             top_roas_campaigns=top,
             bottom_roas_campaigns=bottom,
             low_ctr_rows=low_ctr_rows,
-            full_df=df,
+            full_df=full_df,
             schema_result=schema_result,
+            overview=overview,
+            aggregates=aggregates,
+            segment_scan=segment_scan,
+            cube=self._refresh_cube(aggregates) if refresh_cube else None,
+        )
+
+    def _refresh_cube(
+        self,
+        aggregates: Dict[str, pd.DataFrame],
+        new_aggregates: Optional[Dict[str, pd.DataFrame]] = None,
+        previous_last_date: Optional[pd.Timestamp] = None,
+        previous_rows: int = 0,
+    ) -> Optional[AggregateCube]:
+        """Bring the persisted cube up to date and return it.
+
+        With `new_aggregates` (an incremental run) the cube of the new rows
+        is merged into the stored cube, provided the stored cube holds what
+        the aggregate state held before (same last date and row count);
+        otherwise, or in batch / streaming mode,
+        the cube is rebuilt from the base table in `aggregates`. Either way
+        it is derived from aggregates, never from rows.
+        """
+        if self.cube_store is None:
+            return None
+        key = key_name(self.cube_store.base_key)
+        base = aggregates.get(key)
+        if base is None:
+            return None
+        with span("data.cube") as sp:
+            cube: Optional[AggregateCube] = None
+            if new_aggregates is not None and previous_last_date is not None:
+                stored = self.cube_store.load()
+                if stored is not None and self._cube_matches(stored, previous_last_date, previous_rows):
+                    new_base = new_aggregates.get(key)
+                    try:
+                        cube = stored if new_base is None else stored.merge(self.cube_store.build(new_base))
+                        sp.attrs["refresh"] = "incremental"
+                    except ValueError:
+                        cube = None  # new rows carry other dimensions; rebuild
+            if cube is None:
+                cube = self.cube_store.build(base)
+                sp.attrs["refresh"] = "full"
+            self.cube_store.save(cube)
+            sp.rows = len(cube)
+            sp.attrs["cuboids"] = len(cube.cuboids)
+        return cube
+
+    def window(
+        self,
+        summary: DataSummary,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> DataSummary:
+        """`summary` narrowed to the dates from `start` to `end` (inclusive,
+        None for open), without reading the source again.
+
+        Date-keyed aggregates are filtered and the other tables rolled up
+        from a filtered date-keyed table holding their key; the trend views,
+        overview and segment scan are derived from those, the cube is sliced
+        and the rows are filtered. Row-level ROAS statistics are not sums, so
+        a windowed overview leaves them out.
+        """
+        if start is None and end is None:
+            return summary
+        aggregates = self._windowed(summary.aggregates, start, end)
+        overview = self._aggregate_overview(aggregates)
+        if "new_rows" in summary.overview:
+            overview["new_rows"] = summary.overview["new_rows"]
+        windowed = self._summarize(
+            aggregates,
+            summary.schema_result,
+            self._rows_between(summary.low_ctr_rows, start, end),
+            self._rows_between(summary.full_df, start, end),
+            overview,
+            refresh_cube=False,
         )
+        windowed.cube = summary.cube.between(start, end) if summary.cube is not None else None
+        windowed.file_schemas = summary.file_schemas
+        windowed.partitions = summary.partitions
+        return windowed
+
+    def _windowed(
+        self, aggregates: Dict[str, pd.DataFrame], start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+    ) -> Dict[str, pd.DataFrame]:
+        dated: Dict[str, pd.DataFrame] = {}
+        for name, table in aggregates.items():
+            if self.date_column in table.index.names:
+                dates = table.index.get_level_values(self.date_column)
+                mask = np.ones(len(table), dtype=bool)
+                if start is not None:
+                    mask &= dates >= start
+                if end is not None:
+                    mask &= dates <= end
+                dated[name] = table[mask]
+        windowed = dict(dated)
+        for name, table in aggregates.items():
+            if name in dated:
+                continue
+            levels = list(table.index.names)
+            sources = [t for t in dated.values() if set(levels) <= set(t.index.names)]
+            if sources:
+                # single keys drop missing labels, as AggregationEngine does
+                source = min(sources, key=len)
+                windowed[name] = source.groupby(level=levels, dropna=len(levels) > 1, observed=True).sum()
+        return {name: windowed[name] for name in aggregates if name in windowed}
+
+    def _rows_between(
+        self, df: pd.DataFrame, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+    ) -> pd.DataFrame:
+        if self.date_column not in df.columns:
+            return df
+        return self._in_range(df, start, end, None)
+
+    def _select_low_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows under the configured low CTR / ROAS thresholds.
+
+        Without thresholds this is an empty frame with the same columns.
+        """
+        if (
+            self.low_ctr_threshold is None
+            or self.low_roas_threshold is None
+            or "ctr" not in df.columns
+            or "roas" not in df.columns
+        ):
+            return df.iloc[0:0].copy()
+        mask = (df["ctr"] < self.low_ctr_threshold) | (df["roas"] < self.low_roas_threshold)
+        return df[mask].copy()
+
+    def _keep_worst(self, low: pd.DataFrame) -> pd.DataFrame:
+        """At most `max_low_rows_per_adset` low rows per campaign / adset:
+        those with the lowest ROAS, then CTR, in their original order.
+
+        Without a cap, or without the adset columns, `low` is returned as is.
+        """
+        cap = self.max_low_rows_per_adset
+        keys = ["campaign_name", "adset_name"]
+        if cap is None or len(low) <= cap or not set(keys) <= set(low.columns):
+            return low
+        worst = low.sort_values(["roas", "ctr"], kind="stable")
+        kept = worst.groupby(keys, sort=False, dropna=False, observed=True).head(cap)
+        return low.loc[low.index.isin(kept.index)]
+
+    def _overview(self, df: pd.DataFrame) -> Dict[str, Any]:
+        overview: Dict[str, Any] = {"rows": len(df)}
+        if "campaign_name" in df.columns:
+            overview["campaigns"] = int(df["campaign_name"].nunique())
+        if self.date_column in df.columns and len(df):
+            overview["date_min"] = _date_label(df[self.date_column].min())
+            overview["date_max"] = _date_label(df[self.date_column].max())
+        if "roas" in df.columns and df["roas"].notna().any():
+            overview.update(
+                roas_mean=float(df["roas"].mean()),
+                roas_min=float(df["roas"].min()),
+                roas_max=float(df["roas"].max()),
+            )
+        return overview
+
+    def segment_table(self, summary: DataSummary) -> Optional[ClaimTable]:
+        """What segment claims are tested on: the cube when one is built,
+        else the date x dimensions aggregate behind the segment scan."""
+        if summary.cube is not None:
+            return summary.cube
+        if self.segment_scanner is None:
+            return None
+        return summary.aggregates.get(key_name(self.segment_scanner.base_key))
 
     def summarize_for_insight(self, summary: DataSummary) -> Dict[str, Any]:
-        return {
+        insight_input: Dict[str, Any] = {
             "roas_by_date": summary.roas_by_date,
             "ctr_by_date": summary.ctr_by_date,
             "top_roas_campaigns": summary.top_roas_campaigns,
             "bottom_roas_campaigns": summary.bottom_roas_campaigns,
         }
+        if summary.segment_scan is not None:
+            insight_input["segment_changes"] = summary.segment_scan.to_dict()
+        return insight_input
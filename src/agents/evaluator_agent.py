@@ -1,12 +1,18 @@
+import asyncio
+import math
+import re
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import pandas as pd
 import logging
 
 from src.agents.insight_agent import Hypothesis
-from src.utils.retry import retry
+from src.llm.client import LLMClient, LLMError
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, record_fallback
+from src.utils.retry import RetryPolicy, async_retry, retry, run_in_thread
 from src.utils.logging_utils import log_event
+from src.utils.significance import Claim, ClaimTable, ClaimTests, bootstrap_claims
 
 
 @dataclass
@@ -16,96 +22,352 @@ class EvaluatedHypothesis:
     validation_result: str  # "supported" | "inconclusive" | "rejected"
     confidence_score: float
     evidence: str
+    # bootstrap statistics behind the verdict (rule-based evaluation only)
+    stats: Optional[Dict[str, Any]] = None
+
+
+VALIDATION_RESULTS = ("supported", "inconclusive", "rejected")
+
+
+def evaluated_to_dict(e: EvaluatedHypothesis) -> Dict[str, Any]:
+    return {
+        "id": e.id,
+        "statement": e.statement,
+        "validation_result": e.validation_result,
+        "confidence_score": e.confidence_score,
+        "evidence": e.evidence,
+        "stats": e.stats,
+    }
+
+
+_DECREASE = re.compile(r"\b(decreas\w*|declin\w*|fell|drop\w*|worse\w*)\b")
+_INCREASE = re.compile(r"\b(improv\w*|increas\w*|rose|grew|better)\b")
+
+
+def claim_from_statement(statement: str) -> Optional[Claim]:
+    """Account-level claim read from a free-text statement (hypotheses
+    without a `claim`, e.g. from a model that omitted it); None when the
+    statement names no direction."""
+    text = statement.lower()
+    metric = "ctr" if "ctr" in text and "roas" not in text else "roas"
+    if _DECREASE.search(text):
+        return Claim(metric, "decrease")
+    if _INCREASE.search(text):
+        return Claim(metric, "increase")
+    return None
+
+
+def _number(value: float) -> Optional[float]:
+    return None if math.isnan(value) else round(float(value), 6)
+
+
+def _format_metric(metric: str, value: float) -> str:
+    return f"{value:.2%}" if metric == "ctr" else f"{value:.2f}"
+
+
+def _log_retry(attempt: int, exc: BaseException) -> None:
+    logging.getLogger("kasparro").warning(
+        "EvaluatorAgent retry", extra={"extra_fields": {"agent": "EvaluatorAgent", "stage": "evaluate", "event": "retry", "status": "retrying", "attempt": attempt, "error": str(exc)}}  # type: ignore[arg-type]
+    )
 
 
 class EvaluatorAgent:
-    def __init__(self, logger: logging.Logger) -> None:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        llm_client: Optional[LLMClient] = None,
+        call_timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        n_resamples: int = 2000,
+        alpha: float = 0.05,
+        seed: int = 42,
+        date_column: str = "date",
+    ) -> None:
         self.logger = logger
+        self.llm_client = llm_client
+        self.n_resamples = n_resamples
+        self.alpha = alpha
+        self.seed = seed
+        self.date_column = date_column
+        # shared across instances when built via `breaker_for("EvaluatorAgent")`
+        self.breaker = breaker or CircuitBreaker("EvaluatorAgent", logger)
+        policy = retry_policy or RetryPolicy()
+        # an open circuit is not retried: the caller falls back at once
+        self._evaluate_with_retry = retry(
+            max_attempts=policy.max_attempts,
+            base_delay=policy.base_delay,
+            backoff_factor=policy.backoff_factor,
+            giveup=(CircuitOpenError,),
+            on_retry=_log_retry,
+        )(self._evaluate_internal)
+        self._aevaluate_with_retry = async_retry(
+            max_attempts=policy.max_attempts,
+            base_delay=policy.base_delay,
+            backoff_factor=policy.backoff_factor,
+            jitter=policy.jitter,
+            timeout=call_timeout,
+            giveup=(CircuitOpenError,),
+            on_retry=_log_retry,
+        )(self._aevaluate_internal)
+
+    def _llm_evaluate(
+        self,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]],
+    ) -> List[EvaluatedHypothesis]:
+        assert self.llm_client is not None
+        prompt = self.llm_client.render(
+            "evaluator",
+            {
+                "hypotheses": [{"id": h.id, "statement": h.statement} for h in hypotheses],
+                "roas_by_date": roas_by_date or {},
+            },
+        )
+        items = self.llm_client.complete_json(prompt)
+        if not isinstance(items, list):
+            raise LLMError("Evaluator response must be a JSON list")
+        by_id = {str(item.get("id")): item for item in items if isinstance(item, dict)}
+
+        results: List[EvaluatedHypothesis] = []
+        for h in hypotheses:
+            item = by_id.get(h.id)
+            if item is None or item.get("validation_result") not in VALIDATION_RESULTS:
+                raise LLMError(f"Evaluator response has no valid verdict for {h.id}")
+            results.append(
+                EvaluatedHypothesis(
+                    id=h.id,
+                    statement=h.statement,
+                    validation_result=item["validation_result"],
+                    confidence_score=min(1.0, max(0.0, float(item.get("confidence_score", 0.0)))),
+                    evidence=str(item.get("evidence", "")),
+                )
+            )
+        return results
+
+    def _claim_table(
+        self,
+        df: pd.DataFrame,
+        roas_by_date: Optional[Dict[str, float]],
+        segment_table: Optional[ClaimTable],
+    ) -> Optional[ClaimTable]:
+        """Data the claims are tested on, best first: the aggregate cube or
+        segment aggregate table, the raw rows, or the daily ROAS trend (each day weighted
+        equally; account-level ROAS claims only)."""
+        date = self.date_column
+        if segment_table is not None and len(segment_table):
+            return segment_table
+        if {date, "spend", "revenue"} <= set(df.columns) and len(df):
+            return df
+        if roas_by_date is None and {date, "roas"} <= set(df.columns) and len(df):
+            # no additive columns; average the row-level ratio per day
+            roas_by_date = df.groupby(date)["roas"].mean().to_dict()
+        if roas_by_date:
+            return pd.DataFrame(
+                {
+                    date: pd.to_datetime(list(roas_by_date)),
+                    "revenue": list(roas_by_date.values()),
+                    "spend": 1.0,
+                }
+            )
+        return None
 
     def _fallback_evaluate(
-        self, df: pd.DataFrame, hypotheses: List[Hypothesis]
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]] = None,
+        segment_table: Optional[ClaimTable] = None,
     ) -> List[EvaluatedHypothesis]:
-        # Simple rule-based evaluation: check ROAS trend overall.
+        """Test each hypothesis's claim with a day-level bootstrap.
+
+        All claims are resampled together (`bootstrap_claims`).
+        `confidence_score` is the share of resamples in which the metric
+        moves the claimed way. A claim is supported when that share reaches
+        1 - alpha/2 (the (1 - alpha) interval of the change lies on the
+        claimed side), rejected at alpha/2 or below and inconclusive in
+        between.
+        """
+        claims = [h.claim or claim_from_statement(h.statement) for h in hypotheses]
+        table = self._claim_table(df, roas_by_date, segment_table)
+        if table is None:
+            return [
+                EvaluatedHypothesis(
+                    id=h.id,
+                    statement=h.statement,
+                    validation_result="inconclusive",
+                    confidence_score=0.3,
+                    evidence="Required columns for trend analysis are missing.",
+                )
+                for h in hypotheses
+            ]
+
+        testable = [c for c in claims if c is not None]
+        tests = bootstrap_claims(
+            table,
+            testable,
+            date_column=self.date_column,
+            n_resamples=self.n_resamples,
+            level=1.0 - self.alpha,
+            seed=self.seed,
+        )
         results: List[EvaluatedHypothesis] = []
-        if "date" not in df.columns or "roas" not in df.columns:
-            for h in hypotheses:
+        k = 0
+        for h, claim in zip(hypotheses, claims):
+            if claim is None:
                 results.append(
                     EvaluatedHypothesis(
                         id=h.id,
                         statement=h.statement,
                         validation_result="inconclusive",
-                        confidence_score=0.3,
-                        evidence="Required columns for trend analysis are missing.",
+                        confidence_score=0.5,
+                        evidence="Hypothesis is generic; it names no metric change to test.",
                     )
                 )
-            return results
+                continue
+            results.append(self._verdict(h, claim, tests, k))
+            k += 1
+        return results
+
+    def _verdict(self, h: Hypothesis, claim: Claim, tests: ClaimTests, k: int) -> EvaluatedHypothesis:
+        where = ", ".join(f"{d}={v}" for d, v in claim.segment.items()) or "the account"
+        metric = claim.metric.upper()
+        support = float(tests.support[k])
+        stats = {
+            "metric": claim.metric,
+            "before": _number(tests.before[k]),
+            "after": _number(tests.after[k]),
+            "delta": _number(tests.delta[k]),
+            "ci_low": _number(tests.ci_low[k]),
+            "ci_high": _number(tests.ci_high[k]),
+            "support": _number(support),
+            "days_before": int(tests.days_before[k]),
+            "days_after": int(tests.days_after[k]),
+            "resamples": tests.n_resamples,
+        }
+        if math.isnan(support):
+            return EvaluatedHypothesis(
+                id=h.id,
+                statement=h.statement,
+                validation_result="inconclusive",
+                confidence_score=0.0,
+                evidence=f"No {metric} for {where} in one of the compared windows.",
+                stats=stats,
+            )
 
-        roas_by_date = df.groupby("date")["roas"].mean().sort_index()
-        dates = list(roas_by_date.index)
-        if len(dates) >= 2:
-            first, last = dates[0], dates[-1]
-            roas_change = roas_by_date.loc[last] - roas_by_date.loc[first]
+        if support >= 1.0 - self.alpha / 2:
+            result = "supported"
+        elif support <= self.alpha / 2:
+            result = "rejected"
         else:
-            roas_change = 0.0
+            result = "inconclusive"
 
-        for h in hypotheses:
-            if "decreased" in h.statement.lower():
-                if roas_change < 0:
-                    result = "supported"
-                    score = 0.8
-                    evidence = f"Average ROAS decreased from {roas_by_date.iloc[0]:.2f} to {roas_by_date.iloc[-1]:.2f}."
-                else:
-                    result = "rejected"
-                    score = 0.4
-                    evidence = "ROAS did not show a clear downward trend over time."
-            elif "improved" in h.statement.lower():
-                if roas_change > 0:
-                    result = "supported"
-                    score = 0.8
-                    evidence = f"Average ROAS increased from {roas_by_date.iloc[0]:.2f} to {roas_by_date.iloc[-1]:.2f}."
-                else:
-                    result = "rejected"
-                    score = 0.4
-                    evidence = "ROAS did not show a clear upward trend over time."
-            else:
-                result = "inconclusive"
-                score = 0.5
-                evidence = "Hypothesis is generic; data neither strongly supports nor rejects it."
+        def fmt(value: float) -> str:
+            return _format_metric(claim.metric, value)
 
-            results.append(
-                EvaluatedHypothesis(
-                    id=h.id,
-                    statement=h.statement,
-                    validation_result=result,
-                    confidence_score=score,
-                    evidence=evidence,
-                )
-            )
-        return results
+        evidence = (
+            f"{metric} for {where} went from {fmt(tests.before[k])} to {fmt(tests.after[k])} "
+            f"({tests.days_before[k]} vs {tests.days_after[k]} days); "
+            f"{1 - self.alpha:.0%} interval of the change {fmt(tests.ci_low[k])} to {fmt(tests.ci_high[k])}. "
+            f"A {claim.direction} shows in {support:.0%} of {tests.n_resamples} day resamples."
+        )
+        return EvaluatedHypothesis(
+            id=h.id,
+            statement=h.statement,
+            validation_result=result,
+            confidence_score=round(support, 4),
+            evidence=evidence,
+            stats=stats,
+        )
 
-    @retry(on_retry=lambda attempt, exc: logging.getLogger("kasparro").warning(
-        "EvaluatorAgent retry", extra={"extra_fields": {"agent": "EvaluatorAgent", "stage": "evaluate", "event": "retry", "status": "retrying", "attempt": attempt, "error": str(exc)}}  # type: ignore[arg-type]
-    ))
     def _evaluate_internal(
-        self, df: pd.DataFrame, hypotheses: List[Hypothesis]
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]] = None,
+        segment_table: Optional[ClaimTable] = None,
     ) -> List[EvaluatedHypothesis]:
-        # Place for LLM + stats combo; here we keep deterministic.
-        return self._fallback_evaluate(df, hypotheses)
+        # Without a configured model client we stay deterministic.
+        if self.llm_client is None:
+            return self._fallback_evaluate(df, hypotheses, roas_by_date, segment_table)
+        return self.breaker.call(self._llm_evaluate, hypotheses, roas_by_date)
+
+    async def _aevaluate_internal(
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]] = None,
+        segment_table: Optional[ClaimTable] = None,
+    ) -> List[EvaluatedHypothesis]:
+        # the bootstrap and the client's blocking I/O both stay off the event loop
+        if self.llm_client is None:
+            return await run_in_thread(self._fallback_evaluate, df, hypotheses, roas_by_date, segment_table)
+        return await self.breaker.acall(run_in_thread, self._llm_evaluate, hypotheses, roas_by_date)
 
     def evaluate(
-        self, df: pd.DataFrame, hypotheses: List[Hypothesis]
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]] = None,
+        segment_table: Optional[ClaimTable] = None,
+    ) -> List[EvaluatedHypothesis]:
+        """Verdicts for `hypotheses`. `segment_table` is the Data Agent's
+        aggregate cube or date x dimensions aggregate; without it claims are tested on `df`
+        or the `roas_by_date` trend."""
+        try:
+            return self._log_evaluated(self._evaluate_with_retry(df, hypotheses, roas_by_date, segment_table))
+        except Exception as exc:  # noqa: BLE001
+            return self._fallback_after_error(df, hypotheses, roas_by_date, exc, segment_table)
+
+    async def aevaluate(
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]] = None,
+        segment_table: Optional[ClaimTable] = None,
     ) -> List[EvaluatedHypothesis]:
+        """Async `evaluate`: non-blocking backoff, per-call timeout and the
+        global concurrency limit from `src.utils.retry`."""
         try:
-            evaluated = self._evaluate_internal(df, hypotheses)
+            return self._log_evaluated(
+                await self._aevaluate_with_retry(df, hypotheses, roas_by_date, segment_table)
+            )
+        except Exception as exc:  # noqa: BLE001
+            return await asyncio.to_thread(
+                self._fallback_after_error, df, hypotheses, roas_by_date, exc, segment_table
+            )
+
+    def _log_evaluated(self, evaluated: List[EvaluatedHypothesis]) -> List[EvaluatedHypothesis]:
+        log_event(
+            self.logger,
+            agent="EvaluatorAgent",
+            stage="evaluate",
+            event="evaluated_hypotheses",
+            extra={"count": len(evaluated)},
+        )
+        return evaluated
+
+    def _fallback_after_error(
+        self,
+        df: pd.DataFrame,
+        hypotheses: List[Hypothesis],
+        roas_by_date: Optional[Dict[str, float]],
+        exc: BaseException,
+        segment_table: Optional[ClaimTable] = None,
+    ) -> List[EvaluatedHypothesis]:
+        record_fallback("EvaluatorAgent")
+        if isinstance(exc, CircuitOpenError):
+            # backend known to be down: no attempt was made, no delay paid
             log_event(
                 self.logger,
+                level=logging.WARNING,
                 agent="EvaluatorAgent",
                 stage="evaluate",
-                event="evaluated_hypotheses",
-                extra={"count": len(evaluated)},
+                event="fallback_circuit_open",
+                status="skipped",
+                extra={"circuit": self.breaker.snapshot()},
             )
-            return evaluated
-        except Exception as exc:  # noqa: BLE001
+        else:
             log_event(
                 self.logger,
                 level=logging.ERROR,
@@ -115,16 +377,7 @@ class EvaluatorAgent:
                 status="error",
                 extra={"error": str(exc)},
             )
-            return self._fallback_evaluate(df, hypotheses)
+        return self._fallback_evaluate(df, hypotheses, roas_by_date, segment_table)
 
     def to_dict(self, evaluated: List[EvaluatedHypothesis]) -> List[Dict[str, Any]]:
-        return [
-            {
-                "id": e.id,
-                "statement": e.statement,
-                "validation_result": e.validation_result,
-                "confidence_score": e.confidence_score,
-                "evidence": e.evidence,
-            }
-            for e in evaluated
-        ]
+        return [evaluated_to_dict(e) for e in evaluated]
@@ -1,7 +1,11 @@
+import asyncio
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-from src.utils.retry import retry
+from src.llm.client import LLMClient, LLMError
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, record_fallback
+from src.utils.significance import Claim, claim_from_dict, claim_to_dict
+from src.utils.retry import RetryPolicy, async_retry, retry, run_in_thread
 from src.utils.logging_utils import log_event
 import logging
 
@@ -13,11 +17,155 @@ class Hypothesis:
     mechanism: str
     expected_signals: str
     confidence: str  # "low" | "medium" | "high"
+    claim: Optional[Claim] = None
+
+
+HYPOTHESIS_FIELDS = ("id", "statement", "mechanism", "expected_signals", "confidence")
+
+
+def hypothesis_to_dict(h: Hypothesis) -> Dict[str, Any]:
+    return {
+        "id": h.id,
+        "statement": h.statement,
+        "mechanism": h.mechanism,
+        "expected_signals": h.expected_signals,
+        "confidence": h.confidence,
+        "claim": claim_to_dict(h.claim) if h.claim is not None else None,
+    }
+
+
+def _log_retry(attempt: int, exc: BaseException) -> None:
+    logging.getLogger("kasparro").warning(
+        "InsightAgent retry", extra={"extra_fields": {"agent": "InsightAgent", "stage": "generate", "event": "retry", "status": "retrying", "attempt": attempt, "error": str(exc)}}  # type: ignore[arg-type]
+    )
+
+
+def _scan_windows(scan: Dict[str, Any]) -> Tuple[Optional[Tuple[str, str]], Optional[Tuple[str, str]]]:
+    if not scan:
+        return None, None
+    return tuple(scan["period_before"]), tuple(scan["period_after"])  # type: ignore[return-value]
+
+
+def _segment_hypothesis(hypothesis_id: str, change: Dict[str, Any], scan: Dict[str, Any]) -> Hypothesis:
+    """Hypothesis for one `SegmentChange.to_dict()` from the segment scan."""
+    label = ", ".join(f"{k}={v}" for k, v in change["segment"].items())
+    before, after = scan["period_before"], scan["period_after"]
+    periods = f"{before[0]}..{before[1]} vs {after[0]}..{after[1]}"
+    share = change.get("share")
+    if share is None:
+        share_text = ""
+    elif abs(share) <= 1:
+        share_text = f" ({share:.0%} of the account ROAS change)"
+    else:
+        share_text = " (more than the net account change; other segments offset part of it)"
+
+    if change["roas_before"] is not None and change["roas_after"] is not None:
+        falling = change["roas_after"] < change["roas_before"]
+        verb = "fell" if falling else "rose"
+        statement = (
+            f"ROAS for {label} {verb} from {change['roas_before']:.2f} to {change['roas_after']:.2f} "
+            f"({periods}), contributing {change['contribution']:+.2f} ROAS points{share_text}."
+        )
+    else:
+        falling = change["contribution"] < 0
+        verb = "started" if change["roas_before"] is None else "stopped"
+        statement = (
+            f"Spend on {label} {verb} between periods ({periods}), "
+            f"contributing {change['contribution']:+.2f} ROAS points{share_text}."
+        )
+
+    if abs(change["rate_effect"]) >= abs(change["mix_effect"]):
+        ctr_delta = change.get("ctr_delta")
+        roas_delta = change.get("roas_delta") or 0.0
+        if ctr_delta is not None and ctr_delta * roas_delta > 0:
+            mechanism = (
+                "The segment's own ROAS moved together with its CTR, pointing at the ads themselves: "
+                "creative fatigue or audience saturation when falling, a stronger creative when rising."
+            )
+        else:
+            mechanism = (
+                "The segment's ROAS moved without a matching CTR change, so the shift is after the click: "
+                "conversion rate or order value changed."
+            )
+    else:
+        mechanism = (
+            "The segment's ROAS held roughly steady but its share of spend changed, "
+            "so the account mix shifted toward or away from it."
+        )
+
+    expected = (
+        f"ROAS and CTR for {label} in {after[0]}..{after[1]} differ from {before[0]}..{before[1]} "
+        f"beyond day-to-day noise; the other segments of the same dimension move less."
+    )
+    magnitude = abs(share) if share is not None else 0.0
+    confidence = "high" if magnitude >= 0.5 else "medium" if magnitude >= 0.2 else "low"
+    return Hypothesis(
+        id=hypothesis_id,
+        statement=statement,
+        mechanism=mechanism,
+        expected_signals=expected,
+        confidence=confidence,
+        claim=Claim(
+            "roas",
+            "decrease" if falling else "increase",
+            dict(change["segment"]),
+            *_scan_windows(scan),
+        ),
+    )
 
 
 class InsightAgent:
-    def __init__(self, logger: logging.Logger) -> None:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        llm_client: Optional[LLMClient] = None,
+        call_timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
         self.logger = logger
+        self.llm_client = llm_client
+        # shared across instances when built via `breaker_for("InsightAgent")`
+        self.breaker = breaker or CircuitBreaker("InsightAgent", logger)
+        policy = retry_policy or RetryPolicy()
+        # an open circuit is not retried: the caller falls back at once
+        self._generate_with_retry = retry(
+            max_attempts=policy.max_attempts,
+            base_delay=policy.base_delay,
+            backoff_factor=policy.backoff_factor,
+            giveup=(CircuitOpenError,),
+            on_retry=_log_retry,
+        )(self._generate_internal)
+        self._agenerate_with_retry = async_retry(
+            max_attempts=policy.max_attempts,
+            base_delay=policy.base_delay,
+            backoff_factor=policy.backoff_factor,
+            jitter=policy.jitter,
+            timeout=call_timeout,
+            giveup=(CircuitOpenError,),
+            on_retry=_log_retry,
+        )(self._agenerate_internal)
+
+    def _llm_generate(
+        self, user_query: str, data_summary: Dict[str, Any]
+    ) -> List[Hypothesis]:
+        assert self.llm_client is not None
+        prompt = self.llm_client.render(
+            "insight", {"user_query": user_query, "data_summary": data_summary}
+        )
+        items = self.llm_client.complete_json(prompt)
+        if not isinstance(items, list) or not items:
+            raise LLMError("Insight response must be a non-empty JSON list of hypotheses")
+        try:
+            return [
+                Hypothesis(
+                    **{k: str(item[k]) for k in HYPOTHESIS_FIELDS},
+                    claim=claim_from_dict(item["claim"]) if item.get("claim") is not None else None,
+                )
+                for item in items
+            ]
+        except (KeyError, TypeError, ValueError) as exc:
+            raise LLMError(f"Malformed hypothesis in insight response: {exc}") from exc
 
     def _fallback_generate(
         self, user_query: str, data_summary: Dict[str, Any]
@@ -26,12 +174,15 @@ class InsightAgent:
         roas_by_date = data_summary.get("roas_by_date", {})
         ctr_by_date = data_summary.get("ctr_by_date", {})
 
+        segment_changes = data_summary.get("segment_changes") or {}
         hypothesis_list: List[Hypothesis] = []
 
         if len(roas_by_date) >= 2:
             sorted_dates = sorted(roas_by_date.keys())
             first, last = sorted_dates[0], sorted_dates[-1]
             roas_change = roas_by_date[last] - roas_by_date[first]
+            # tested over the same periods as the segment scan, when there is one
+            windows = _scan_windows(segment_changes)
             if roas_change < 0:
                 hypothesis_list.append(
                     Hypothesis(
@@ -40,6 +191,7 @@ class InsightAgent:
                         mechanism="Later dates show lower average ROAS than earlier dates, while spend stays similar.",
                         expected_signals="Declining ROAS and CTR for the same creative_message or audience_type.",
                         confidence="medium",
+                        claim=Claim("roas", "decrease", {}, *windows),
                     )
                 )
             else:
@@ -50,9 +202,13 @@ class InsightAgent:
                         mechanism="Later dates show higher average ROAS than earlier dates.",
                         expected_signals="Increasing ROAS and CTR for key campaigns/adsets.",
                         confidence="medium",
+                        claim=Claim("roas", "increase", {}, *windows),
                     )
                 )
 
+        for i, change in enumerate(segment_changes.get("top_segments", []), start=1):
+            hypothesis_list.append(_segment_hypothesis(f"s{i}", change, segment_changes))
+
         if not hypothesis_list:
             hypothesis_list.append(
                 Hypothesis(
@@ -65,31 +221,66 @@ class InsightAgent:
             )
         return hypothesis_list
 
-    @retry(on_retry=lambda attempt, exc: logging.getLogger("kasparro").warning(
-        "InsightAgent retry", extra={"extra_fields": {"agent": "InsightAgent", "stage": "generate", "event": "retry", "status": "retrying", "attempt": attempt, "error": str(exc)}}  # type: ignore[arg-type]
-    ))
     def _generate_internal(
         self, user_query: str, data_summary: Dict[str, Any]
     ) -> List[Hypothesis]:
-        # This is where you'd call an LLM; we keep it deterministic and safe.
-        # To simulate occasional transient failure for retry testing, you could
-        # deliberately raise an exception based on input; we keep it stable here.
-        return self._fallback_generate(user_query, data_summary)
+        # Without a configured model client we stay deterministic and safe.
+        if self.llm_client is None:
+            return self._fallback_generate(user_query, data_summary)
+        return self.breaker.call(self._llm_generate, user_query, data_summary)
+
+    async def _agenerate_internal(
+        self, user_query: str, data_summary: Dict[str, Any]
+    ) -> List[Hypothesis]:
+        # the rule-based path and the client's blocking I/O both stay off the event loop
+        if self.llm_client is None:
+            return await run_in_thread(self._fallback_generate, user_query, data_summary)
+        return await self.breaker.acall(run_in_thread, self._llm_generate, user_query, data_summary)
 
     def generate(
         self, user_query: str, data_summary: Dict[str, Any]
     ) -> List[Hypothesis]:
         try:
-            hypotheses = self._generate_internal(user_query, data_summary)
+            return self._log_generated(self._generate_with_retry(user_query, data_summary))
+        except Exception as exc:  # noqa: BLE001
+            return self._fallback_after_error(user_query, data_summary, exc)
+
+    async def agenerate(
+        self, user_query: str, data_summary: Dict[str, Any]
+    ) -> List[Hypothesis]:
+        """Async `generate`: non-blocking backoff, per-call timeout and the
+        global concurrency limit from `src.utils.retry`."""
+        try:
+            return self._log_generated(await self._agenerate_with_retry(user_query, data_summary))
+        except Exception as exc:  # noqa: BLE001
+            return await asyncio.to_thread(self._fallback_after_error, user_query, data_summary, exc)
+
+    def _log_generated(self, hypotheses: List[Hypothesis]) -> List[Hypothesis]:
+        log_event(
+            self.logger,
+            agent="InsightAgent",
+            stage="generate",
+            event="generated_hypotheses",
+            extra={"count": len(hypotheses)},
+        )
+        return hypotheses
+
+    def _fallback_after_error(
+        self, user_query: str, data_summary: Dict[str, Any], exc: BaseException
+    ) -> List[Hypothesis]:
+        record_fallback("InsightAgent")
+        if isinstance(exc, CircuitOpenError):
+            # backend known to be down: no attempt was made, no delay paid
             log_event(
                 self.logger,
+                level=logging.WARNING,
                 agent="InsightAgent",
                 stage="generate",
-                event="generated_hypotheses",
-                extra={"count": len(hypotheses)},
+                event="fallback_circuit_open",
+                status="skipped",
+                extra={"circuit": self.breaker.snapshot()},
             )
-            return hypotheses
-        except Exception as exc:  # noqa: BLE001
+        else:
             log_event(
                 self.logger,
                 level=logging.ERROR,
@@ -99,17 +290,8 @@ class InsightAgent:
                 status="error",
                 extra={"error": str(exc)},
             )
-            # Last-resort fallback to keep pipeline running
-            return self._fallback_generate(user_query, data_summary)
+        # Last-resort fallback to keep pipeline running
+        return self._fallback_generate(user_query, data_summary)
 
     def to_dict(self, hypotheses: List[Hypothesis]) -> List[Dict[str, Any]]:
-        return [
-            {
-                "id": h.id,
-                "statement": h.statement,
-                "mechanism": h.mechanism,
-                "expected_signals": h.expected_signals,
-                "confidence": h.confidence,
-            }
-            for h in hypotheses
-        ]
+        return [hypothesis_to_dict(h) for h in hypotheses]
@@ -1,5 +1,10 @@
+import re
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+# "last 7 days", "past 2 weeks", "previous month", "this week"
+_WINDOW = re.compile(r"\b(?:last|past|previous|this)\s+(?:(\d+)\s+)?(day|week|month)s?\b", re.IGNORECASE)
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
 
 
 @dataclass
@@ -46,12 +51,22 @@ class PlannerAgent:
                 id="step-creative",
                 agent="CreativeAgent",
                 action="generate_creatives",
-                depends_on=["step-evaluator"],
+                # creatives only need the loaded rows, so they run alongside
+                # the insight / evaluator chain
+                depends_on=["step-data"],
             ),
         ]
         goal = f"Diagnose ROAS changes and recommend creatives for query: {user_query}"
         return Plan(overall_goal=goal, steps=steps)
 
+    def requested_days(self, user_query: str) -> Optional[int]:
+        """Days of data the query asks about ("last 7 days" -> 7), or None
+        when it names no window. Partitioned sources only read those days."""
+        match = _WINDOW.search(user_query)
+        if match is None:
+            return None
+        return int(match.group(1) or 1) * _UNIT_DAYS[match.group(2).lower()]
+
     def to_dict(self, plan: Plan) -> Dict[str, Any]:
         return {
             "overall_goal": plan.overall_goal,
@@ -0,0 +1,179 @@
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from src.utils.schema import COLUMN_DTYPES
+
+CREATIVE_TYPES = ["video", "static", "carousel", "collection"]
+CREATIVE_TYPE_WEIGHTS = [0.45, 0.35, 0.15, 0.05]
+AUDIENCE_TYPES = ["prospecting", "retargeting", "lookalike", "broad"]
+AUDIENCE_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+PLATFORMS = ["facebook", "instagram", "audience_network", "messenger"]
+PLATFORM_WEIGHTS = [0.55, 0.38, 0.05, 0.02]
+COUNTRIES = ["US", "GB", "CA", "AU", "DE", "FR", "IN", "BR", "MX", "JP"]
+COUNTRY_WEIGHTS = [0.42, 0.12, 0.09, 0.07, 0.07, 0.06, 0.06, 0.05, 0.04, 0.02]
+MESSAGE_TEMPLATES = [
+    "Fresh looks for {season}",
+    "New season, new styles",
+    "Up to 40% off {season} favourites",
+    "Free shipping on every order",
+    "Limited stock: shop the {season} drop",
+    "Loved by 10,000+ customers",
+]
+SEASONS = ["spring", "summer", "autumn", "winter"]
+
+
+@dataclass
+class DatasetSpec:
+    """Shape of a synthetic Facebook ads export.
+
+    Campaign and adset popularity follow a Zipf law with exponent `skew`, so
+    a few campaigns carry most of the rows as in real accounts. Each adset
+    runs `messages_per_adset` creatives and ROAS drifts down by
+    `roas_decay` over the date range (creative fatigue).
+    """
+
+    rows: int = 100_000
+    campaigns: int = 50
+    adsets_per_campaign: int = 8
+    messages_per_adset: int = 3
+    days: int = 90
+    start_date: str = "2024-01-01"
+    skew: float = 1.1
+    roas_decay: float = 0.3
+    seed: int = 42
+
+
+def _zipf_weights(n: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class SyntheticAdsGenerator:
+    """Deterministic, schema-valid ad rows for benchmarks.
+
+    The output depends only on the spec (including `seed`) and the chunk
+    size: chunk `i` draws from its own child of `SeedSequence(seed)`, so
+    any chunk can be regenerated without the ones before it.
+    """
+
+    def __init__(self, spec: DatasetSpec) -> None:
+        self.spec = spec
+        rng = np.random.default_rng(spec.seed)
+        n_adsets = spec.campaigns * spec.adsets_per_campaign
+
+        self.campaign_names = np.array([f"Campaign {i:04d}" for i in range(spec.campaigns)], dtype=object)
+        self.campaign_weights = _zipf_weights(spec.campaigns, spec.skew)
+        # adset i belongs to campaign i // adsets_per_campaign
+        self.adset_names = np.array(
+            [
+                f"{self.campaign_names[i // spec.adsets_per_campaign]} / Adset {i % spec.adsets_per_campaign:02d}"
+                for i in range(n_adsets)
+            ],
+            dtype=object,
+        )
+        self.adset_weights = _zipf_weights(spec.adsets_per_campaign, spec.skew)
+        # fixed per-adset traits so an adset keeps its audience and quality
+        self.adset_audience = rng.choice(len(AUDIENCE_TYPES), size=n_adsets, p=AUDIENCE_WEIGHTS)
+        self.adset_quality = rng.lognormal(mean=0.0, sigma=0.35, size=n_adsets)
+        self.adset_messages = np.array(
+            [
+                [
+                    MESSAGE_TEMPLATES[(i * 7 + k) % len(MESSAGE_TEMPLATES)].format(
+                        season=SEASONS[(i + k) % len(SEASONS)]
+                    )
+                    for k in range(spec.messages_per_adset)
+                ]
+                for i in range(n_adsets)
+            ],
+            dtype=object,
+        )
+        self.dates = pd.date_range(spec.start_date, periods=spec.days, freq="D")
+
+    def _chunk(self, size: int, index: int) -> pd.DataFrame:
+        spec = self.spec
+        rng = np.random.default_rng(np.random.SeedSequence(spec.seed, spawn_key=(index,)))
+
+        campaign = rng.choice(spec.campaigns, size=size, p=self.campaign_weights)
+        adset = campaign * spec.adsets_per_campaign + rng.choice(
+            spec.adsets_per_campaign, size=size, p=self.adset_weights
+        )
+        day = rng.integers(0, spec.days, size=size)
+        message = rng.integers(0, spec.messages_per_adset, size=size)
+
+        spend = np.round(rng.lognormal(mean=4.0, sigma=0.8, size=size), 2)
+        cpm = rng.lognormal(mean=2.2, sigma=0.3, size=size)
+        impressions = np.maximum(1, (spend / cpm * 1000).astype(np.int64))
+        quality = self.adset_quality[adset]
+        ctr_p = np.clip(rng.beta(2.0, 150.0, size=size) * quality, 0.0, 1.0)
+        clicks = rng.binomial(impressions, ctr_p)
+        purchases = rng.binomial(clicks, 0.04)
+        fatigue = 1.0 - spec.roas_decay * day / max(spec.days - 1, 1)
+        aov = rng.lognormal(mean=3.6, sigma=0.4, size=size)
+        revenue = np.round(purchases * aov * fatigue, 2)
+
+        return pd.DataFrame(
+            {
+                "campaign_name": self.campaign_names[campaign],
+                "adset_name": self.adset_names[adset],
+                "date": self.dates[day],
+                "spend": spend,
+                "impressions": impressions.astype(np.int32),
+                "clicks": clicks.astype(np.int32),
+                "ctr": np.round(clicks / impressions, 6),
+                "purchases": purchases.astype(np.int32),
+                "revenue": revenue,
+                "roas": np.round(np.where(spend > 0, revenue / np.where(spend > 0, spend, 1.0), 0.0), 4),
+                "creative_type": np.array(CREATIVE_TYPES, dtype=object)[
+                    rng.choice(len(CREATIVE_TYPES), size=size, p=CREATIVE_TYPE_WEIGHTS)
+                ],
+                "creative_message": self.adset_messages[adset, message],
+                "audience_type": np.array(AUDIENCE_TYPES, dtype=object)[self.adset_audience[adset]],
+                "platform": np.array(PLATFORMS, dtype=object)[
+                    rng.choice(len(PLATFORMS), size=size, p=PLATFORM_WEIGHTS)
+                ],
+                "country": np.array(COUNTRIES, dtype=object)[
+                    rng.choice(len(COUNTRIES), size=size, p=COUNTRY_WEIGHTS)
+                ],
+            },
+            columns=list(COLUMN_DTYPES),
+        )
+
+    def chunks(self, chunk_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        n_chunks = math.ceil(self.spec.rows / chunk_size) if self.spec.rows else 0
+        for i in range(n_chunks):
+            yield self._chunk(min(chunk_size, self.spec.rows - i * chunk_size), i)
+
+    def frame(self, chunk_size: int = 1_000_000) -> pd.DataFrame:
+        parts: List[pd.DataFrame] = list(self.chunks(chunk_size))
+        if not parts:
+            return self._chunk(0, 0)
+        return pd.concat(parts, ignore_index=True)
+
+    def write_csv(self, path: str | Path, chunk_size: int = 1_000_000) -> Path:
+        """Stream the dataset to CSV chunk by chunk (memory stays at one
+        chunk, so 10^8 rows are fine)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8", newline="") as f:
+            pd.DataFrame(columns=list(COLUMN_DTYPES)).to_csv(f, index=False)
+            for chunk in self.chunks(chunk_size):
+                chunk.to_csv(f, index=False, header=False, date_format="%Y-%m-%d")
+        tmp.replace(path)
+        return path
+
+
+def generate_csv(path: str | Path, spec: DatasetSpec, chunk_size: int = 1_000_000) -> Path:
+    return SyntheticAdsGenerator(spec).write_csv(path, chunk_size=chunk_size)
+
+
+def spec_from_config(config: Dict, rows: int) -> DatasetSpec:
+    """`DatasetSpec` for `rows` using the config `benchmark.dataset` block and
+    the top-level `random_seed`."""
+    settings = dict(config.get("benchmark", {}).get("dataset", {}))
+    return DatasetSpec(rows=rows, seed=int(config.get("random_seed", 42)), **settings)
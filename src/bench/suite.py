@@ -0,0 +1,254 @@
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+import yaml
+
+from src.agents.creative_agent import CreativeAgent
+from src.agents.data_agent import DataAgent, DataSummary
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.agents.insight_agent import InsightAgent
+from src.bench.generator import generate_csv, spec_from_config
+from src.orchestrator.main import load_config, run_pipeline
+from src.utils.aggregate_state import AggregateState, load_state, save_state
+from src.utils.segments import scanner_from_config
+from src.utils.logging_utils import setup_logger
+
+BASELINE_VERSION = 1
+
+
+@dataclass
+class CaseResult:
+    name: str
+    rows: int
+    seconds: float  # best of `repeat`
+    rows_per_s: float
+    peak_mb: float  # traced allocations during one extra, separate run
+
+
+def measure(name: str, rows: int, func: Callable[[], Any], repeat: int = 3) -> CaseResult:
+    """Best-of-`repeat` wall time, then one run under tracemalloc for the
+    peak (kept separate so tracing overhead does not skew the timings)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return CaseResult(
+        name=name,
+        rows=rows,
+        seconds=best,
+        rows_per_s=rows / best if best > 0 else float("inf"),
+        peak_mb=peak / 1e6,
+    )
+
+
+def _pipeline_config(base: Dict[str, Any], data_path: Path, workdir: Path, streaming: bool) -> Path:
+    config = json.loads(json.dumps(base))  # deep copy
+    config["data"]["path"] = str(data_path)
+    config["data"]["streaming"] = streaming
+    config["data"]["incremental"] = False
+    config.setdefault("cache", {})["enabled"] = False
+    config.setdefault("tracing", {})["enabled"] = False
+    for key in ("insights_json", "creatives_json", "report_md"):
+        config["paths"][key] = str(workdir / "reports" / Path(config["paths"][key]).name)
+    config["paths"]["creative_memo"] = str(workdir / "cache" / "creative_memo.json")
+    (workdir / "reports").mkdir(parents=True, exist_ok=True)
+    path = workdir / "config.yaml"
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    return path
+
+
+def run_suite(
+    config_path: str = "config/config.yaml",
+    rows: Sequence[int] = (1_000, 100_000),
+    repeat: int = 3,
+    streaming: bool = False,
+    workdir: Optional[str | Path] = None,
+) -> Dict[str, Any]:
+    """Generate one dataset per size and time each stage against it.
+
+    Cases per size: `data_agent.load_and_validate`,
+    `aggregate_state.save_load` (the incremental state round trip, date x
+    dimensions table included), `insight_agent.generate`,
+    `evaluator_agent.evaluate`, `creative_agent.generate_frame` and the full
+    `run_pipeline`. Returns a baseline-format document.
+    """
+    base = load_config(config_path)
+    tmp = tempfile.TemporaryDirectory(prefix="kasparro-bench-") if workdir is None else None
+    root = Path(workdir or tmp.name)  # type: ignore[union-attr]
+    logger = setup_logger(str(root / "bench.log"))
+    thresholds = base["thresholds"]
+    results: List[CaseResult] = []
+
+    try:
+        for n in rows:
+            spec = spec_from_config(base, n)
+            data_path = generate_csv(root / f"ads_{n}.csv", spec)
+
+            data_agent = DataAgent(
+                date_column=base["data"]["date_column"],
+                streaming=streaming,
+                chunk_size=base["data"].get("chunk_size", 100_000),
+                low_ctr_threshold=thresholds["low_ctr"],
+                low_roas_threshold=thresholds["low_roas"],
+                segment_scanner=scanner_from_config(base),
+            )
+            summary: DataSummary = data_agent.load_and_validate(str(data_path))
+            insight_input = data_agent.summarize_for_insight(summary)
+            insight = InsightAgent(logger)
+            hypotheses = insight.generate("Analyze ROAS drop", insight_input)
+            evaluator = EvaluatorAgent(
+                logger,
+                n_resamples=base.get("evaluation", {}).get("n_resamples", 2000),
+                seed=int(base.get("random_seed", 42)),
+            )
+            creative = CreativeAgent(
+                logger,
+                low_ctr_threshold=thresholds["low_ctr"],
+                low_roas_threshold=thresholds["low_roas"],
+                dedupe=base.get("creative", {}).get("dedupe", False),
+            )
+            pipeline_config = _pipeline_config(base, data_path, root / f"run_{n}", streaming)
+            state_path = root / f"state_{n}" / "agg_state.json"
+            state = AggregateState(aggregates=summary.aggregates)
+
+            cases: Dict[str, Callable[[], Any]] = {
+                "data_agent.load_and_validate": lambda: data_agent.load_and_validate(str(data_path)),
+                "aggregate_state.save_load": lambda: (save_state(state_path, state), load_state(state_path)),
+                "insight_agent.generate": lambda: insight.generate("Analyze ROAS drop", insight_input),
+                "evaluator_agent.evaluate": lambda: evaluator.evaluate(
+                    summary.full_df,
+                    hypotheses,
+                    roas_by_date=summary.roas_by_date,
+                    segment_table=data_agent.segment_table(summary),
+                ),
+                "creative_agent.generate_frame": lambda: creative.generate_frame(summary.low_ctr_rows),
+                "run_pipeline": lambda: run_pipeline("Analyze ROAS drop", config_path=str(pipeline_config)),
+            }
+            for name, func in cases.items():
+                results.append(measure(name, n, func, repeat=repeat))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    return {
+        "version": BASELINE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "settings": {"seed": base.get("random_seed", 42), "streaming": streaming, "repeat": repeat},
+        "results": [asdict(r) for r in results],
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    time_tolerance: float = 0.25,
+    memory_tolerance: float = 0.25,
+    min_seconds: float = 0.005,
+) -> List[Dict[str, Any]]:
+    """Per-case ratios against the baseline; `regressed` marks cases slower
+    or larger than the baseline by more than the tolerance. Cases faster
+    than `min_seconds` are too noisy to judge on time. Cases missing from
+    the baseline are skipped."""
+    previous = {(r["name"], r["rows"]): r for r in baseline.get("results", [])}
+    rows: List[Dict[str, Any]] = []
+    for r in current["results"]:
+        old = previous.get((r["name"], r["rows"]))
+        if old is None:
+            continue
+        time_ratio = r["seconds"] / old["seconds"] if old["seconds"] > 0 else 1.0
+        memory_ratio = r["peak_mb"] / old["peak_mb"] if old["peak_mb"] > 0 else 1.0
+        rows.append(
+            {
+                "name": r["name"],
+                "rows": r["rows"],
+                "time_ratio": time_ratio,
+                "memory_ratio": memory_ratio,
+                "regressed": (time_ratio > 1 + time_tolerance and r["seconds"] > min_seconds)
+                or memory_ratio > 1 + memory_tolerance,
+            }
+        )
+    return rows
+
+
+def format_results(current: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+    ratios = {(c["name"], c["rows"]): c for c in comparison or []}
+    lines = [f"{'case':32} {'rows':>11} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}  vs baseline"]
+    for r in current["results"]:
+        c = ratios.get((r["name"], r["rows"]))
+        versus = (
+            f"x{c['time_ratio']:.2f} time, x{c['memory_ratio']:.2f} mem{'  REGRESSED' if c['regressed'] else ''}"
+            if c
+            else "-"
+        )
+        lines.append(
+            f"{r['name']:32} {r['rows']:>11,} {r['seconds']:>9.4f} {r['rows_per_s']:>12,.0f} {r['peak_mb']:>9.1f}  {versus}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--rows", type=float, nargs="+", help="dataset sizes, e.g. 1e3 1e5 1e6")
+    parser.add_argument("--repeat", type=int, help="timed runs per case (best is kept)")
+    parser.add_argument("--streaming", action="store_true", help="use the chunked DataAgent path")
+    parser.add_argument("--baseline", help="baseline JSON (default: benchmark.baseline)")
+    parser.add_argument("--update-baseline", action="store_true", help="overwrite the baseline with this run")
+    args = parser.parse_args(argv)
+
+    settings = load_config(args.config).get("benchmark", {})
+    current = run_suite(
+        config_path=args.config,
+        rows=[int(n) for n in (args.rows or settings.get("rows", [1_000, 100_000]))],
+        repeat=args.repeat or settings.get("repeat", 3),
+        streaming=args.streaming,
+    )
+    baseline_path = Path(args.baseline or settings.get("baseline", "benchmarks/baseline.json"))
+
+    if args.update_baseline or not baseline_path.exists():
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(current, indent=2), encoding="utf-8")
+        print(format_results(current))
+        print(f"\nbaseline written to {baseline_path}")
+        return 0
+
+    comparison = compare(
+        current,
+        json.loads(baseline_path.read_text(encoding="utf-8")),
+        time_tolerance=settings.get("time_tolerance", 0.25),
+        memory_tolerance=settings.get("memory_tolerance", 0.25),
+    )
+    print(format_results(current, comparison))
+    regressed = [c for c in comparison if c["regressed"]]
+    if regressed:
+        print(f"\n{len(regressed)} case(s) regressed against {baseline_path}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
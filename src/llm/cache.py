@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils.writers import atomic_open
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Content address of a request: SHA-256 of its canonical JSON."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache for model responses.
+
+    One JSON file per request key under `cache_dir`. Entries older than
+    `ttl_seconds` are treated as misses and removed. File mtimes double as
+    LRU access times: a hit touches the file, and once more than
+    `max_entries` files exist the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        ttl_seconds: Optional[float] = 86400.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._count = sum(1 for _ in self.cache_dir.glob("*.json"))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        os.utime(path)  # mark as recently used
+        with self._lock:
+            self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response: str) -> None:
+        path = self._path(key)
+        is_new = not path.exists()
+        with atomic_open(path) as f:
+            json.dump({"created": time.time(), "response": response}, f)
+        with self._lock:
+            if is_new:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # only scans the directory when over the limit, not on every put
+        entries = list(self.cache_dir.glob("*.json"))
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            by_access = sorted(entries, key=lambda p: p.stat().st_mtime)
+            for path in by_access[:excess]:
+                path.unlink(missing_ok=True)
+        self._count = len(entries) - max(excess, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Protocol
+
+from src.llm.cache import ResponseCache, request_key
+from src.llm.prompts import PromptLibrary
+
+
+class LLMError(RuntimeError):
+    """Raised when the model backend fails or returns an unusable response."""
+
+
+class Backend(Protocol):
+    def complete(self, payload: Dict[str, Any]) -> str: ...
+
+
+class HTTPBackend:
+    """POSTs `{"model", "prompt", **params}` as JSON and reads `completion`."""
+
+    def __init__(self, endpoint: str, timeout: float = 30.0, headers: Optional[Dict[str, str]] = None) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def complete(self, payload: Dict[str, Any]) -> str:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode("utf-8"),
+            headers=self.headers,
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError) as exc:
+            raise LLMError(f"LLM request to {self.endpoint} failed: {exc}") from exc
+        if "completion" not in body:
+            raise LLMError(f"LLM response has no 'completion' field: {sorted(body)}")
+        return str(body["completion"])
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class LLMClient:
+    """Model client shared by all agents.
+
+    - prompts come from a `PromptLibrary` loaded once (`render`);
+    - responses are looked up in / stored to a content-addressed
+      `ResponseCache` keyed by model, prompt and params;
+    - concurrent identical requests are coalesced: only the first goes to the
+      backend, the others wait on its result;
+    - `complete_many` sends a batch concurrently, deduplicating repeats.
+
+    Backend latencies are recorded for `stats()`.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        model: str = "default",
+        cache: Optional[ResponseCache] = None,
+        prompts: Optional[PromptLibrary] = None,
+        max_concurrency: int = 8,
+    ) -> None:
+        self.backend = backend
+        self.model = model
+        self.cache = cache
+        self.prompts = prompts
+        self.max_concurrency = max_concurrency
+        self._inflight: Dict[str, Future[str]] = {}
+        self._lock = threading.Lock()
+        self._latencies_ms: List[float] = []
+        self.backend_calls = 0
+        self.coalesced = 0
+
+    def render(self, prompt_name: str, inputs: Optional[Dict[str, Any]] = None) -> str:
+        if self.prompts is None:
+            raise LLMError("LLMClient has no PromptLibrary configured")
+        return self.prompts.render(prompt_name, inputs)
+
+    def complete(self, prompt: str, **params: Any) -> str:
+        payload = {"model": self.model, "prompt": prompt, **params}
+        key = request_key(payload)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        assert future is not None
+
+        if not owner:
+            return future.result()
+
+        try:
+            # another owner may have finished and cached it since our lookup
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                future.set_result(cached)
+                return cached
+            start = time.perf_counter()
+            response = self.backend.complete(payload)
+            with self._lock:
+                self._latencies_ms.append((time.perf_counter() - start) * 1000.0)
+                self.backend_calls += 1
+            if self.cache is not None:
+                self.cache.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def complete_many(self, prompts: List[str], **params: Any) -> List[str]:
+        """Complete a batch concurrently; identical prompts are sent once."""
+        unique = list(dict.fromkeys(prompts))
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(unique) or 1)) as pool:
+            results = dict(zip(unique, pool.map(lambda p: self.complete(p, **params), unique)))
+        return [results[p] for p in prompts]
+
+    def complete_json(self, prompt: str, **params: Any) -> Any:
+        """`complete` and parse the response as JSON (fenced blocks allowed)."""
+        text = self.complete(prompt, **params).strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.find("\n") + 1 :] if "\n" in text else text
+        try:
+            return json.loads(text)
+        except ValueError as exc:
+            raise LLMError(f"LLM response is not valid JSON: {exc}") from exc
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            stats: Dict[str, Any] = {
+                "backend_calls": self.backend_calls,
+                "coalesced": self.coalesced,
+                "latency_p50_ms": _percentile(latencies, 0.50),
+                "latency_p95_ms": _percentile(latencies, 0.95),
+                "latency_p99_ms": _percentile(latencies, 0.99),
+            }
+        if self.cache is not None:
+            stats.update({f"cache_{k}": v for k, v in self.cache.stats().items()})
+        return stats
+
+
+def build_llm_client(config: Dict[str, Any]) -> Optional[LLMClient]:
+    """Client from the `llm` config block, or None when it is disabled."""
+    llm_cfg = config.get("llm", {})
+    if not llm_cfg.get("enabled"):
+        return None
+    cache_dir = config["paths"].get("llm_cache_dir")
+    return LLMClient(
+        HTTPBackend(llm_cfg["endpoint"], timeout=llm_cfg.get("timeout", 30.0)),
+        model=llm_cfg.get("model", "default"),
+        cache=ResponseCache(
+            cache_dir,
+            ttl_seconds=llm_cfg.get("cache_ttl_seconds", 86400.0),
+            max_entries=llm_cfg.get("cache_max_entries", 10_000),
+        )
+        if cache_dir
+        else None,
+        prompts=PromptLibrary(config["paths"].get("prompts_dir", "prompts")),
+        max_concurrency=llm_cfg.get("max_concurrency", 8),
+    )
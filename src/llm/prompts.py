@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+from string import Template
+from typing import Any, Dict
+
+
+class PromptLibrary:
+    """Loads every `prompts/*.md` template once and renders them with inputs.
+
+    Templates may use `$name` placeholders (`string.Template`); inputs are also
+    appended as a JSON block under an `## Input data` heading so prompts
+    without placeholders still receive them.
+    """
+
+    def __init__(self, prompts_dir: str | Path = "prompts") -> None:
+        self.prompts_dir = Path(prompts_dir)
+        self._templates: Dict[str, Template] = {
+            p.stem: Template(p.read_text(encoding="utf-8"))
+            for p in sorted(self.prompts_dir.glob("*.md"))
+        }
+
+    def names(self) -> list[str]:
+        return sorted(self._templates)
+
+    def render(self, name: str, inputs: Dict[str, Any] | None = None) -> str:
+        if name not in self._templates:
+            raise KeyError(f"Unknown prompt {name!r}; available: {self.names()}")
+        inputs = inputs or {}
+        text = self._templates[name].safe_substitute(
+            {k: v if isinstance(v, str) else json.dumps(v, default=str) for k, v in inputs.items()}
+        )
+        if inputs:
+            payload = json.dumps(inputs, indent=2, sort_keys=True, default=str)
+            text = f"{text.rstrip()}\n\n## Input data\n\n```json\n{payload}\n```\n"
+        return text
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Responder = Callable[[Dict[str, Any]], str]
+
+
+def echo_responder(payload: Dict[str, Any]) -> str:
+    """A short JSON document describing the request."""
+    return json.dumps({"model": payload.get("model"), "prompt_chars": len(payload.get("prompt", ""))})
+
+
+def _prompt_inputs(prompt: str) -> Tuple[str, Dict[str, Any]]:
+    """(title, inputs) of a prompt rendered by `PromptLibrary`."""
+    title = prompt.split("\n", 1)[0].lstrip("# ").strip()
+    _, marker, rest = prompt.partition("## Input data\n\n```json\n")
+    try:
+        inputs = json.loads(rest.rsplit("```", 1)[0]) if marker else {}
+    except ValueError:
+        inputs = {}
+    return title, inputs if isinstance(inputs, dict) else {}
+
+
+def _stub_hypotheses(inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    roas = inputs.get("data_summary", {}).get("roas_by_date") or {}
+    days = sorted(roas)
+    direction = "decrease" if len(days) >= 2 and roas[days[-1]] < roas[days[0]] else "increase"
+    return [
+        {
+            "id": "stub-1",
+            "statement": f"Account ROAS shows a {direction} over the period.",
+            "mechanism": "Stub model: read off the first and last day of the ROAS trend.",
+            "expected_signals": f"ROAS {direction} between the earlier and later dates.",
+            "confidence": "low",
+            "claim": {"metric": "roas", "direction": direction, "segment": {}, "before": None, "after": None},
+        }
+    ]
+
+
+def _stub_verdicts(inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": h.get("id"),
+            "statement": h.get("statement"),
+            "validation_result": "inconclusive",
+            "confidence_score": 0.5,
+            "evidence": "Stub model: the hypothesis was not tested.",
+        }
+        for h in inputs.get("hypotheses", [])
+        if isinstance(h, dict)
+    ]
+
+
+def agent_responder(payload: Dict[str, Any]) -> str:
+    """Deterministic default: answers the Insight and Evaluator prompts with
+    the JSON lists those agents parse (hypotheses, verdicts), so runs against
+    the stub go through the model path rather than the fallback. Other
+    prompts get `echo_responder`."""
+    title, inputs = _prompt_inputs(str(payload.get("prompt", "")))
+    if title == "Insight Agent Prompt":
+        return json.dumps(_stub_hypotheses(inputs))
+    if title == "Evaluator Agent Prompt":
+        return json.dumps(_stub_verdicts(inputs))
+    return echo_responder(payload)
+
+
+class StubLLMServer:
+    """Local HTTP stand-in for a model endpoint, for tests and offline runs.
+
+    Accepts `POST` with the `HTTPBackend` payload and answers
+    `{"completion": responder(payload)}` after `latency_ms`; the default
+    responder is `agent_responder`. Binds to an
+    ephemeral port by default; use as a context manager::
+
+        with StubLLMServer(latency_ms=20) as server:
+            client = LLMClient(HTTPBackend(server.url))
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Responder] = None,
+        latency_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.responder = responder or agent_responder
+        self.latency_ms = latency_ms
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.send_error(400, "invalid JSON")
+                    return
+                with stub._count_lock:
+                    stub.request_count += 1
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000.0)
+                body = json.dumps({"completion": stub.responder(payload)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass  # keep test output quiet
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/complete"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stub LLM server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubLLMServer(latency_ms=args.latency_ms, port=args.port).start()
+    print(f"stub LLM listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.agents.data_agent import DataSummary
+from src.agents.planner_agent import Plan, PlanStep
+from src.orchestrator.results import HypothesisStore
+from src.utils.logging_utils import log_event
+from src.utils.tracing import span
+
+
+class PlanExecutionError(RuntimeError):
+    """Raised when a plan is malformed or one of its steps fails."""
+
+
+@dataclass
+class ExecutionContext:
+    """Typed hand-off between plan steps.
+
+    Each step reads the fields produced by its dependencies and fills its own;
+    no two steps write the same field, so steps running concurrently do not
+    need to lock the context.
+    """
+
+    user_query: str
+    data_summary: DataSummary
+    insight_input: Optional[Dict[str, Any]] = None
+    # filled by the insight step (hypotheses), then the evaluator (verdicts)
+    results: HypothesisStore = field(default_factory=HypothesisStore)
+    # CreativeAgent.generate_frame output (CREATIVE_COLUMNS)
+    creatives: Optional[pd.DataFrame] = None
+    # step id -> wall time in ms
+    step_timings: Dict[str, float] = field(default_factory=dict)
+    # agents that answered with a fallback after a failed model call
+    fallbacks: List[str] = field(default_factory=list)
+
+
+StepHandler = Callable[[ExecutionContext], None]
+AsyncStepHandler = Callable[[ExecutionContext], Awaitable[None]]
+
+
+def _check_plan(plan: Plan, handlers: Dict[str, Any]) -> None:
+    ids = [s.id for s in plan.steps]
+    if len(set(ids)) != len(ids):
+        raise PlanExecutionError(f"Duplicate step ids in plan: {ids}")
+    known = set(ids)
+    for step in plan.steps:
+        if step.action not in handlers:
+            raise PlanExecutionError(f"No handler for action {step.action!r} (step {step.id})")
+        unknown = [d for d in step.depends_on if d not in known]
+        if unknown:
+            raise PlanExecutionError(f"Step {step.id} depends on unknown steps {unknown}")
+
+    # Kahn's algorithm; anything left over sits on a cycle
+    remaining = {s.id: set(s.depends_on) for s in plan.steps}
+    while True:
+        ready = [sid for sid, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for sid in ready:
+            del remaining[sid]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        raise PlanExecutionError(f"Plan has a dependency cycle among {sorted(remaining)}")
+
+
+class PlanExecutor:
+    """Runs a `Plan` as a DAG, executing steps whose dependencies are done
+    concurrently on a thread pool.
+
+    `handlers` maps `PlanStep.action` to a callable taking the shared
+    `ExecutionContext`. The first failing step aborts the run; steps already
+    running are allowed to finish, nothing new is scheduled.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, StepHandler],
+        logger: logging.Logger,
+        max_workers: int = 4,
+    ) -> None:
+        self.handlers = handlers
+        self.logger = logger
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def _run_step(self, step: PlanStep, ctx: ExecutionContext) -> None:
+        start = time.perf_counter()
+        with span(f"step.{step.id}", agent=step.agent, action=step.action):
+            self.handlers[step.action](ctx)
+        runtime_ms = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            ctx.step_timings[step.id] = runtime_ms
+        _log_step_finished(self.logger, step, runtime_ms)
+
+    def run(self, plan: Plan, ctx: ExecutionContext) -> ExecutionContext:
+        _check_plan(plan, self.handlers)
+
+        pending = {s.id: s for s in plan.steps}
+        done: set[str] = set()
+        running: Dict[Future[None], PlanStep] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plan") as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if set(s.depends_on) <= done]
+                for step in ready:
+                    del pending[step.id]
+                    # copy the context so step spans nest under the caller's span
+                    running[pool.submit(contextvars.copy_context().run, self._run_step, step, ctx)] = step
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    exc = future.exception()
+                    if exc is not None:
+                        _log_step_failed(self.logger, step, exc)
+                        raise PlanExecutionError(f"Step {step.id} failed: {exc}") from exc
+                    done.add(step.id)
+        return ctx
+
+
+class AsyncPlanExecutor:
+    """`PlanExecutor` for coroutine handlers: ready steps run as tasks on the
+    current event loop, so many queries can share one loop.
+
+    On the first failing step the remaining running steps are cancelled.
+    """
+
+    def __init__(self, handlers: Dict[str, AsyncStepHandler], logger: logging.Logger) -> None:
+        self.handlers = handlers
+        self.logger = logger
+
+    async def _run_step(self, step: PlanStep, ctx: ExecutionContext) -> None:
+        start = time.perf_counter()
+        with span(f"step.{step.id}", agent=step.agent, action=step.action):
+            await self.handlers[step.action](ctx)
+        runtime_ms = (time.perf_counter() - start) * 1000.0
+        # single-threaded event loop: no lock needed
+        ctx.step_timings[step.id] = runtime_ms
+        _log_step_finished(self.logger, step, runtime_ms)
+
+    async def run(self, plan: Plan, ctx: ExecutionContext) -> ExecutionContext:
+        _check_plan(plan, self.handlers)
+
+        pending = {s.id: s for s in plan.steps}
+        done: set[str] = set()
+        running: Dict[asyncio.Task[None], PlanStep] = {}
+
+        while pending or running:
+            ready = [s for s in pending.values() if set(s.depends_on) <= done]
+            for step in ready:
+                del pending[step.id]
+                running[asyncio.create_task(self._run_step(step, ctx))] = step
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                step = running.pop(task)
+                exc = task.exception()
+                if exc is not None:
+                    _log_step_failed(self.logger, step, exc)
+                    for other in running:
+                        other.cancel()
+                    raise PlanExecutionError(f"Step {step.id} failed: {exc}") from exc
+                done.add(step.id)
+        return ctx
+
+
+def _log_step_finished(logger: logging.Logger, step: PlanStep, runtime_ms: float) -> None:
+    log_event(
+        logger,
+        agent=step.agent,
+        stage="execute",
+        event="step_finished",
+        runtime_ms=runtime_ms,
+        extra={"step_id": step.id, "action": step.action},
+    )
+
+
+def _log_step_failed(logger: logging.Logger, step: PlanStep, exc: BaseException) -> None:
+    log_event(
+        logger,
+        level=logging.ERROR,
+        agent=step.agent,
+        stage="execute",
+        event="step_failed",
+        status="error",
+        extra={"step_id": step.id, "error": str(exc)},
+    )
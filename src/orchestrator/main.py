@@ -1,18 +1,39 @@
+import asyncio
+import itertools
 import json
+import math
 import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import pandas as pd
 import yaml
 
-from src.agents.planner_agent import PlannerAgent
-from src.agents.data_agent import DataAgent
+from src.agents.planner_agent import Plan, PlannerAgent
+from src.agents.data_agent import DataAgent, DataSummary
 from src.agents.insight_agent import InsightAgent
 from src.agents.evaluator_agent import EvaluatorAgent
 from src.agents.creative_agent import CreativeAgent
+from src.llm.client import LLMClient, build_llm_client
+from src.orchestrator.executor import AsyncPlanExecutor, ExecutionContext, PlanExecutor
+from src.orchestrator.result_cache import ResultCache, dataset_fingerprint, result_cache_from_config, result_key
+from src.orchestrator.results import HypothesisStore
+from src.orchestrator.sharding import ShardingOptions, run_sharded
+from src.utils.circuit_breaker import breaker_for, breaker_states, recording_fallbacks
+from src.utils.cube import cube_store_from_config
 from src.utils.logging_utils import setup_logger, log_event
+from src.utils.partitions import DateRange
 from src.utils.metrics import timed
+from src.utils import tracing
+from src.utils.retry import RetryPolicy, set_global_concurrency
+from src.utils.schema import SchemaValidationResult
+from src.utils.segments import scanner_from_config
+from src.utils.tracing import Tracer, span
+from src.utils.writers import atomic_open, compressed_path, write_json_array, write_jsonl
 
 
 def load_config(path: str | Path) -> Dict[str, Any]:
@@ -26,26 +47,248 @@ def ensure_dirs(config: Dict[str, Any]) -> None:
         p.parent.mkdir(parents=True, exist_ok=True)
 
 
-def run_pipeline(user_query: str, config_path: str = "config/config.yaml") -> None:
+@dataclass
+class PipelineContext:
+    """State shared by every query against one dataset.
+
+    Built once by `prepare_context`, so config parsing, logger setup, data
+    loading and aggregation are paid once per process rather than per query.
+    """
+
+    config: Dict[str, Any]
+    logger: logging.Logger
+    data_agent: DataAgent
+    data_summary: DataSummary
+    load_metrics: Dict[str, float]
+    llm_client: Optional[LLMClient] = None
+    tracer: Optional[Tracer] = None
+    # sharded mode: recommendations generated per shard while loading
+    creatives: Optional[pd.DataFrame] = None
+    # query-result cache and the fingerprint of the data loaded into this context
+    result_cache: Optional[ResultCache] = None
+    data_fingerprint: Optional[str] = None
+
+
+@dataclass
+class OutputPaths:
+    insights_json: Path
+    creatives_json: Path
+    report_md: Path
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "OutputPaths":
+        return cls(
+            insights_json=Path(config["paths"]["insights_json"]),
+            creatives_json=Path(config["paths"]["creatives_json"]),
+            report_md=Path(config["paths"]["report_md"]),
+        )
+
+    @classmethod
+    def in_dir(cls, directory: Path) -> "OutputPaths":
+        directory.mkdir(parents=True, exist_ok=True)
+        return cls(
+            insights_json=directory / "insights.json",
+            creatives_json=directory / "creatives.json",
+            report_md=directory / "report.md",
+        )
+
+
+@dataclass(frozen=True)
+class OutputOptions:
+    """How artifacts are written (config `output` block).
+
+    - `creatives_format`: `json` (one array) or `jsonl` (one object per line,
+      written to `creatives.jsonl`).
+    - `compression`: `None` or `"gzip"` for the JSON artifacts (adds `.gz`).
+    - `report_limit`: hypotheses / creatives listed in `report.md` before the
+      section is cut off with a count; 0 (the default) lists everything.
+    - `report_paginate`: put creatives past the limit on continuation pages
+      (`report.p2.md`, ...) instead of only counting them.
+    """
+
+    creatives_format: str = "json"
+    compression: Optional[str] = None
+    report_limit: int = 0
+    report_paginate: bool = False
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "OutputOptions":
+        block = config.get("output", {})
+        compression = block.get("compression")
+        creatives_format = block.get("creatives_format", "json")
+        if creatives_format not in ("json", "jsonl"):
+            raise ValueError(f"output.creatives_format must be 'json' or 'jsonl', got {creatives_format!r}")
+        return cls(
+            creatives_format=creatives_format,
+            compression=None if compression in (None, "none") else compression,
+            report_limit=int(block.get("report_limit", 0)),
+            report_paginate=bool(block.get("report_paginate", False)),
+        )
+
+    def insights_path(self, outputs: OutputPaths) -> Path:
+        return compressed_path(outputs.insights_json, self.compression)
+
+    def creatives_path(self, outputs: OutputPaths) -> Path:
+        path = outputs.creatives_json
+        if self.creatives_format == "jsonl":
+            path = path.with_suffix(".jsonl")
+        return compressed_path(path, self.compression)
+
+    def artifact_path(self, outputs: OutputPaths, role: str, name: str) -> Path:
+        """Where the artifact `role` (as returned by `_write_outputs`) goes;
+        `name` is its file name, which places report continuation pages."""
+        if role == "insights":
+            return self.insights_path(outputs)
+        if role == "creatives":
+            return self.creatives_path(outputs)
+        return outputs.report_md.with_name(name)
+
+    def stale_paths(self, outputs: OutputPaths, written: Iterable[Path]) -> List[Path]:
+        """Artifacts a run with other options would have written next to
+        `written`: the other format and compression variants, and report
+        continuation pages past the last one written."""
+        stem, suffix = outputs.report_md.stem, outputs.report_md.suffix
+        candidates = [
+            compressed_path(path, compression)
+            for path in (
+                outputs.insights_json,
+                outputs.creatives_json,
+                outputs.creatives_json.with_suffix(".jsonl"),
+            )
+            for compression in (None, "gzip")
+        ]
+        candidates += outputs.report_md.parent.glob(f"{stem}.p[0-9]*{suffix}")
+        keep = set(written)
+        return [path for path in candidates if path not in keep]
+
+
+def _remove_stale(options: OutputOptions, outputs: OutputPaths, written: Iterable[Path]) -> None:
+    """Delete leftovers of earlier runs with other output options, so the
+    directory holds exactly one result."""
+    for path in options.stale_paths(outputs, written):
+        path.unlink(missing_ok=True)
+
+
+def data_range(config: Dict[str, Any], user_query: Optional[str] = None) -> DateRange:
+    """`data.date_range` from the config; a window named in the query
+    ("last 7 days") replaces a configured `last_days`."""
+    configured = DateRange.from_config(config["data"].get("date_range"))
+    days = PlannerAgent().requested_days(user_query) if user_query else None
+    return replace(configured, last_days=days) if days else configured
+
+
+def prepare_context(config_path: str = "config/config.yaml", user_query: Optional[str] = None) -> PipelineContext:
+    """Load config and data once. `user_query` (single-query runs) narrows
+    the date range read from a partitioned source."""
     config = load_config(config_path)
     ensure_dirs(config)
 
-    logger = setup_logger(config["paths"]["log_file"])
-    log_event(
-        logger,
-        agent="Orchestrator",
-        stage="start",
-        event="pipeline_start",
-        extra={"user_query": user_query},
+    logger = setup_logger(config["paths"]["log_file"], **config.get("logging", {}))
+    tracer = build_tracer(config, logger)
+    result_cache = result_cache_from_config(config)
+    # taken before the load: a file rewritten meanwhile must not match
+    fingerprint = dataset_fingerprint(config["data"]["path"]) if result_cache is not None else None
+    loaded = load_data(config, logger, tracer, user_query)
+    return PipelineContext(
+        config=config,
+        logger=logger,
+        data_agent=loaded.data_agent,
+        data_summary=loaded.data_summary,
+        load_metrics=loaded.load_metrics,
+        llm_client=build_llm_client(config),
+        tracer=tracer,
+        creatives=loaded.creatives,
+        result_cache=result_cache,
+        data_fingerprint=fingerprint,
     )
 
-    metrics: Dict[str, float] = {}
 
-    with timed(metrics, "data_agent_ms"):
-        data_agent = DataAgent(date_column=config["data"]["date_column"])
-        data_summary = data_agent.load_and_validate(config["data"]["path"])
+@dataclass
+class LoadedData:
+    """What `load_data` produces; the data half of a `PipelineContext`."""
+
+    data_agent: DataAgent
+    data_summary: DataSummary
+    load_metrics: Dict[str, float]
+    creatives: Optional[pd.DataFrame] = None
 
-    if not data_summary.schema_result.ok:
+
+def load_data(
+    config: Dict[str, Any],
+    logger: logging.Logger,
+    tracer: Optional[Tracer] = None,
+    user_query: Optional[str] = None,
+) -> LoadedData:
+    """Load, validate and aggregate `data.path`. Exits the process (after
+    logging the problems) when the schema check fails."""
+    load_metrics: Dict[str, float] = {}
+    with timed(load_metrics, "data_agent_ms"), tracing.using(tracer), span("data.load", agent="DataAgent") as load_span:
+        data_agent = DataAgent(
+            date_column=config["data"]["date_column"],
+            streaming=config["data"].get("streaming", False),
+            chunk_size=config["data"].get("chunk_size", 100_000),
+            low_ctr_threshold=config["thresholds"]["low_ctr"],
+            low_roas_threshold=config["thresholds"]["low_roas"],
+            cache_dir=config["paths"]["cache_dir"] if config.get("cache", {}).get("enabled") else None,
+            incremental=config["data"].get("incremental", False),
+            state_path=config["paths"].get("aggregate_state"),
+            segment_scanner=scanner_from_config(config),
+            cube_store=cube_store_from_config(config),
+            date_range=data_range(config, user_query),
+            read_workers=config["data"].get("read_workers", 4),
+            on_bad_file=config["data"].get("on_bad_file", "fail"),
+            max_low_rows_per_adset=config["data"].get("max_low_rows_per_adset"),
+        )
+        sharding = ShardingOptions.from_config(config)
+        creatives: Optional[pd.DataFrame] = None
+        if sharding.enabled:
+            data_summary = data_agent.load_rows(config["data"]["path"])
+            if data_summary.schema_result.ok:
+                data_summary, creatives = run_sharded(
+                    data_agent, data_summary, _creative_agent(config, logger), sharding, logger
+                )
+        else:
+            data_summary = data_agent.load_and_validate(config["data"]["path"])
+        load_span.rows = data_summary.overview.get("rows")
+
+    bad_files = {path: r for path, r in data_summary.file_schemas.items() if not r.ok}
+    if data_summary.partitions:
+        log_event(
+            logger,
+            agent="DataAgent",
+            stage="load",
+            event="partitions_read",
+            status="ok" if not bad_files else "warning",
+            extra=data_summary.partitions,
+        )
+    if data_summary.cube is not None:
+        log_event(
+            logger,
+            agent="DataAgent",
+            stage="load",
+            event="cube_refreshed",
+            extra={
+                "cells": len(data_summary.cube),
+                "cuboids": len(data_summary.cube.cuboids),
+                "last_date": str(data_summary.cube.last_date.date()) if data_summary.cube.last_date is not None else None,
+            },
+        )
+    if data_summary.schema_result.ok:
+        # on_bad_file: skip -- the load went ahead without these files
+        for path, result in bad_files.items():
+            log_event(
+                logger,
+                level=logging.WARNING,
+                agent="DataAgent",
+                stage="schema",
+                event="partition_skipped",
+                status="warning",
+                extra={"file": path, **_schema_problems(result)},
+            )
+    else:
+        extra = _schema_problems(data_summary.schema_result)
+        if bad_files:
+            extra["files"] = {path: _schema_problems(r) for path, r in bad_files.items()}
         log_event(
             logger,
             level=logging.ERROR,
@@ -53,133 +296,718 @@ def run_pipeline(user_query: str, config_path: str = "config/config.yaml") -> No
             stage="schema",
             event="schema_validation_failed",
             status="error",
-            extra={
-                "missing_columns": data_summary.schema_result.missing,
-                "extra_columns": data_summary.schema_result.extra,
-            },
+            extra=extra,
         )
         raise SystemExit("Schema validation failed. See logs for details.")
 
-    with timed(metrics, "planner_ms"):
+    return LoadedData(data_agent, data_summary, load_metrics, creatives)
+
+
+def _schema_problems(result: SchemaValidationResult) -> Dict[str, Any]:
+    problems: Dict[str, Any] = {
+        "missing_columns": result.missing,
+        "extra_columns": result.extra,
+        "dtype_mismatches": result.dtype_mismatches,
+    }
+    if result.error:
+        problems["error"] = result.error
+    return problems
+
+
+def build_tracer(config: Dict[str, Any], logger: logging.Logger) -> Optional[Tracer]:
+    settings = config.get("tracing", {})
+    if not settings.get("enabled", False):
+        return None
+    # spans are only kept for the Chrome trace; the log has every one
+    max_spans = int(settings.get("max_spans", 100_000)) if settings.get("chrome_trace") else 0
+    return Tracer(logger, memory=settings.get("memory", "rss"), max_spans=max_spans)
+
+
+def export_trace(ctx: PipelineContext) -> Optional[Path]:
+    """Write the Chrome trace to `tracing.chrome_trace`, if configured."""
+    path = ctx.config.get("tracing", {}).get("chrome_trace")
+    if ctx.tracer is None or not path:
+        return None
+    return ctx.tracer.export_chrome_trace(path)
+
+
+@dataclass
+class QueryAgents:
+    """Per-query agents; stateless between calls, so one set can serve many
+    (concurrent) queries and share the creative memo."""
+
+    insight: InsightAgent
+    evaluator: EvaluatorAgent
+    creative: CreativeAgent
+
+
+def build_agents(ctx: PipelineContext) -> QueryAgents:
+    config, logger = ctx.config, ctx.logger
+    call_timeout = config.get("concurrency", {}).get("call_timeout")
+    retry_policy = RetryPolicy.from_config(config.get("retry"))
+    breaker_settings = config.get("circuit_breaker", {})
+    evaluation = config.get("evaluation", {})
+    return QueryAgents(
+        insight=InsightAgent(
+            logger,
+            llm_client=ctx.llm_client,
+            call_timeout=call_timeout,
+            retry_policy=retry_policy,
+            breaker=breaker_for("InsightAgent", logger, **breaker_settings),
+        ),
+        evaluator=EvaluatorAgent(
+            logger,
+            llm_client=ctx.llm_client,
+            call_timeout=call_timeout,
+            retry_policy=retry_policy,
+            breaker=breaker_for("EvaluatorAgent", logger, **breaker_settings),
+            n_resamples=evaluation.get("n_resamples", 2000),
+            alpha=evaluation.get("alpha", 0.05),
+            seed=int(config.get("random_seed", 42)),
+            date_column=config["data"]["date_column"],
+        ),
+        creative=_creative_agent(config, logger),
+    )
+
+
+def _creative_agent(config: Dict[str, Any], logger: logging.Logger) -> CreativeAgent:
+    return CreativeAgent(
+        logger,
+        low_ctr_threshold=config["thresholds"]["low_ctr"],
+        low_roas_threshold=config["thresholds"]["low_roas"],
+        dedupe=config.get("creative", {}).get("dedupe", False),
+        memo_path=config["paths"].get("creative_memo"),
+        memo_max_entries=config.get("creative", {}).get("memo_max_entries", 10000),
+    )
+
+
+def _plan_query(ctx: PipelineContext, user_query: str, metrics: Dict[str, float]) -> Plan:
+    log_event(
+        ctx.logger,
+        agent="Orchestrator",
+        stage="start",
+        event="pipeline_start",
+        extra={"user_query": user_query},
+    )
+
+    with timed(metrics, "planner_ms"), span("plan", agent="PlannerAgent"):
         planner = PlannerAgent()
         plan = planner.build_plan(user_query)
         plan_dict = planner.to_dict(plan)
         log_event(
-            logger,
+            ctx.logger,
             agent="PlannerAgent",
             stage="plan",
             event="plan_built",
             extra={"plan": plan_dict},
         )
+    return plan
 
-    with timed(metrics, "insight_agent_ms"):
-        insight_agent = InsightAgent(logger)
-        insight_input = data_agent.summarize_for_insight(data_summary)
-        hypotheses = insight_agent.generate(user_query, insight_input)
-        hypotheses_dict = insight_agent.to_dict(hypotheses)
 
-    with timed(metrics, "evaluator_agent_ms"):
-        evaluator_agent = EvaluatorAgent(logger)
-        evaluated = evaluator_agent.evaluate(data_summary.full_df, hypotheses)
-        evaluated_dict = evaluator_agent.to_dict(evaluated)
+def _finish_query(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
+    agents: QueryAgents,
+    ec: ExecutionContext,
+    metrics: Dict[str, float],
+    cache_key: Optional[str] = None,
+) -> Dict[str, float]:
+    """Record step timings, write the three output files, cache them under
+    `cache_key` (if given) and log the run."""
+    for step_id, runtime_ms in ec.step_timings.items():
+        metrics[f"{step_id.replace('-', '_')}_ms"] = runtime_ms
 
-    with timed(metrics, "creative_agent_ms"):
-        creative_agent = CreativeAgent(
-            logger,
-            low_ctr_threshold=config["thresholds"]["low_ctr"],
-            low_roas_threshold=config["thresholds"]["low_roas"],
-        )
-        creatives = creative_agent.generate(data_summary.full_df)
-        creatives_dict = creative_agent.to_dict(creatives)
+    creatives = ec.creatives if ec.creatives is not None else pd.DataFrame()
+    with span("write_outputs", rows=len(creatives)):
+        artifacts = _write_outputs(ctx, user_query, outputs, agents, ec.results, creatives, metrics)
+    if cache_key is not None and ctx.result_cache is not None:
+        _store_result(ctx, ctx.result_cache, cache_key, user_query, artifacts, ec.fallbacks)
 
-    insights_path = Path(config["paths"]["insights_json"])
-    creatives_path = Path(config["paths"]["creatives_json"])
-    report_path = Path(config["paths"]["report_md"])
+    log_event(
+        ctx.logger,
+        agent="Orchestrator",
+        stage="end",
+        event="pipeline_finished",
+        extra={
+            "metrics": metrics,
+            **(
+                {"llm": ctx.llm_client.stats(), "circuits": breaker_states()}
+                if ctx.llm_client is not None
+                else {}
+            ),
+        },
+    )
+    return metrics
 
-    with insights_path.open("w", encoding="utf-8") as f:
-        json.dump(
-            [
-                {
-                    **item,
-                    "evaluated": next(
-                        (
-                            ed
-                            for ed in evaluated_dict
-                            if ed["id"] == item["id"]
-                        ),
-                        None,
-                    ),
-                }
-                for item in hypotheses_dict
-            ],
-            f,
-            indent=2,
-        )
 
-    with creatives_path.open("w", encoding="utf-8") as f:
-        json.dump(creatives_dict, f, indent=2)
+def _write_outputs(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
+    agents: QueryAgents,
+    results: HypothesisStore,
+    creatives: pd.DataFrame,
+    metrics: Dict[str, float],
+) -> Dict[str, Path]:
+    """Stream every artifact to disk through atomic temp files; no artifact
+    is held in memory as a whole. Returns the files written by role
+    (`insights`, `creatives`, `report`, `page2`, ...)."""
+    options = OutputOptions.from_config(ctx.config)
+    artifacts = {
+        "insights": options.insights_path(outputs),
+        "creatives": options.creatives_path(outputs),
+        "report": outputs.report_md,
+    }
+
+    with atomic_open(artifacts["insights"], options.compression) as f:
+        write_json_array(f, results.insight_items())
 
-    with report_path.open("w", encoding="utf-8") as f:
-        f.write(
-            _build_report_md(
+    with atomic_open(artifacts["creatives"], options.compression) as f:
+        records = agents.creative.iter_records(creatives)
+        if options.creatives_format == "jsonl":
+            write_jsonl(f, records)
+        else:
+            write_json_array(f, records)
+
+    limit = options.report_limit or None
+    pages: List[Path] = []
+    if options.report_paginate and limit and len(creatives) > limit:
+        stem, suffix = outputs.report_md.stem, outputs.report_md.suffix
+        pages = [
+            outputs.report_md.with_name(f"{stem}.p{n}{suffix}")
+            for n in range(2, math.ceil(len(creatives) / limit) + 1)
+        ]
+
+    creative_records = agents.creative.iter_records(creatives)
+    with atomic_open(outputs.report_md) as f:
+        f.writelines(
+            _report_lines(
                 user_query,
-                data_summary.full_df,
-                evaluated_dict,
-                creatives_dict,
+                ctx.data_summary.overview,
+                results.evaluated_items(),
+                results.evaluated_count,
+                creative_records,
+                len(creatives),
                 metrics,
+                limit=limit,
+                creatives_file=options.creatives_path(outputs).name,
+                pages=[p.name for p in pages],
             )
         )
+    # continuation pages pick up where the main report stopped
+    for number, page in enumerate(pages, start=2):
+        with atomic_open(page) as f:
+            f.write(f"# Creative recommendations (page {number} of {len(pages) + 1})\n\n")
+            for c in itertools.islice(creative_records, limit):
+                f.writelines(_creative_lines(c))
+        artifacts[f"page{number}"] = page
+    _remove_stale(options, outputs, artifacts.values())
+    return artifacts
+
 
+def _restore_result(
+    config: Dict[str, Any],
+    logger: logging.Logger,
+    cache: ResultCache,
+    key: str,
+    user_query: str,
+    outputs: OutputPaths,
+    log_miss: bool = True,
+) -> bool:
+    """Copy a cached result for `key` to `outputs`; True on a hit."""
+    start = time.perf_counter()
+    options = OutputOptions.from_config(config)
+    meta = cache.restore(key, lambda role, name: options.artifact_path(outputs, role, name))
+    if meta is None:
+        if log_miss:
+            log_event(logger, agent="Orchestrator", stage="cache", event="result_cache_miss", extra={"key": key[:16]})
+        return False
+    _remove_stale(options, outputs, [options.artifact_path(outputs, r, n) for r, n in meta["artifacts"].items()])
     log_event(
         logger,
         agent="Orchestrator",
-        stage="end",
-        event="pipeline_finished",
-        extra={"metrics": metrics},
+        stage="cache",
+        event="result_cache_hit",
+        runtime_ms=(time.perf_counter() - start) * 1000.0,
+        extra={
+            "key": key[:16],
+            "user_query": user_query,
+            "cached_query": meta.get("user_query"),
+            "age_seconds": round(time.time() - meta["created"], 1),
+            "artifacts": sorted(meta["artifacts"]),
+        },
     )
+    return True
 
 
-def _build_report_md(
+def _store_result(
+    ctx: PipelineContext,
+    cache: ResultCache,
+    key: str,
     user_query: str,
-    df: pd.DataFrame,
-    evaluated_hypotheses: list[dict[str, Any]],
-    creatives: list[dict[str, Any]],
+    artifacts: Dict[str, Path],
+    fallbacks: Sequence[str] = (),
+) -> None:
+    if fallbacks:
+        # this query's answer is (partly) a fallback for failed model calls; do not pin it
+        log_event(
+            ctx.logger,
+            agent="Orchestrator",
+            stage="cache",
+            event="result_cache_skipped",
+            status="skipped",
+            extra={"key": key[:16], "reason": "model calls failed", "fallbacks": sorted(set(fallbacks))},
+        )
+        return
+    try:
+        stored = cache.put(key, artifacts, {"user_query": user_query})
+    except OSError as exc:
+        log_event(
+            ctx.logger,
+            level=logging.WARNING,
+            agent="Orchestrator",
+            stage="cache",
+            event="result_cache_skipped",
+            status="warning",
+            extra={"key": key[:16], "reason": str(exc)},
+        )
+        return
+    log_event(
+        ctx.logger,
+        agent="Orchestrator",
+        stage="cache",
+        event="result_cache_stored" if stored else "result_cache_skipped",
+        status="ok" if stored else "skipped",
+        extra={"key": key[:16], **({} if stored else {"reason": "larger than result_cache.max_mb"}), **cache.stats()},
+    )
+
+
+def _cached_query(
+    ctx: PipelineContext, user_query: str, outputs: OutputPaths
+) -> Tuple[Optional[str], Optional[Dict[str, float]]]:
+    """(cache key, metrics of a cache hit). The key is None without a result
+    cache; the metrics are None on a miss."""
+    if ctx.result_cache is None or ctx.data_fingerprint is None:
+        return None, None
+    start = time.perf_counter()
+    key = result_key(user_query, ctx.data_fingerprint, ctx.config)
+    if not _restore_result(ctx.config, ctx.logger, ctx.result_cache, key, user_query, outputs):
+        return key, None
+    return key, {"result_cache_ms": (time.perf_counter() - start) * 1000.0}
+
+
+def run_query(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
+    metrics: Optional[Dict[str, float]] = None,
+    agents: Optional[QueryAgents] = None,
+    query_id: Optional[str] = None,
+) -> Dict[str, float]:
+    """Run the planner → insight → evaluator → creative stages for one query.
+
+    `metrics` may be pre-seeded (e.g. with the data load time) so it shows up
+    in the report; the per-stage timings are added and the dict is returned.
+    The run is traced as a `query` span when `ctx.tracer` is set.
+    """
+    with tracing.using(ctx.tracer), span("query", query_id=query_id or uuid.uuid4().hex[:8]):
+        cache_key, cached = _cached_query(ctx, user_query, outputs)
+        if cached is not None:
+            return cached
+        return _run_query(ctx, user_query, outputs, dict(metrics or {}), agents or build_agents(ctx), cache_key)
+
+
+def _run_query(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
     metrics: Dict[str, float],
-) -> str:
-    lines: list[str] = []
-    lines.append("# Facebook ROAS Analysis\n")
-    lines.append("## User query\n\n")
-    lines.append(f"> {user_query}\n")
-    lines.append("## Data overview\n")
-    lines.append(f"- Rows: **{len(df)}**\n")
-    if "campaign_name" in df.columns:
-        lines.append(f"- Campaigns: **{df['campaign_name'].nunique()}**\n")
-    if "date" in df.columns:
-        lines.append(f"- Date range: **{df['date'].min()}** → **{df['date'].max()}**\n")
-    if "roas" in df.columns:
-        lines.append(f"- ROAS: mean={df['roas'].mean():.2f}, min={df['roas'].min():.2f}, max={df['roas'].max():.2f}\n")
-
-    lines.append("\n## Hypotheses & evaluation\n")
-    for h in evaluated_hypotheses:
-        lines.append(f"### {h['id']}: {h['statement']}\n")
-        lines.append(f"- Result: **{h['validation_result']}**\n")
-        lines.append(f"- Confidence: **{h['confidence_score']:.2f}**\n")
-        lines.append(f"- Evidence: {h['evidence']}\n\n")
-
-    lines.append("## Creative recommendations (for low CTR / low ROAS)\n")
-    if not creatives:
-        lines.append("No underperforming ads met the low CTR / low ROAS thresholds.\n")
-    else:
-        for c in creatives:
-            lines.append(f"### {c['campaign_name']} / {c['adset_name']}\n")
-            lines.append(f"- Old message: {c['old_message']}\n")
-            lines.append(f"- New headline: {c['new_headline']}\n")
-            lines.append(f"- New primary text: {c['new_primary_text']}\n")
-            lines.append(f"- New CTA: **{c['new_cta']}**\n")
-            lines.append(f"- Rationale: {c['rationale']}\n\n")
-
-    lines.append("## Runtime metrics (ms)\n")
-    for k, v in metrics.items():
-        lines.append(f"- {k}: {v:.1f}\n")
+    agents: QueryAgents,
+    cache_key: Optional[str] = None,
+) -> Dict[str, float]:
+    ec = _execute_plan(ctx, user_query, metrics, agents)
+    return _finish_query(ctx, user_query, outputs, agents, ec, metrics, cache_key)
+
+
+def execute_query(
+    ctx: PipelineContext,
+    user_query: str,
+    metrics: Optional[Dict[str, float]] = None,
+    agents: Optional[QueryAgents] = None,
+    query_id: Optional[str] = None,
+) -> Tuple[ExecutionContext, Dict[str, float]]:
+    """`run_query` without the output files: the executed plan's context
+    (hypotheses, verdicts, creatives) and the step timings."""
+    metrics = dict(metrics or {})
+    with tracing.using(ctx.tracer), span("query", query_id=query_id or uuid.uuid4().hex[:8]):
+        ec = _execute_plan(ctx, user_query, metrics, agents or build_agents(ctx))
+    for step_id, runtime_ms in ec.step_timings.items():
+        metrics[f"{step_id.replace('-', '_')}_ms"] = runtime_ms
+    return ec, metrics
+
+
+def _execute_plan(
+    ctx: PipelineContext,
+    user_query: str,
+    metrics: Dict[str, float],
+    agents: QueryAgents,
+) -> ExecutionContext:
+    plan = _plan_query(ctx, user_query, metrics)
+    data_agent = ctx.data_agent
+
+    def summarize_data(ec: ExecutionContext) -> None:
+        ec.insight_input = data_agent.summarize_for_insight(ec.data_summary)
 
-    return "".join(lines)
+    def generate_hypotheses(ec: ExecutionContext) -> None:
+        ec.results.add_hypotheses(agents.insight.generate(ec.user_query, ec.insight_input or {}))
+
+    def evaluate_hypotheses(ec: ExecutionContext) -> None:
+        ec.results.record_evaluations(
+            agents.evaluator.evaluate(
+                ec.data_summary.full_df,
+                ec.results.hypotheses(),
+                roas_by_date=ec.data_summary.roas_by_date,
+                segment_table=data_agent.segment_table(ec.data_summary),
+            )
+        )
+
+    def generate_creatives(ec: ExecutionContext) -> None:
+        if ctx.creatives is not None:
+            ec.creatives = ctx.creatives  # built per shard while loading
+            return
+        ec.creatives = agents.creative.generate_frame(ec.data_summary.low_ctr_rows)
+
+    executor = PlanExecutor(
+        {
+            "summarize_data": summarize_data,
+            "generate_hypotheses": generate_hypotheses,
+            "evaluate_hypotheses": evaluate_hypotheses,
+            "generate_creatives": generate_creatives,
+        },
+        ctx.logger,
+        max_workers=ctx.config.get("executor", {}).get("max_workers", 4),
+    )
+    ec = ExecutionContext(user_query=user_query, data_summary=ctx.data_summary)
+    with timed(metrics, "execute_plan_ms"), span("execute_plan"), recording_fallbacks(ec.fallbacks):
+        return executor.run(plan, ec)
+
+
+async def arun_query(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
+    metrics: Optional[Dict[str, float]] = None,
+    agents: Optional[QueryAgents] = None,
+    query_id: Optional[str] = None,
+) -> Dict[str, float]:
+    """`run_query` on the running event loop.
+
+    Steps run as tasks via `AsyncPlanExecutor` and use the agents' async
+    methods, so model calls and backoff sleeps from many queries overlap
+    instead of blocking one another. Outputs are identical to `run_query`.
+    """
+    with tracing.using(ctx.tracer), span("query", query_id=query_id or uuid.uuid4().hex[:8]):
+        cache_key, cached = await asyncio.to_thread(_cached_query, ctx, user_query, outputs)
+        if cached is not None:
+            return cached
+        return await _arun_query(ctx, user_query, outputs, dict(metrics or {}), agents or build_agents(ctx), cache_key)
+
+
+async def _arun_query(
+    ctx: PipelineContext,
+    user_query: str,
+    outputs: OutputPaths,
+    metrics: Dict[str, float],
+    agents: QueryAgents,
+    cache_key: Optional[str] = None,
+) -> Dict[str, float]:
+    plan = _plan_query(ctx, user_query, metrics)
+    data_agent = ctx.data_agent
+
+    async def summarize_data(ec: ExecutionContext) -> None:
+        ec.insight_input = data_agent.summarize_for_insight(ec.data_summary)
+
+    async def generate_hypotheses(ec: ExecutionContext) -> None:
+        ec.results.add_hypotheses(await agents.insight.agenerate(ec.user_query, ec.insight_input or {}))
+
+    async def evaluate_hypotheses(ec: ExecutionContext) -> None:
+        ec.results.record_evaluations(
+            await agents.evaluator.aevaluate(
+                ec.data_summary.full_df,
+                ec.results.hypotheses(),
+                roas_by_date=ec.data_summary.roas_by_date,
+                segment_table=data_agent.segment_table(ec.data_summary),
+            )
+        )
+
+    async def generate_creatives(ec: ExecutionContext) -> None:
+        if ctx.creatives is not None:
+            ec.creatives = ctx.creatives  # built per shard while loading
+            return
+        ec.creatives = await agents.creative.agenerate_frame(ec.data_summary.low_ctr_rows)
+
+    executor = AsyncPlanExecutor(
+        {
+            "summarize_data": summarize_data,
+            "generate_hypotheses": generate_hypotheses,
+            "evaluate_hypotheses": evaluate_hypotheses,
+            "generate_creatives": generate_creatives,
+        },
+        ctx.logger,
+    )
+    ec = ExecutionContext(user_query=user_query, data_summary=ctx.data_summary)
+    with timed(metrics, "execute_plan_ms"), span("execute_plan"), recording_fallbacks(ec.fallbacks):
+        ec = await executor.run(plan, ec)
+    return await asyncio.to_thread(_finish_query, ctx, user_query, outputs, agents, ec, metrics, cache_key)
+
+
+def _served_from_cache(config_path: str, user_query: str) -> bool:
+    """Single-query runs: restore a cached result before any data is
+    loaded. A miss is logged later, by `run_query`."""
+    config = load_config(config_path)
+    cache = result_cache_from_config(config)
+    if cache is None:
+        return False
+    ensure_dirs(config)
+    logger = setup_logger(config["paths"]["log_file"], **config.get("logging", {}))
+    key = result_key(user_query, dataset_fingerprint(config["data"]["path"]), config)
+    return _restore_result(config, logger, cache, key, user_query, OutputPaths.from_config(config), log_miss=False)
+
+
+def run_pipeline(user_query: str, config_path: str = "config/config.yaml") -> None:
+    if _served_from_cache(config_path, user_query):
+        return
+    ctx = prepare_context(config_path, user_query)
+    run_query(ctx, user_query, OutputPaths.from_config(ctx.config), metrics=ctx.load_metrics)
+    export_trace(ctx)
+
+
+async def arun_pipeline(user_query: str, config_path: str = "config/config.yaml") -> None:
+    if await asyncio.to_thread(_served_from_cache, config_path, user_query):
+        return
+    ctx = prepare_context(config_path, user_query)
+    set_global_concurrency(ctx.config.get("concurrency", {}).get("max_calls", 16))
+    await arun_query(ctx, user_query, OutputPaths.from_config(ctx.config), metrics=ctx.load_metrics)
+    export_trace(ctx)
+
+
+def load_queries(path: str | Path) -> List[Dict[str, str]]:
+    """Read a JSONL file of queries.
+
+    Each line is an object with the query text under `user_query` or `query`
+    and an optional id under `query_id`, `id` or `request_id`; lines without
+    an id are numbered. Blank lines are ignored.
+    """
+    queries: List[Dict[str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            text = item.get("user_query") or item.get("query")
+            if not text:
+                raise ValueError(f"Query line {len(queries) + 1} has no 'user_query' or 'query' field")
+            query_id = item.get("query_id") or item.get("id") or item.get("request_id")
+            queries.append(
+                {
+                    "query_id": str(query_id or f"q{len(queries) + 1:04d}"),
+                    "user_query": str(text),
+                }
+            )
+    return queries
+
+
+def _safe_dirname(query_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", query_id) or "query"
+
+
+def run_batch(
+    queries_path: str | Path,
+    config_path: str = "config/config.yaml",
+    output_dir: str | Path | None = None,
+) -> Dict[str, Any]:
+    """Run every query in a JSONL file against one loaded dataset.
+
+    Outputs go to `<output_dir>/<query_id>/` (default `paths.batch_dir`), and
+    a `batch_summary.json` with per-query and aggregate timings is written to
+    `output_dir`. The summary is also returned.
+    """
+    batch_start = time.perf_counter()
+    ctx = prepare_context(config_path)
+    queries = load_queries(queries_path)
+    out_root = _start_batch(ctx, queries, queries_path, output_dir)
+
+    agents = build_agents(ctx)
+    results: List[Dict[str, Any]] = []
+    for q in queries:
+        query_metrics = run_query(
+            ctx,
+            q["user_query"],
+            OutputPaths.in_dir(out_root / _safe_dirname(q["query_id"])),
+            agents=agents,
+            query_id=q["query_id"],
+        )
+        results.append({**q, "metrics": query_metrics})
+    return _finish_batch(ctx, out_root, results, batch_start)
+
+
+async def arun_batch(
+    queries_path: str | Path,
+    config_path: str = "config/config.yaml",
+    output_dir: str | Path | None = None,
+    max_concurrent_queries: Optional[int] = None,
+) -> Dict[str, Any]:
+    """`run_batch` with the queries running concurrently on one event loop.
+
+    At most `max_concurrent_queries` (default `concurrency.max_queries`) are
+    in flight; model calls across all of them are further capped by
+    `concurrency.max_calls` through the global semaphore in
+    `src.utils.retry`. Per-query outputs and the summary match `run_batch`;
+    `results` keep the input order.
+    """
+    batch_start = time.perf_counter()
+    ctx = prepare_context(config_path)
+    queries = load_queries(queries_path)
+    out_root = _start_batch(ctx, queries, queries_path, output_dir)
+
+    concurrency = ctx.config.get("concurrency", {})
+    set_global_concurrency(concurrency.get("max_calls", 16))
+    gate = asyncio.Semaphore(max_concurrent_queries or concurrency.get("max_queries", 8))
+    agents = build_agents(ctx)
+
+    async def one(q: Dict[str, str]) -> Dict[str, Any]:
+        async with gate:
+            query_metrics = await arun_query(
+                ctx,
+                q["user_query"],
+                OutputPaths.in_dir(out_root / _safe_dirname(q["query_id"])),
+                agents=agents,
+                query_id=q["query_id"],
+            )
+        return {**q, "metrics": query_metrics}
+
+    results = list(await asyncio.gather(*(one(q) for q in queries)))
+    return _finish_batch(ctx, out_root, results, batch_start)
+
+
+def _start_batch(
+    ctx: PipelineContext,
+    queries: List[Dict[str, str]],
+    queries_path: str | Path,
+    output_dir: str | Path | None,
+) -> Path:
+    out_root = Path(output_dir or ctx.config["paths"].get("batch_dir", "reports/batch"))
+    out_root.mkdir(parents=True, exist_ok=True)
+    log_event(
+        ctx.logger,
+        agent="Orchestrator",
+        stage="batch",
+        event="batch_start",
+        extra={"queries": len(queries), "queries_path": str(queries_path)},
+    )
+    return out_root
+
+
+# top-level per-query timings; the others (step_*_ms) are parts of these
+QUERY_TIMINGS = ("planner_ms", "execute_plan_ms", "result_cache_ms")
+
+
+def _finish_batch(
+    ctx: PipelineContext,
+    out_root: Path,
+    results: List[Dict[str, Any]],
+    batch_start: float,
+) -> Dict[str, Any]:
+    total_ms = (time.perf_counter() - batch_start) * 1000.0
+    # step timings happen inside execute_plan_ms; count each query once
+    query_ms = sum(r["metrics"].get(k, 0.0) for r in results for k in QUERY_TIMINGS)
+    summary: Dict[str, Any] = {
+        "queries": len(results),
+        "data_load_ms": ctx.load_metrics.get("data_agent_ms", 0.0),
+        "queries_ms": query_ms,
+        "mean_query_ms": query_ms / len(results) if results else 0.0,
+        "total_ms": total_ms,
+        "results": results,
+    }
+    with (out_root / "batch_summary.json").open("w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    log_event(
+        ctx.logger,
+        agent="Orchestrator",
+        stage="batch",
+        event="batch_finished",
+        runtime_ms=total_ms,
+        extra={k: v for k, v in summary.items() if k != "results"},
+    )
+    export_trace(ctx)
+    return summary
+
+
+def _creative_lines(c: Dict[str, Any]) -> Iterator[str]:
+    yield f"### {c['campaign_name']} / {c['adset_name']}\n"
+    if c.get("row_count", 1) > 1:
+        yield f"- Affected rows: {c['row_count']} ({c['first_date']} → {c['last_date']})\n"
+    yield f"- Old message: {c['old_message']}\n"
+    yield f"- New headline: {c['new_headline']}\n"
+    yield f"- New primary text: {c['new_primary_text']}\n"
+    yield f"- New CTA: **{c['new_cta']}**\n"
+    yield f"- Rationale: {c['rationale']}\n\n"
+
+
+def _report_lines(
+    user_query: str,
+    overview: Dict[str, Any],
+    evaluated_hypotheses: Iterable[Dict[str, Any]],
+    evaluated_total: int,
+    creatives: Iterator[Dict[str, Any]],
+    creatives_total: int,
+    metrics: Dict[str, float],
+    limit: Optional[int] = None,
+    creatives_file: str = "creatives.json",
+    pages: Sequence[str] = (),
+) -> Iterator[str]:
+    """`report.md`, line by line; the sections are consumed lazily.
+
+    With `limit`, each section lists at most that many entries and says how
+    many were left out (and on which `pages`, for creatives). Only the first
+    `limit` items of `creatives` are consumed.
+    """
+    yield "# Facebook ROAS Analysis\n"
+    yield "## User query\n\n"
+    yield f"> {user_query}\n"
+    yield "## Data overview\n"
+    yield f"- Rows: **{overview.get('rows', 0)}**\n"
+    if "campaigns" in overview:
+        yield f"- Campaigns: **{overview['campaigns']}**\n"
+    if "date_min" in overview:
+        yield f"- Date range: **{overview['date_min']}** → **{overview['date_max']}**\n"
+    if "roas_mean" in overview:
+        yield (
+            f"- ROAS: mean={overview['roas_mean']:.2f}, min={overview['roas_min']:.2f}, max={overview['roas_max']:.2f}\n"
+        )
+    if "roas_overall" in overview:
+        yield f"- Overall ROAS (revenue / spend): **{overview['roas_overall']:.2f}**\n"
+
+    yield "\n## Hypotheses & evaluation\n"
+    for h in itertools.islice(evaluated_hypotheses, limit):
+        yield f"### {h['id']}: {h['statement']}\n"
+        yield f"- Result: **{h['validation_result']}**\n"
+        yield f"- Confidence: **{h['confidence_score']:.2f}**\n"
+        yield f"- Evidence: {h['evidence']}\n\n"
+    if limit is not None and evaluated_total > limit:
+        yield f"_{evaluated_total - limit} more evaluated hypotheses are listed in insights.json._\n\n"
+
+    yield "## Creative recommendations (for low CTR / low ROAS)\n"
+    if creatives_total == 0:
+        yield "No underperforming ads met the low CTR / low ROAS thresholds.\n"
+    for c in itertools.islice(creatives, limit):
+        yield from _creative_lines(c)
+    if limit is not None and creatives_total > limit:
+        where = ", ".join(pages) if pages else creatives_file
+        yield f"_{creatives_total - limit} more recommendations: see {where}._\n\n"
+
+    yield "## Runtime metrics (ms)\n"
+    for k, v in metrics.items():
+        yield f"- {k}: {v:.1f}\n"
@@ -0,0 +1,213 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.llm.cache import request_key
+from src.utils.partitions import source_signature
+
+# config blocks that shape insights, creatives and the report; paths,
+# logging, concurrency and the like only change how a run executes
+RESULT_CONFIG_KEYS = ("random_seed", "data", "thresholds", "segments", "evaluation", "creative", "llm", "output")
+
+META_FILE = "meta.json"
+
+
+def normalize_query(user_query: str) -> str:
+    """Case, surrounding whitespace, inner runs of whitespace and trailing
+    punctuation do not change the question."""
+    return " ".join(user_query.casefold().split()).rstrip("?.! ")
+
+
+def dataset_fingerprint(source: str | Path) -> str:
+    """Digest of the (path, size, mtime) of every file behind `source`;
+    a stat per file, so computing it costs nothing next to a load."""
+    return request_key({"source": list(source_signature(source))})
+
+
+def _digest(root: Path, paths: List[Path]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if path.is_file():
+            digest.update(path.relative_to(root).as_posix().encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    """Digest of the package sources."""
+    root = Path(__file__).resolve().parents[2]
+    return _digest(root, list((root / "src").rglob("*.py")))
+
+
+@functools.lru_cache(maxsize=None)
+def prompts_version(prompts_dir: str | Path) -> str:
+    """Digest of the prompt templates in `prompts_dir` (`paths.prompts_dir`),
+    read once per process as `PromptLibrary` reads them."""
+    root = Path(prompts_dir).resolve()
+    return _digest(root, list(root.glob("*")))
+
+
+def result_key(user_query: str, data_fingerprint: str, config: Dict[str, Any]) -> str:
+    return request_key(
+        {
+            "query": normalize_query(user_query),
+            "data": data_fingerprint,
+            "config": {k: config.get(k) for k in RESULT_CONFIG_KEYS},
+            "code": code_version(),
+            "prompts": prompts_version(config.get("paths", {}).get("prompts_dir", "prompts")),
+        }
+    )
+
+
+class ResultCache:
+    """On-disk cache of whole query results.
+
+    One directory per result key under `cache_dir`, holding the artifacts
+    of the run exactly as they were written (insights, creatives, report
+    and its continuation pages) plus `meta.json`. Entries are published by
+    renaming a finished temporary directory, and restored through temporary
+    files, so neither side sees a partial result. The mtime of `meta.json`
+    is the LRU access time: a hit touches it, and once the entries exceed
+    `max_bytes` or `max_entries` the least recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entries: int = 1000,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        entries = self._entries()
+        self._count = len(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+
+    def _entries(self) -> List[Tuple[Path, int, float]]:
+        """(directory, bytes, last access) of every published entry."""
+        entries = []
+        for meta in self.cache_dir.glob(f"*/{META_FILE}"):
+            try:
+                size = sum(p.stat().st_size for p in meta.parent.iterdir())
+                entries.append((meta.parent, size, meta.stat().st_mtime))
+            except OSError:
+                continue  # evicted meanwhile
+        return entries
+
+    def restore(self, key: str, destination: Callable[[str, str], Path]) -> Optional[Dict[str, Any]]:
+        """Copy the artifacts of `key` to `destination(role, file_name)` and
+        return the entry's metadata, or None on a miss."""
+        entry = self.cache_dir / key
+        try:
+            meta = json.loads((entry / META_FILE).read_text(encoding="utf-8"))
+            for role, name in meta["artifacts"].items():
+                _copy_atomic(entry / role, destination(role, name))
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(entry / META_FILE)  # mark as recently used
+        with self._lock:
+            self.hits += 1
+        return meta
+
+    def put(self, key: str, artifacts: Dict[str, Path], info: Optional[Dict[str, Any]] = None) -> bool:
+        """Store the files in `artifacts` (role -> path) under `key`; False
+        when the result alone exceeds `max_bytes` and is not kept."""
+        size = sum(p.stat().st_size for p in artifacts.values())
+        if size > self.max_bytes:
+            return False
+        tmp = self.cache_dir / f".{key}.{uuid.uuid4().hex[:8]}.tmp"
+        tmp.mkdir()
+        try:
+            for role, path in artifacts.items():
+                shutil.copyfile(path, tmp / role)  # stored by role: names may repeat across directories
+            meta = {
+                "created": time.time(),
+                "artifacts": {role: path.name for role, path in artifacts.items()},
+                **(info or {}),
+            }
+            (tmp / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+            size += (tmp / META_FILE).stat().st_size
+            entry = self.cache_dir / key
+            replaced = _entry_size(entry)
+            shutil.rmtree(entry, ignore_errors=True)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            # a concurrent run published the same key first; keep its entry
+            shutil.rmtree(tmp, ignore_errors=True)
+            return True
+        with self._lock:
+            if replaced is None:
+                self._count += 1
+            self._bytes += size - (replaced or 0)
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self) -> None:
+        # only scans the directory when over a limit, not on every put
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        count, total = len(entries), sum(size for _, size, _ in entries)
+        for directory, size, _ in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            count, total = count - 1, total - size
+        self._count, self._bytes = count, total
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._count,
+            "bytes": self._bytes,
+        }
+
+
+def _entry_size(entry: Path) -> Optional[int]:
+    if not (entry / META_FILE).exists():
+        return None
+    return sum(p.stat().st_size for p in entry.iterdir())
+
+
+def _copy_atomic(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def result_cache_from_config(config: Dict[str, Any]) -> Optional[ResultCache]:
+    """`ResultCache` from the `result_cache` config block; None when disabled."""
+    settings = config.get("result_cache", {})
+    if not settings.get("enabled", False):
+        return None
+    return ResultCache(
+        config["paths"].get("result_cache_dir", "cache/results"),
+        max_bytes=int(settings.get("max_mb", 256) * 1024 * 1024),
+        max_entries=int(settings.get("max_entries", 1000)),
+    )
@@ -0,0 +1,63 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.agents.evaluator_agent import EvaluatedHypothesis, evaluated_to_dict
+from src.agents.insight_agent import Hypothesis, hypothesis_to_dict
+
+
+class HypothesisStore:
+    """Hypotheses and their evaluations, keyed by hypothesis id.
+
+    The insight step adds hypotheses, the evaluator step records verdicts
+    against them, and the writers iterate the store; joining a verdict to
+    its hypothesis is a dict lookup instead of a scan of every evaluation.
+
+    Insertion order is kept. A repeated hypothesis id keeps its first
+    hypothesis; for a repeated evaluation id the first verdict wins, as the
+    previous `next(...)` join did.
+    """
+
+    def __init__(self) -> None:
+        self._hypotheses: Dict[str, Hypothesis] = {}
+        self._evaluations: Dict[str, EvaluatedHypothesis] = {}
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._hypotheses)
+
+    def __contains__(self, hypothesis_id: object) -> bool:
+        return hypothesis_id in self._hypotheses
+
+    def add_hypotheses(self, hypotheses: Iterable[Hypothesis]) -> None:
+        for h in hypotheses:
+            if h.id in self._hypotheses:
+                self.duplicates += 1
+                continue
+            self._hypotheses[h.id] = h
+
+    def record_evaluations(self, evaluated: Iterable[EvaluatedHypothesis]) -> None:
+        for e in evaluated:
+            self._evaluations.setdefault(e.id, e)
+
+    @property
+    def evaluated_count(self) -> int:
+        return len(self._evaluations)
+
+    def hypotheses(self) -> List[Hypothesis]:
+        return list(self._hypotheses.values())
+
+    def evaluation(self, hypothesis_id: str) -> Optional[EvaluatedHypothesis]:
+        return self._evaluations.get(hypothesis_id)
+
+    def evaluations(self) -> Iterator[EvaluatedHypothesis]:
+        """Evaluations in the order they were recorded."""
+        return iter(self._evaluations.values())
+
+    def insight_items(self) -> Iterator[Dict[str, Any]]:
+        """`insights.json` entries, built one at a time."""
+        for h in self._hypotheses.values():
+            e = self._evaluations.get(h.id)
+            yield {**hypothesis_to_dict(h), "evaluated": evaluated_to_dict(e) if e is not None else None}
+
+    def evaluated_items(self) -> Iterator[Dict[str, Any]]:
+        for e in self._evaluations.values():
+            yield evaluated_to_dict(e)
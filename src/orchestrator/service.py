@@ -0,0 +1,346 @@
+import json
+import os
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.orchestrator.main import (
+    PipelineContext,
+    QueryAgents,
+    build_agents,
+    data_range,
+    execute_query,
+    export_trace,
+    load_data,
+    prepare_context,
+)
+from src.utils import partitions
+from src.utils.logging_utils import log_event
+from src.utils.partitions import source_signature
+
+# windowed views kept per load; queries name few distinct windows
+_MAX_WINDOWS = 32
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+@dataclass
+class _Loaded:
+    """One data load: the warm context, the newest partition date query
+    windows count back from, and the windowed views built from it."""
+
+    ctx: PipelineContext
+    latest: Optional[pd.Timestamp] = None
+    # least recently used first; guarded by `lock`
+    windows: "OrderedDict[Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]], PipelineContext]" = field(
+        default_factory=OrderedDict
+    )
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class AnalystService:
+    """Resident analyst: data, aggregates, prompts and logger stay loaded
+    between questions.
+
+    Serves HTTP on `host:port`, or on the Unix socket `socket_path` when
+    given:
+
+    - `POST /query` with `{"user_query": "...", "query_id": "..."}` runs the
+      plan and answers `{"query_id", "user_query", "insights", "creatives",
+      "metrics"}` as JSON; no report files are written.
+    - `GET /health` reports the rows loaded, the load time and reloads.
+
+    Creative recommendations are generated once per load, not per query.
+    As in `run_pipeline`, a window named in the query ("last 7 days")
+    narrows a partitioned source: the loaded summary is windowed (see
+    `DataAgent.window`), within the dates loaded, and the view and its
+    creatives are kept, least recently used dropped past 32, for later
+    queries naming the same window.
+
+    Requests are served on threads, at most `max_queries` at a time. A
+    watcher thread checks the source every `reload_interval` seconds and
+    swaps in freshly loaded data when a file changed; queries already
+    running finish on the data they started with. Use as a context
+    manager (`port=0` binds an ephemeral port)::
+
+        with AnalystService("config/config.yaml", port=0) as service:
+            print(service.url)
+    """
+
+    def __init__(
+        self,
+        config_path: str = "config/config.yaml",
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        socket_path: Optional[str] = None,
+        reload_interval: Optional[float] = None,
+        max_queries: Optional[int] = None,
+    ) -> None:
+        ctx = prepare_context(config_path)
+        self.agents: QueryAgents = build_agents(ctx)
+        self.source = ctx.config["data"]["path"]
+        self._loaded = _Loaded(self._warm(ctx), _latest_date(self.source))
+        settings = self.ctx.config.get("service", {})
+        self.reload_interval = float(reload_interval if reload_interval is not None else settings.get("reload_interval", 2.0))
+        self.reloads = 0
+        self.loaded_at = time.time()
+        self._signature = source_signature(self.source)
+        self._reload_lock = threading.Lock()
+        self._gate = threading.BoundedSemaphore(
+            max_queries or self.ctx.config.get("concurrency", {}).get("max_queries", 8)
+        )
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.socket_path = socket_path if socket_path is not None else settings.get("socket")
+        handler = self._handler()
+        if self.socket_path:
+            Path(self.socket_path).unlink(missing_ok=True)
+            self._server: socketserver.BaseServer = _UnixHTTPServer(self.socket_path, handler)
+        else:
+            self._server = ThreadingHTTPServer(
+                (host or settings.get("host", "127.0.0.1"), settings.get("port", 8080) if port is None else port),
+                handler,
+            )
+            self._server.daemon_threads = True
+
+    @property
+    def ctx(self) -> PipelineContext:
+        """The context of the current load."""
+        return self._loaded.ctx
+
+    @property
+    def url(self) -> str:
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def answer(self, user_query: str, query_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run one query against the loaded data; the `POST /query` body."""
+        query_id = query_id or uuid.uuid4().hex[:8]
+        loaded, agents = self._loaded, self.agents  # one snapshot, even across a reload
+        start = time.perf_counter()
+        with self._gate:
+            ctx = self._view(loaded, user_query)
+            ec, metrics = execute_query(ctx, user_query, agents=agents, query_id=query_id)
+        creatives = ec.creatives if ec.creatives is not None else pd.DataFrame()
+        response = {
+            "query_id": query_id,
+            "user_query": user_query,
+            "insights": list(ec.results.insight_items()),
+            "creatives": list(agents.creative.iter_records(creatives)),
+            "metrics": metrics,
+        }
+        log_event(
+            ctx.logger,
+            agent="Service",
+            stage="query",
+            event="query_served",
+            runtime_ms=(time.perf_counter() - start) * 1000.0,
+            extra={"query_id": query_id, "hypotheses": len(response["insights"]), "creatives": len(creatives)},
+        )
+        return response
+
+    def _view(self, loaded: _Loaded, user_query: str) -> PipelineContext:
+        """The context a query runs on: the loaded one, or its window when
+        the query names one."""
+        ctx = loaded.ctx
+        date_range = data_range(ctx.config, user_query)
+        if not partitions.is_partitioned(self.source) or date_range == data_range(ctx.config):
+            return ctx
+        window = date_range.resolve(loaded.latest)
+        with loaded.lock:
+            view = loaded.windows.get(window)
+            if view is not None:
+                loaded.windows.move_to_end(window)
+                return view
+        # built outside the lock; two queries may build the same view and
+        # the first one stored serves both afterwards
+        summary = ctx.data_agent.window(ctx.data_summary, *window)
+        view = replace(ctx, data_summary=summary, creatives=self.agents.creative.generate_frame(summary.low_ctr_rows))
+        with loaded.lock:
+            view = loaded.windows.setdefault(window, view)
+            loaded.windows.move_to_end(window)
+            while len(loaded.windows) > _MAX_WINDOWS:
+                loaded.windows.popitem(last=False)
+        return view
+
+    def _warm(self, ctx: PipelineContext) -> PipelineContext:
+        """Creatives depend on the data, not the question: build them once
+        per load so queries reuse them."""
+        if ctx.creatives is not None:
+            return ctx
+        return replace(ctx, creatives=self.agents.creative.generate_frame(ctx.data_summary.low_ctr_rows))
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "source": self.source,
+            "rows": self.ctx.data_summary.overview.get("rows"),
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+        }
+
+    def reload_if_changed(self) -> bool:
+        """Reload the data when a source file was added, removed or
+        rewritten since the last load. A failed reload is logged and the
+        previous data keeps serving."""
+        with self._reload_lock:
+            signature = source_signature(self.source)
+            if signature == self._signature:
+                return False
+            ctx = self.ctx
+            try:
+                latest = _latest_date(self.source)
+                loaded = load_data(ctx.config, ctx.logger, ctx.tracer)
+            except (Exception, SystemExit) as exc:  # SystemExit: schema check failed
+                log_event(
+                    ctx.logger,
+                    agent="Service",
+                    stage="reload",
+                    event="data_reload_failed",
+                    status="error",
+                    extra={"source": self.source, "error": str(exc)},
+                )
+                self._signature = signature  # retry on the next change, not every tick
+                return False
+            self._loaded = _Loaded(
+                self._warm(
+                    replace(
+                        ctx,
+                        data_agent=loaded.data_agent,
+                        data_summary=loaded.data_summary,
+                        load_metrics=loaded.load_metrics,
+                        creatives=loaded.creatives,
+                    )
+                ),
+                latest,
+            )
+            self._signature = signature
+            self.reloads += 1
+            self.loaded_at = time.time()
+            log_event(
+                ctx.logger,
+                agent="Service",
+                stage="reload",
+                event="data_reloaded",
+                runtime_ms=loaded.load_metrics.get("data_agent_ms"),
+                extra={"source": self.source, "rows": loaded.data_summary.overview.get("rows")},
+            )
+            return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            self.reload_if_changed()
+
+    def start(self) -> "AnalystService":
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True)]
+        if self.reload_interval > 0:
+            self._threads.append(threading.Thread(target=self._watch, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        log_event(
+            self.ctx.logger,
+            agent="Service",
+            stage="start",
+            event="service_started",
+            extra={"url": self.url, "rows": self.ctx.data_summary.overview.get("rows")},
+        )
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.socket_path:
+            Path(self.socket_path).unlink(missing_ok=True)
+        export_trace(self.ctx)
+
+    def __enter__(self) -> "AnalystService":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def _handler(self) -> type:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                if self.path != "/health":
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+                    return
+                self._reply(200, service.health())
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server API
+                if self.path != "/query":
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+                    return
+                status, body = self._query()
+                self._reply(status, body)
+
+            def _query(self) -> Tuple[int, Dict[str, Any]]:
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    item = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return 400, {"error": "invalid JSON"}
+                text = (item.get("user_query") or item.get("query")) if isinstance(item, dict) else None
+                if not text:
+                    return 400, {"error": "body needs a 'user_query' field"}
+                try:
+                    return 200, service.answer(str(text), item.get("query_id"))
+                except Exception as exc:  # noqa: BLE001 - report, keep serving
+                    return 500, {"error": str(exc)}
+
+            def _reply(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def address_string(self) -> str:
+                # Unix sockets have no (host, port) peer
+                return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass  # requests are logged as query_served events
+
+        return Handler
+
+
+def _latest_date(source: str) -> Optional[pd.Timestamp]:
+    """Newest partition date of a partitioned source, as `load_data` counts
+    "last N days" from it."""
+    return partitions.latest_date(partitions.discover(source)) if partitions.is_partitioned(source) else None
+
+
+def serve(
+    config_path: str = "config/config.yaml",
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    socket_path: Optional[str] = None,
+) -> None:
+    """Run the service until interrupted."""
+    service = AnalystService(config_path, host=host, port=port, socket_path=socket_path).start()
+    print(f"analyst service listening on {service.url} (pid {os.getpid()})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        service.stop()
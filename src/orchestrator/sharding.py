@@ -0,0 +1,255 @@
+import heapq
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.agents.creative_agent import CreativeAgent
+from src.agents.data_agent import DataAgent, DataSummary
+from src.utils.aggregation import RowStats, key_name, merge_aggregates
+from src.utils.cube import CubeStore
+from src.utils.logging_utils import log_event
+from src.utils.segments import SegmentScanner, SegmentSums, Window, merge_sums
+from src.utils.tracing import span
+
+try:  # optional dependency: sharded mode needs pyarrow for the shard files
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on environment
+    pa = None
+    feather = None
+
+
+@dataclass(frozen=True)
+class ShardingOptions:
+    """`sharding` block of the config.
+
+    - `key`: column whose values are kept together in one shard
+      (`campaign_name`, `country`, an account column, ...).
+    - `workers`: processes in the pool; None uses every core.
+    - `shards`: number of shards; None uses one per worker.
+    - `spill_dir`: where the shard files go; None uses `/dev/shm` (RAM
+      backed, i.e. shared memory) when present, else the system temp dir.
+    """
+
+    enabled: bool = False
+    key: str = "campaign_name"
+    workers: Optional[int] = None
+    shards: Optional[int] = None
+    spill_dir: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ShardingOptions":
+        block = config.get("sharding") or {}
+        return cls(
+            enabled=bool(block.get("enabled", False)),
+            key=block.get("key", "campaign_name"),
+            workers=block.get("workers"),
+            shards=block.get("shards"),
+            spill_dir=block.get("spill_dir"),
+        )
+
+    def worker_count(self) -> int:
+        return max(1, self.workers or os.cpu_count() or 1)
+
+    def shard_count(self) -> int:
+        return max(1, self.shards or self.worker_count())
+
+
+@dataclass
+class ShardTask:
+    """Everything a worker needs; the rows themselves stay in `path`."""
+
+    index: int
+    path: str
+    date_column: str
+    low_ctr_threshold: Optional[float]
+    low_roas_threshold: Optional[float]
+    segment_scanner: Optional[SegmentScanner]
+    cube_store: Optional[CubeStore]
+    periods: Optional[Tuple[Window, Window]]
+    dedupe: bool
+
+
+@dataclass
+class ShardResult:
+    """Reduced output of one shard: partial aggregates, row stats, the
+    labels of its low CTR / ROAS rows, segment sums and creatives."""
+
+    index: int
+    rows: int
+    seconds: float
+    aggregates: Dict[str, pd.DataFrame]
+    stats: RowStats
+    low_rows: np.ndarray
+    segment_sums: Optional[SegmentSums]
+    creatives: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+
+def assign_shards(values: pd.Series, shards: int) -> np.ndarray:
+    """Shard number per row. Rows with the same value share a shard, and
+    values are spread largest first onto the least loaded shard, so one big
+    campaign does not make one shard the straggler."""
+    codes, _ = pd.factorize(values, use_na_sentinel=False)
+    counts = np.bincount(codes)
+    owner = np.zeros(len(counts), dtype=np.int64)
+    loads = [(0, s) for s in range(shards)]
+    for value in np.argsort(-counts, kind="stable"):
+        load, shard = heapq.heappop(loads)
+        owner[value] = shard
+        heapq.heappush(loads, (load + int(counts[value]), shard))
+    return owner[codes]
+
+
+def write_shards(df: pd.DataFrame, shard_ids: np.ndarray, directory: Path) -> List[Tuple[int, Path]]:
+    """One uncompressed Arrow (Feather v2) file per non-empty shard, keeping
+    the row labels of `df`; workers memory-map them."""
+    order = np.argsort(shard_ids, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(shard_ids))])
+    written = []
+    for shard in range(len(bounds) - 1):
+        rows = order[bounds[shard] : bounds[shard + 1]]
+        if len(rows) == 0:
+            continue
+        path = directory / f"shard-{shard:04d}.arrow"
+        table = pa.Table.from_pandas(df.iloc[rows], preserve_index=True)
+        feather.write_feather(table, path, compression="uncompressed")
+        written.append((shard, path))
+    return written
+
+
+def analyze_shard(task: ShardTask) -> ShardResult:
+    """Aggregation, segment sums and creatives for one shard (runs in a
+    worker process)."""
+    start = time.perf_counter()
+    df = feather.read_table(task.path, memory_map=True).to_pandas()
+    agent = DataAgent(
+        date_column=task.date_column,
+        low_ctr_threshold=task.low_ctr_threshold,
+        low_roas_threshold=task.low_roas_threshold,
+        segment_scanner=task.segment_scanner,
+        cube_store=task.cube_store,
+    )
+    aggregates, stats, low_rows = agent.partials(df)
+
+    sums = None
+    if task.segment_scanner is not None and task.periods is not None:
+        base = aggregates.get(key_name(task.segment_scanner.base_key))
+        if base is not None:
+            sums = task.segment_scanner.sums(base, task.periods)
+
+    creatives = pd.DataFrame()
+    if task.low_ctr_threshold is not None and task.low_roas_threshold is not None:
+        creative = CreativeAgent(
+            logging.getLogger(__name__),
+            low_ctr_threshold=task.low_ctr_threshold,
+            low_roas_threshold=task.low_roas_threshold,
+            dedupe=task.dedupe,
+        )
+        creatives = creative.generate_frame(low_rows)
+
+    return ShardResult(
+        index=task.index,
+        rows=len(df),
+        seconds=time.perf_counter() - start,
+        aggregates=aggregates,
+        stats=stats,
+        low_rows=low_rows.index.to_numpy(),
+        segment_sums=sums,
+        creatives=creatives,
+    )
+
+
+def run_sharded(
+    data_agent: DataAgent,
+    rows: DataSummary,
+    creative: CreativeAgent,
+    options: ShardingOptions,
+    logger: logging.Logger,
+) -> Tuple[DataSummary, pd.DataFrame]:
+    """Summary and creatives for `rows` (a `DataAgent.load_rows` result),
+    computed shard by shard in a process pool.
+
+    `full_df` is split by `options.key` and each shard written once to a
+    memory-mapped Arrow file, so workers read columns straight from the page
+    cache instead of unpickling a frame. Each worker aggregates its shard,
+    sums its segments over the account-wide periods and generates its
+    creatives; the parent merges the additive partials, ranks the merged
+    segments once and merges the creatives. The result matches the
+    unsharded pipeline.
+    """
+    if feather is None:
+        raise RuntimeError("sharded mode requires pyarrow (pip install pyarrow).")
+    df = rows.full_df
+    if options.key not in df.columns:
+        raise ValueError(f"sharding.key {options.key!r} is not a column of the data")
+
+    scanner = data_agent.segment_scanner
+    dates = df[data_agent.date_column]
+    periods = scanner.periods(dates.unique()) if scanner is not None and dates.nunique() >= 2 else None
+    spill_dir = options.spill_dir or ("/dev/shm" if Path("/dev/shm").is_dir() else None)
+
+    with tempfile.TemporaryDirectory(prefix="kasparro-shards-", dir=spill_dir) as tmp:
+        with span("shard.split", key=options.key, shards=options.shard_count(), rows=len(df)):
+            shards = write_shards(df, assign_shards(df[options.key], options.shard_count()), Path(tmp))
+        tasks = [
+            ShardTask(
+                index=shard,
+                path=str(path),
+                date_column=data_agent.date_column,
+                low_ctr_threshold=data_agent.low_ctr_threshold,
+                low_roas_threshold=data_agent.low_roas_threshold,
+                segment_scanner=scanner,
+                cube_store=data_agent.cube_store,
+                periods=periods,
+                dedupe=creative.dedupe,
+            )
+            for shard, path in shards
+        ]
+        results: List[ShardResult] = []
+        workers = min(options.worker_count(), max(1, len(tasks)))
+        # spawn: the parent runs logging / tracing threads that fork would copy mid-flight
+        with span("shard.pool", workers=workers, shards=len(tasks)), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            for future in as_completed([pool.submit(analyze_shard, t) for t in tasks]):
+                result = future.result()
+                results.append(result)
+                log_event(
+                    logger,
+                    agent="Orchestrator",
+                    stage="shard",
+                    event="shard_finished",
+                    extra={
+                        "shard": result.index,
+                        "rows": result.rows,
+                        "seconds": round(result.seconds, 4),
+                        "creatives": len(result.creatives),
+                    },
+                )
+    results.sort(key=lambda r: r.index)
+
+    with span("shard.merge", shards=len(results)) as sp:
+        aggregates = merge_aggregates(*(r.aggregates for r in results))
+        stats = RowStats()
+        for r in results:
+            stats.merge(r.stats)
+        low_labels = np.sort(np.concatenate([r.low_rows for r in results])) if results else np.array([], dtype=np.int64)
+        sums = [r.segment_sums for r in results if r.segment_sums is not None]
+        segment_scan = scanner.finish(merge_sums(sums)) if scanner is not None and sums else None
+        creatives = creative.merge_frames([r.creatives for r in results])
+        sp.rows = stats.rows
+
+    summary = data_agent.summarize_partials(
+        df, rows.schema_result, aggregates, stats, df.loc[low_labels], segment_scan
+    )
+    summary.file_schemas, summary.partitions = rows.file_schemas, rows.partitions
+    return summary, creatives
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+
+from src.utils.aggregation import RowStats
+from src.utils.writers import atomic_open
+
+try:  # optional dependency: columnar sidecars need pyarrow
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on environment
+    feather = None
+
+STATE_VERSION = 2
+
+# bytes hashed at the start of a CSV and before its ingested offset
+_PROBE_BYTES = 4096
+
+
+@dataclass
+class SourceOffset:
+    """How much of a growing CSV is ingested: its first `offset` bytes,
+    with `digest` over the head and the bytes just before `offset`."""
+
+    path: str
+    offset: int
+    digest: str
+
+
+@dataclass
+class AggregateState:
+    """Aggregates carried over between incremental runs."""
+
+    aggregates: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    row_stats: RowStats = field(default_factory=RowStats)
+    # last ingested date; rows on or before it are skipped next time
+    last_date: Optional[pd.Timestamp] = None
+    # single-CSV sources: where the next run resumes reading
+    source: Optional[SourceOffset] = None
+
+
+def _prefix_digest(path: str | Path, offset: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(offset, _PROBE_BYTES)))
+        f.seek(max(0, offset - _PROBE_BYTES))
+        digest.update(f.read(offset - f.tell()))
+    return digest.hexdigest()[:16]
+
+
+def source_offset(path: str | Path, offset: int) -> SourceOffset:
+    """Record that the first `offset` bytes of `path` are ingested."""
+    return SourceOffset(str(Path(path).resolve()), offset, _prefix_digest(path, offset))
+
+
+def resume_offset(source: Optional[SourceOffset], path: str | Path) -> int:
+    """Byte offset to resume `path` from: `source.offset` when the file only
+    grew since it was recorded (same path, at least as long, same head and
+    bytes before the offset), else 0 for a full scan. A rewrite that keeps
+    both probed regions is not detected."""
+    if source is None or source.path != str(Path(path).resolve()):
+        return 0
+    try:
+        if os.path.getsize(path) < source.offset or _prefix_digest(path, source.offset) != source.digest:
+            return 0
+    except OSError:
+        return 0
+    return source.offset
+
+
+def _labels_to_json(index: pd.Index, date_key: bool) -> List[Optional[str]]:
+    if date_key:
+        index = pd.DatetimeIndex(index).strftime("%Y-%m-%d")
+    return [None if pd.isna(v) else str(v) for v in index]
+
+
+def _labels_from_json(labels: List[Optional[str]], name: str, date_key: bool) -> pd.Index:
+    if date_key:
+        return pd.DatetimeIndex(pd.to_datetime(labels), name=name)
+    return pd.Index(labels, dtype=object, name=name)
+
+
+def _table_to_json(key: str, table: pd.DataFrame, date_column: str) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"columns": list(table.columns), "data": table.to_numpy().tolist()}
+    if isinstance(table.index, pd.MultiIndex):
+        # composite key: one label list per level
+        payload["levels"] = list(table.index.names)
+        payload["index"] = [
+            _labels_to_json(table.index.get_level_values(i), name == date_column)
+            for i, name in enumerate(table.index.names)
+        ]
+    else:
+        payload["index"] = _labels_to_json(table.index, date_column in (key, table.index.name))
+    return payload
+
+
+def _table_from_json(key: str, payload: Dict[str, Any], date_column: str) -> pd.DataFrame:
+    index: pd.Index
+    if "levels" in payload:
+        index = pd.MultiIndex.from_arrays(
+            [
+                _labels_from_json(labels, name, name == date_column)
+                for name, labels in zip(payload["levels"], payload["index"])
+            ]
+        )
+    else:
+        index = _labels_from_json(payload["index"], key, key == date_column)
+    return pd.DataFrame(payload["data"], index=index, columns=payload["columns"], dtype="float64")
+
+
+def text_labels(index: pd.MultiIndex, level: str) -> np.ndarray:
+    """Labels of `level` as text, None where missing: Arrow needs one type
+    per column. Converts the distinct labels, then expands by code."""
+    position = index.names.index(level)
+    labels = [None if pd.isna(v) else str(v) for v in index.levels[position]]
+    # code -1 (missing label) picks the trailing None
+    return np.array([*labels, None], dtype=object)[index.codes[position]]
+
+
+def write_table(path: Path, table: pd.DataFrame, date_column: str = "date") -> None:
+    """Write a composite-key aggregate table as uncompressed Feather."""
+    frame = table.reset_index()
+    for level in table.index.names:
+        if level != date_column:
+            frame[level] = text_labels(table.index, level)
+    feather.write_feather(frame, path, compression="uncompressed")
+
+
+def read_table(path: Path, levels: Sequence[str]) -> pd.DataFrame:
+    """Read a table written by `write_table`, memory-mapped."""
+    if feather is None:
+        raise RuntimeError("reading a columnar state table requires pyarrow (pip install pyarrow).")
+    return feather.read_table(path, memory_map=True).to_pandas().set_index(list(levels))
+
+
+def load_state(path: str | Path, date_column: str = "date") -> AggregateState:
+    p = Path(path)
+    if not p.exists():
+        return AggregateState()
+    payload = json.loads(p.read_text(encoding="utf-8"))
+    if payload.get("version") != STATE_VERSION:
+        # incompatible layout; rebuild from scratch rather than mis-merge
+        return AggregateState()
+    aggregates = {}
+    try:
+        for key, table in payload["aggregates"].items():
+            if "file" in table:
+                aggregates[key] = read_table(p.parent / table["file"], table["levels"])
+            else:
+                aggregates[key] = _table_from_json(key, table, date_column)
+    except (OSError, ValueError, RuntimeError):
+        # sidecar gone or unreadable (or no pyarrow): rebuild from scratch
+        return AggregateState()
+    return AggregateState(
+        aggregates=aggregates,
+        row_stats=RowStats(**payload["row_stats"]),
+        last_date=pd.Timestamp(payload["last_date"]) if payload.get("last_date") else None,
+        source=SourceOffset(**payload["source"]) if payload.get("source") else None,
+    )
+
+
+def _sidecars(path: Path) -> Set[str]:
+    """Sidecar files the state at `path` currently names."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    return {t["file"] for t in payload.get("aggregates", {}).values() if "file" in t}
+
+
+def save_state(
+    path: str | Path,
+    state: AggregateState,
+    date_column: str = "date",
+    exclude: Iterable[str] = (),
+) -> None:
+    """Persist `state` to `path`.
+
+    Composite-key tables (date x dimensions, near row-level on wide data)
+    are written as Feather sidecars next to the JSON when pyarrow is
+    installed, so loading them is a memory map rather than a JSON parse;
+    the JSON keeps the small tables and names the sidecars. Sidecars get a
+    fresh generation suffix and the JSON is replaced last; files of the
+    previous generation are kept for readers still holding the old JSON,
+    older ones are deleted. Tables named in `exclude` are persisted
+    elsewhere (the cube's base cuboid) and left out.
+    """
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    previous = _sidecars(p)
+    generation = uuid.uuid4().hex[:8]
+    tables: Dict[str, Any] = {}
+    for n, (key, table) in enumerate(state.aggregates.items()):
+        if key in exclude:
+            continue
+        if feather is not None and isinstance(table.index, pd.MultiIndex):
+            name = f"{p.stem}.{n}.{generation}.arrow"
+            write_table(p.parent / name, table, date_column)
+            tables[key] = {"file": name, "levels": list(table.index.names)}
+        else:
+            tables[key] = _table_to_json(key, table, date_column)
+    payload = {
+        "version": STATE_VERSION,
+        "last_date": state.last_date.strftime("%Y-%m-%d") if state.last_date is not None else None,
+        "row_stats": asdict(state.row_stats),
+        "aggregates": tables,
+        "source": asdict(state.source) if state.source is not None else None,
+    }
+    with atomic_open(p) as f:
+        json.dump(payload, f)
+    keep = previous | {t["file"] for t in tables.values() if "file" in t}
+    for stale in p.parent.glob(f"{p.stem}.*.arrow"):
+        if stale.name not in keep:
+            stale.unlink(missing_ok=True)
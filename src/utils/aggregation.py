@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+# Additive measures: sums of these can be merged across chunks, files and
+# worker processes without changing the result.
+ADDITIVE_COLUMNS: List[str] = ["spend", "revenue", "impressions", "clicks", "purchases"]
+
+# ratio metric -> (numerator, denominator), both additive
+RATIO_METRICS: Dict[str, Tuple[str, str]] = {
+    "roas": ("revenue", "spend"),
+    "ctr": ("clicks", "impressions"),
+}
+
+DEFAULT_KEYS: List[str] = ["date", "campaign_name"]
+
+# a column name, or a tuple of columns for one table over their combinations
+GroupKey = Union[str, Tuple[str, ...]]
+
+ROW_COUNT = "rows"
+
+
+def key_name(key: GroupKey) -> str:
+    """Name of the table for `key`: the column, or the columns joined by `+`."""
+    return key if isinstance(key, str) else "+".join(key)
+
+
+class AggregationEngine:
+    """Computes every per-key aggregate with one groupby per grouping key.
+
+    A key can also be a tuple of columns; its table (named by `key_name`) is
+    indexed by every observed combination, and columns missing from the
+    frame are left out of it.
+
+    Tables hold only additive sums (plus a row count) per key, so tables built
+    from different chunks of the same dataset can be merged with `merge`.
+    Ratio metrics such as ROAS and CTR are derived afterwards with `ratio`
+    as a ratio of sums, i.e. spend / impression weighted.
+    """
+
+    def __init__(
+        self,
+        keys: Optional[Sequence[GroupKey]] = None,
+        measures: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.keys = list(keys if keys is not None else DEFAULT_KEYS)
+        self.measures = list(measures if measures is not None else ADDITIVE_COLUMNS)
+
+    def partial(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        # non-numeric measures (schema violations) are skipped, not concatenated
+        measures = [
+            c for c in self.measures if c in df.columns and pd.api.types.is_numeric_dtype(df[c])
+        ]
+        tables: Dict[str, pd.DataFrame] = {}
+        for key in self.keys:
+            if isinstance(key, str):
+                if key not in df.columns:
+                    continue
+                by: Union[str, List[str]] = key
+            else:
+                by = [c for c in key if c in df.columns]
+                if not by:
+                    continue
+            # composite keys keep rows with a missing label so their sums
+            # still add up to the totals
+            grouped = df.groupby(by, observed=True, dropna=isinstance(key, str))
+            # float64 sums: int32 counts would overflow on large exports
+            table = grouped[measures].sum().astype("float64")
+            table[ROW_COUNT] = grouped.size().astype("float64")
+            # categorical keys carry per-frame categories; plain labels merge cleanly
+            if isinstance(table.index, pd.CategoricalIndex):
+                table.index = table.index.astype(object)
+            elif isinstance(table.index, pd.MultiIndex):
+                table.index = pd.MultiIndex.from_arrays(
+                    [
+                        level.astype(object) if isinstance(level, pd.CategoricalIndex) else level
+                        for level in (table.index.get_level_values(i) for i in range(table.index.nlevels))
+                    ],
+                    names=table.index.names,
+                )
+            tables[key_name(key)] = table
+        return tables
+
+    @staticmethod
+    def merge(
+        left: Dict[str, pd.DataFrame], right: Dict[str, pd.DataFrame]
+    ) -> Dict[str, pd.DataFrame]:
+        merged = dict(left)
+        for key, table in right.items():
+            merged[key] = table if key not in merged else merged[key].add(table, fill_value=0)
+        return merged
+
+    @staticmethod
+    def ratio(table: pd.DataFrame, metric: str) -> pd.Series:
+        """`metric` per key as sum(numerator) / sum(denominator).
+
+        Keys with a zero denominator, or tables missing either column, yield
+        NaN rather than inf / KeyError.
+        """
+        numerator, denominator = RATIO_METRICS[metric]
+        if numerator not in table.columns or denominator not in table.columns:
+            return pd.Series(np.nan, index=table.index, dtype="float64")
+        denom = table[denominator].replace(0, np.nan)
+        return table[numerator] / denom
+
+
+def merge_aggregates(*parts: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Merge any number of partial aggregate dicts (chunks, files, shards)."""
+    merged: Dict[str, pd.DataFrame] = {}
+    for part in parts:
+        merged = AggregationEngine.merge(merged, part)
+    return merged
+
+
+@dataclass
+class RowStats:
+    """Running row-level statistics for the report overview.
+
+    Like the aggregate tables these merge across chunks and runs.
+    """
+
+    rows: int = 0
+    roas_sum: float = 0.0
+    roas_count: int = 0
+    roas_min: Optional[float] = None
+    roas_max: Optional[float] = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        if "roas" not in df.columns or not df["roas"].notna().any():
+            return
+        self.merge(
+            RowStats(
+                roas_sum=float(df["roas"].sum()),
+                roas_count=int(df["roas"].count()),
+                roas_min=float(df["roas"].min()),
+                roas_max=float(df["roas"].max()),
+            )
+        )
+
+    def merge(self, other: "RowStats") -> None:
+        self.rows += other.rows
+        self.roas_sum += other.roas_sum
+        self.roas_count += other.roas_count
+        if other.roas_min is not None:
+            self.roas_min = other.roas_min if self.roas_min is None else min(self.roas_min, other.roas_min)
+        if other.roas_max is not None:
+            self.roas_max = other.roas_max if self.roas_max is None else max(self.roas_max, other.roas_max)
+
+    def to_overview(self) -> Dict[str, Any]:
+        overview: Dict[str, Any] = {"rows": self.rows}
+        if self.roas_count:
+            overview.update(
+                roas_mean=self.roas_sum / self.roas_count,
+                roas_min=self.roas_min,
+                roas_max=self.roas_max,
+            )
+        return overview
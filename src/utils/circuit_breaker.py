@@ -0,0 +1,197 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from src.utils.logging_utils import log_event
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the backend while a circuit is open."""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for calls to an unreliable backend.
+
+    - closed: calls go through; failures are kept for `window_seconds` and
+      `failure_threshold` of them within the window open the circuit.
+    - open: calls fail fast with `CircuitOpenError` for `reset_timeout`
+      seconds.
+    - half_open: one probe call is let through; success closes the circuit,
+      failure opens it again. Other calls keep failing fast meanwhile.
+
+    Every state change is logged through `log_event` (`circuit_state_changed`).
+    Thread-safe, so sync agents on the plan thread pool and async agents on an
+    event loop can share one breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        logger: Optional[logging.Logger] = None,
+        failure_threshold: int = 5,
+        window_seconds: float = 60.0,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+        self.name = name
+        self.logger = logger or logging.getLogger("kasparro")
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures: Deque[float] = deque()
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, new_state: str) -> None:
+        old_state, self._state = self._state, new_state
+        log_event(
+            self.logger,
+            level=logging.WARNING if new_state == OPEN else logging.INFO,
+            agent=self.name,
+            stage="circuit",
+            event="circuit_state_changed",
+            status=new_state,
+            extra={"from": old_state, "to": new_state, "recent_failures": len(self._failures)},
+        )
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._probe_in_flight = False
+            self._transition(HALF_OPEN)
+
+    def _prune(self, now: float) -> None:
+        while self._failures and now - self._failures[0] > self.window_seconds:
+            self._failures.popleft()
+
+    def before_call(self) -> None:
+        """Raise `CircuitOpenError` unless a call may go to the backend now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit {self.name!r} is {self._state}")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN:
+                self._failures.clear()
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._probe_in_flight = False
+            self._failures.append(now)
+            self._prune(now)
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and len(self._failures) >= self.failure_threshold
+            ):
+                self._opened_at = now
+                self._transition(OPEN)
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        self.before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException:
+            # includes cancellation by a per-attempt timeout; a half-open probe
+            # must never be left marked in flight
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            self._prune(self._clock())
+            return {
+                "state": self._state,
+                "recent_failures": len(self._failures),
+                "rejected": self.rejected,
+            }
+
+
+# one breaker per agent name, shared by every instance and query in the process
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(name: str, logger: Optional[logging.Logger] = None, **settings: Any) -> CircuitBreaker:
+    """Process-wide breaker for `name`; `settings` apply when it is created."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, logger, **settings)
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+# agents that fell back during the current query; see `recording_fallbacks`
+_fallbacks: "contextvars.ContextVar[Optional[List[str]]]" = contextvars.ContextVar("_fallbacks", default=None)
+
+
+@contextmanager
+def recording_fallbacks(into: List[str]) -> Iterator[List[str]]:
+    """Append to `into` the agents that answer with a fallback inside the
+    block (`record_fallback`). Follows plan steps into worker threads
+    (submitted with `contextvars.copy_context`) and asyncio tasks, so
+    concurrent queries each see only their own fallbacks."""
+    token = _fallbacks.set(into)
+    try:
+        yield into
+    finally:
+        _fallbacks.reset(token)
+
+
+def record_fallback(agent: str) -> None:
+    """Note that `agent` replaced a failed model call with its fallback."""
+    fallbacks = _fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(agent)
+
+
+def reset_breakers() -> None:
+    with _registry_lock:
+        _breakers.clear()
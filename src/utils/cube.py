@@ -0,0 +1,273 @@
+import itertools
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.utils.aggregate_state import feather, read_table, write_table
+from src.utils.aggregation import AggregationEngine, RATIO_METRICS
+from src.utils.segments import SEGMENT_DIMENSIONS
+from src.utils.writers import atomic_open
+
+CUBE_VERSION = 1
+
+# the segment dimensions, so the cube's base is the segment scan's table;
+# free text such as creative_message would make it row-level
+CUBE_DIMENSIONS: List[str] = list(SEGMENT_DIMENSIONS)
+
+Filter = Union[Any, Sequence[Any]]
+
+
+class AggregateCube:
+    """Additive sums by date over every combination of dimensions.
+
+    `cuboids` maps a tuple of dimensions to a table of sums indexed by date
+    and those dimensions. The base cuboid (all dimensions) is the finest
+    grain; rollups (the date alone, each dimension, each pair up to
+    `max_order`) are materialized from it, so `query` answers from the
+    smallest cuboid that covers the request instead of rows. Sums are
+    additive: the cube of new rows merges into an existing cube with
+    `merge`.
+    """
+
+    def __init__(
+        self,
+        dimensions: Sequence[str],
+        cuboids: Dict[Tuple[str, ...], pd.DataFrame],
+        date_column: str = "date",
+        max_order: int = 2,
+    ) -> None:
+        self.dimensions = list(dimensions)
+        self.cuboids = cuboids
+        self.date_column = date_column
+        self.max_order = max_order
+
+    def __len__(self) -> int:
+        base = self.cuboids.get(tuple(self.dimensions))
+        return 0 if base is None else len(base)
+
+    @classmethod
+    def from_base(
+        cls,
+        base: pd.DataFrame,
+        dimensions: Sequence[str],
+        date_column: str = "date",
+        max_order: int = 2,
+    ) -> "AggregateCube":
+        """Cube over `base`, an `AggregationEngine` table keyed by date and
+        `dimensions` (dimensions missing from it are left out)."""
+        present = [d for d in dimensions if d in base.index.names]
+        cube = cls(present, {tuple(present): base}, date_column=date_column, max_order=max_order)
+        # finest first, each rolled up from the smallest cuboid already built
+        for combo in sorted(rollups(present, max_order), key=len, reverse=True):
+            if combo not in cube.cuboids:
+                _, parent = cube.cuboid_for(combo)
+                cube.cuboids[combo] = _rollup(parent, [date_column, *combo])
+        cube.cuboids = {combo: cube.cuboids[combo] for combo in rollups(present, max_order)}
+        return cube
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        by_date = self.cuboids.get(())
+        if by_date is None or not len(by_date):
+            return None
+        return pd.Timestamp(by_date.index.max())
+
+    def merge(self, other: "AggregateCube") -> "AggregateCube":
+        if other.dimensions != self.dimensions or other.max_order != self.max_order:
+            raise ValueError("cannot merge cubes of different shapes")
+        cuboids = dict(self.cuboids)
+        for key, table in other.cuboids.items():
+            cuboids[key] = table if key not in cuboids else cuboids[key].add(table, fill_value=0)
+        return AggregateCube(self.dimensions, cuboids, date_column=self.date_column, max_order=self.max_order)
+
+    def between(self, start: Optional[Any] = None, end: Optional[Any] = None) -> "AggregateCube":
+        """The cube of the dates from `start` to `end` (inclusive, None for
+        open); every cuboid is filtered, none is recomputed."""
+        cuboids = {}
+        for key, table in self.cuboids.items():
+            dates = table.index.get_level_values(self.date_column)
+            mask = np.ones(len(table), dtype=bool)
+            if start is not None:
+                mask &= dates >= pd.Timestamp(start)
+            if end is not None:
+                mask &= dates <= pd.Timestamp(end)
+            cuboids[key] = table[mask]
+        return AggregateCube(self.dimensions, cuboids, date_column=self.date_column, max_order=self.max_order)
+
+    def cuboid_for(self, dimensions: Iterable[str]) -> Tuple[Tuple[str, ...], pd.DataFrame]:
+        """The smallest materialized cuboid holding every one of `dimensions`."""
+        needed = set(dimensions) - {self.date_column}
+        unknown = needed - set(self.dimensions)
+        if unknown:
+            raise KeyError(f"not a cube dimension: {sorted(unknown)}")
+        covering = [(len(t), key, t) for key, t in self.cuboids.items() if needed <= set(key)]
+        _, key, table = min(covering, key=lambda c: (c[0], len(c[1])))
+        return key, table
+
+    def query(
+        self,
+        by: Sequence[str] = (),
+        where: Optional[Mapping[str, Filter]] = None,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+    ) -> pd.DataFrame:
+        """Slice, dice and roll up.
+
+        `where` keeps rows whose dimension equals a value (or one of a list
+        of values, compared as text); `start` / `end` bound the date
+        (inclusive); the result is summed by `by` (the date column may be
+        one of them), or to a single total row without `by`. ROAS and CTR
+        are added as ratios of the sums.
+        """
+        where = dict(where or {})
+        _, table = self.cuboid_for([*by, *where])
+        index = table.index
+        mask = np.ones(len(table), dtype=bool)
+        dates = index.get_level_values(self.date_column)
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+        for dim, value in where.items():
+            values = [value] if isinstance(value, str) or not isinstance(value, Iterable) else list(value)
+            # match against the level's distinct labels, then select by code
+            level = index.names.index(dim)
+            wanted = np.flatnonzero(index.levels[level].astype(str).isin([str(v) for v in values]))
+            mask &= np.isin(index.codes[level], wanted)
+        selected = table[mask]
+
+        if by:
+            result = selected.groupby(level=list(by), dropna=False, observed=True).sum()
+        else:
+            result = selected.sum().to_frame().T
+        for metric in RATIO_METRICS:
+            result[metric] = AggregationEngine.ratio(result, metric)
+        return result
+
+
+def rollups(dimensions: Sequence[str], max_order: int) -> List[Tuple[str, ...]]:
+    """Cuboids materialized for `dimensions`: (), every combination of up
+    to `max_order` dimensions, and all of them."""
+    combos: List[Tuple[str, ...]] = [()]
+    for order in range(1, min(max_order, len(dimensions)) + 1):
+        combos.extend(itertools.combinations(dimensions, order))
+    if tuple(dimensions) not in combos:
+        combos.append(tuple(dimensions))
+    return combos
+
+
+def _rollup(table: pd.DataFrame, levels: List[str]) -> pd.DataFrame:
+    return table.groupby(level=levels, dropna=False, observed=True).sum()
+
+
+class CubeStore:
+    """Shape and location of the persisted cube.
+
+    The cube is saved under `directory` as one uncompressed Feather file per
+    cuboid plus `cube.json`, which names the current files; files are
+    written under a fresh generation suffix and `cube.json` is replaced
+    last, so a reader never sees a half-written cube. The files of the
+    previous generation are kept for readers that loaded the old
+    `cube.json` just before; older generations are deleted. Requires
+    pyarrow.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        dimensions: Optional[Sequence[str]] = None,
+        max_order: int = 2,
+        date_column: str = "date",
+    ) -> None:
+        if feather is None:
+            raise RuntimeError("CubeStore requires pyarrow (pip install pyarrow).")
+        self.directory = Path(directory)
+        self.dimensions = list(dimensions if dimensions is not None else CUBE_DIMENSIONS)
+        self.max_order = max_order
+        self.date_column = date_column
+
+    @property
+    def base_key(self) -> Tuple[str, ...]:
+        """Aggregation key of the base cuboid."""
+        return (self.date_column, *self.dimensions)
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / "cube.json"
+
+    def build(self, base: pd.DataFrame) -> AggregateCube:
+        return AggregateCube.from_base(base, self.dimensions, self.date_column, self.max_order)
+
+    def load(self) -> Optional[AggregateCube]:
+        """The saved cube, or None when there is none or it has another
+        shape or version."""
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if (
+            meta.get("version") != CUBE_VERSION
+            or meta.get("max_order") != self.max_order
+            or meta.get("date_column") != self.date_column
+            or meta.get("configured") != self.dimensions
+        ):
+            return None
+        cuboids: Dict[Tuple[str, ...], pd.DataFrame] = {}
+        try:
+            for entry in meta["cuboids"]:
+                levels = [self.date_column, *entry["dimensions"]]
+                cuboids[tuple(entry["dimensions"])] = read_table(self.directory / entry["file"], levels)
+        except (OSError, ValueError):
+            return None  # files of a generation deleted meanwhile
+        return AggregateCube(meta["dimensions"], cuboids, date_column=self.date_column, max_order=self.max_order)
+
+    def save(self, cube: AggregateCube) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        previous = self._files()
+        generation = uuid.uuid4().hex[:8]
+        entries = []
+        for n, (dims, table) in enumerate(cube.cuboids.items()):
+            name = f"cuboid-{n:03d}.{generation}.arrow"
+            write_table(self.directory / name, table, self.date_column)
+            entries.append({"dimensions": list(dims), "file": name})
+
+        meta = {
+            "version": CUBE_VERSION,
+            "configured": self.dimensions,
+            "dimensions": cube.dimensions,
+            "date_column": cube.date_column,
+            "max_order": cube.max_order,
+            "last_date": cube.last_date.strftime("%Y-%m-%d") if cube.last_date is not None else None,
+            "cuboids": entries,
+        }
+        with atomic_open(self.meta_path) as f:
+            json.dump(meta, f, indent=2)
+        keep = previous | {entry["file"] for entry in entries}
+        for stale in self.directory.glob("cuboid-*.arrow"):
+            if stale.name not in keep:
+                stale.unlink(missing_ok=True)
+
+    def _files(self) -> Set[str]:
+        """Cuboid files the current `cube.json` names."""
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return set()
+        return {entry["file"] for entry in meta.get("cuboids", [])}
+
+
+def cube_store_from_config(config: Dict[str, Any]) -> Optional[CubeStore]:
+    """`CubeStore` from the `cube` config block; None when disabled."""
+    settings = config.get("cube", {})
+    if not settings.get("enabled", False):
+        return None
+    return CubeStore(
+        config["paths"].get("cube_dir", "cache/cube"),
+        dimensions=settings.get("dimensions"),
+        max_order=settings.get("max_order", 2),
+        date_column=config["data"].get("date_column", "date"),
+    )
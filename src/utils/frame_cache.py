@@ -0,0 +1,104 @@
+import hashlib
+import json
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from src.utils.writers import atomic_open, atomic_path
+
+try:  # optional dependency: the cache is disabled without pyarrow
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on environment
+    pa = None
+    feather = None
+
+
+@dataclass
+class SourceFingerprint:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def file_sha256(path: str | Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path: str | Path) -> SourceFingerprint:
+    p = Path(path).resolve()
+    stat = p.stat()
+    return SourceFingerprint(
+        path=str(p),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=file_sha256(p),
+    )
+
+
+class FrameCache:
+    """On-disk Feather cache for parsed source files.
+
+    One entry is kept per source path: `<key>.feather` holds the typed frame
+    (uncompressed, so it can be memory-mapped) and `<key>.json` holds the
+    fingerprint it was built from. An entry is only used when path, size,
+    mtime and content hash all match; otherwise it is overwritten on the next
+    store, so stale entries never need explicit invalidation.
+    """
+
+    def __init__(self, cache_dir: str | Path) -> None:
+        if feather is None:
+            raise RuntimeError("FrameCache requires pyarrow (pip install pyarrow).")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def available() -> bool:
+        return feather is not None
+
+    def _entry_paths(self, source: str | Path) -> tuple[Path, Path]:
+        key = hashlib.sha1(str(Path(source).resolve()).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.feather", self.cache_dir / f"{key}.json"
+
+    def load(self, source: str | Path) -> Optional[pd.DataFrame]:
+        data_path, meta_path = self._entry_paths(source)
+        if not data_path.exists() or not meta_path.exists():
+            return None
+
+        try:
+            stored = SourceFingerprint(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except (ValueError, TypeError):
+            return None
+
+        # cheap checks first; only hash the source when size and mtime still match
+        p = Path(source).resolve()
+        stat = p.stat()
+        if (
+            stored.path != str(p)
+            or stored.size != stat.st_size
+            or stored.mtime_ns != stat.st_mtime_ns
+            or stored.sha256 != file_sha256(p)
+        ):
+            return None
+
+        table = feather.read_table(data_path, memory_map=True)
+        return table.to_pandas()
+
+    def store(self, source: str | Path, df: pd.DataFrame) -> None:
+        data_path, meta_path = self._entry_paths(source)
+        fp = fingerprint(source)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with atomic_path(data_path) as tmp_data:
+            feather.write_feather(table, tmp_data, compression="uncompressed")
+        # write metadata last so a crash never leaves a "valid" entry
+        # pointing at a partial data file
+        with atomic_open(meta_path) as f:
+            json.dump(asdict(fp), f)
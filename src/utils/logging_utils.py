@@ -1,14 +1,46 @@
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
 import sys
-from datetime import datetime
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+try:  # optional, several times faster than the stdlib encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore[assignment]
+
+
+def _stdlib_dumps(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, default=str)
+
+
+def _orjson_dumps(obj: Dict[str, Any]) -> str:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def json_encoder(name: str = "auto") -> Callable[[Dict[str, Any]], str]:
+    """`"json"`, `"orjson"` or `"auto"` (orjson when installed)."""
+    if name == "json" or (name == "auto" and orjson is None):
+        return _stdlib_dumps
+    if name in ("orjson", "auto"):
+        if orjson is None:
+            raise RuntimeError("encoder 'orjson' requested but orjson is not installed")
+        return _orjson_dumps
+    raise ValueError(f"Unknown log encoder {name!r}")
 
 
 class JsonLogFormatter(logging.Formatter):
+    def __init__(self, encoder: str = "json") -> None:
+        super().__init__()
+        self._dumps = json_encoder(encoder)
+
     def format(self, record: logging.LogRecord) -> str:
         base: Dict[str, Any] = {
-            "ts": datetime.utcnow().isoformat() + "Z",
+            # time the event happened, not when a background writer got to it
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + "Z",
             "level": record.levelname,
             "message": record.getMessage(),
         }
@@ -18,10 +50,91 @@ class JsonLogFormatter(logging.Formatter):
                 base[key] = getattr(record, key)
         if hasattr(record, "extra_fields") and isinstance(record.extra_fields, dict):
             base.update(record.extra_fields)
-        return json.dumps(base)
+        return self._dumps(base)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a bounded queue drained by a background listener.
+
+    - `overflow="drop"`: a full queue drops the record (counted in `dropped`)
+      so callers never wait on log I/O.
+    - `overflow="block"`: a full queue blocks the caller until the writer
+      catches up (backpressure; nothing is lost).
+
+    Formatting happens on the writer thread, not the caller's.
+    """
 
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", overflow: str = "drop") -> None:
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
 
-def setup_logger(log_file: Optional[str] = None) -> logging.Logger:
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # log_event builds a fresh extra dict per call, so the record can be
+        # passed on untouched and formatted later
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def shutdown_logging() -> None:
+    """Drain the background queue and stop the writer; registered at exit."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    logger = logging.getLogger("kasparro")
+    for handler in list(logger.handlers):
+        if isinstance(handler, BoundedQueueHandler) and handler.dropped:
+            # the writer is stopped: report straight to the file handler
+            record = logger.makeRecord(
+                logger.name,
+                logging.WARNING,
+                __file__,
+                0,
+                "log_records_dropped",
+                (),
+                None,
+                extra={"extra_fields": {"event": "log_records_dropped", "dropped": handler.dropped}},
+            )
+            for target in listener.handlers:
+                target.handle(record)
+    for target in listener.handlers:
+        target.flush()
+
+
+def setup_logger(
+    log_file: Optional[str] = None,
+    *,
+    queued: bool = False,
+    queue_size: int = 10_000,
+    overflow: str = "drop",
+    encoder: str = "json",
+    max_bytes: int = 0,
+    backup_count: int = 5,
+) -> logging.Logger:
+    """Configure the `kasparro` JSON logger (once per process).
+
+    - `queued`: write through a bounded in-memory queue and a background
+      thread (`BoundedQueueHandler`); flushed by `shutdown_logging` at exit.
+    - `encoder`: `"json"`, `"orjson"` or `"auto"`.
+    - `max_bytes`: rotate `log_file` at this size, keeping `backup_count`
+      old files; 0 disables rotation.
+    """
+    global _listener
     logger = logging.getLogger("kasparro")
     if logger.handlers:
         return logger  # already configured
@@ -29,13 +142,25 @@ def setup_logger(log_file: Optional[str] = None) -> logging.Logger:
     logger.setLevel(logging.INFO)
 
     handler: logging.Handler
-    if log_file:
+    if log_file and max_bytes > 0:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    elif log_file:
         handler = logging.FileHandler(log_file, encoding="utf-8")
     else:
         handler = logging.StreamHandler(sys.stdout)
 
-    handler.setFormatter(JsonLogFormatter())
-    logger.addHandler(handler)
+    handler.setFormatter(JsonLogFormatter(encoder))
+
+    if queued:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        logger.addHandler(BoundedQueueHandler(log_queue, overflow=overflow))
+    else:
+        logger.addHandler(handler)
     return logger
 
 
@@ -50,6 +175,8 @@ def log_event(
     runtime_ms: Optional[float] = None,
     extra: Optional[Dict[str, Any]] = None,
 ) -> None:
+    if not logger.isEnabledFor(level):
+        return
     extra_fields = {
         "agent": agent,
         "stage": stage,
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from src.utils.writers import atomic_open
+
+
+def memo_key(parts: Iterable[Any]) -> str:
+    """Stable key for a tuple of JSON-serialisable parts."""
+    return hashlib.sha1(json.dumps(list(parts), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class JsonMemo:
+    """Small persistent key -> JSON value memo backed by one file.
+
+    Loaded once on construction; `save` rewrites the file atomically and only
+    when something was added or a hit changed the use order, so the order
+    survives a restart of a run that only reads. Holds at most `max_entries`
+    values: past that the least recently used are dropped.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 10000) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._data: Dict[str, Any] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                # corrupt file: start over rather than fail the run
+                self._data = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            if next(reversed(self._data)) != key:
+                self._data[key] = self._data.pop(key)  # most recently used last
+                self._dirty = True
+            return self._data[key]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_entries:
+                del self._data[next(iter(self._data))]
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # the temp file is unique per writer, so processes sharing the
+            # memo never clobber each other's half-written file; the last
+            # rename wins
+            with atomic_open(self.path) as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            self._dirty = False
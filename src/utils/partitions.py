@@ -0,0 +1,173 @@
+import glob
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# suffix -> reader format
+FORMATS: Dict[str, str] = {
+    ".csv": "csv",
+    ".csv.gz": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+
+# 2024-03-01, 20240301, date=2024-03-01; 2024-03 for a monthly file
+_DAY = re.compile(r"(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)")
+_MONTH = re.compile(r"(?<!\d)(\d{4})-(\d{2})(?![-\d])")
+
+
+def data_format(path: str | Path) -> Optional[str]:
+    name = Path(path).name.lower()
+    for suffix, fmt in FORMATS.items():
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+def _strip_suffix(name: str) -> str:
+    lower = name.lower()
+    for suffix in sorted(FORMATS, key=len, reverse=True):
+        if lower.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def partition_dates(path: str | Path) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """(first, last) day a file covers, read from its name or, failing
+    that, its parent directories; (None, None) when no date is found."""
+    parts = Path(path).parts
+    for part in reversed([*parts[:-1], _strip_suffix(parts[-1])]):
+        day = _DAY.search(part)
+        if day:
+            try:
+                ts = pd.Timestamp(f"{day.group(1)}-{day.group(2)}-{day.group(3)}")
+            except ValueError:
+                continue
+            return ts, ts
+        month = _MONTH.search(part)
+        if month:
+            try:
+                first = pd.Timestamp(f"{month.group(1)}-{month.group(2)}-01")
+            except ValueError:
+                continue
+            return first, first + pd.offsets.MonthEnd(0)
+    return None, None
+
+
+@dataclass(frozen=True)
+class Partition:
+    path: Path
+    format: str
+    first: Optional[pd.Timestamp] = None  # None: undated, always read
+    last: Optional[pd.Timestamp] = None
+
+    def overlaps(self, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> bool:
+        if self.first is None or self.last is None:
+            return True
+        if start is not None and self.last < start:
+            return False
+        if end is not None and self.first > end:
+            return False
+        return True
+
+
+def is_partitioned(source: str | Path) -> bool:
+    """True for a directory or a glob pattern rather than one file."""
+    source = str(source)
+    return Path(source).is_dir() or glob.has_magic(source)
+
+
+def discover(source: str | Path) -> List[Partition]:
+    """Data files under a directory (recursively), matching a glob, or the
+    single file `source`, in path order. Files of unknown formats are
+    ignored."""
+    source = str(source)
+    if Path(source).is_dir():
+        paths = [p for p in Path(source).rglob("*") if p.is_file()]
+    elif glob.has_magic(source):
+        paths = [Path(p) for p in glob.glob(source, recursive=True) if Path(p).is_file()]
+    else:
+        paths = [Path(source)]
+
+    partitions = []
+    for path in sorted(paths):
+        fmt = data_format(path)
+        if fmt is None or path.name.startswith("."):
+            continue
+        first, last = partition_dates(path)
+        partitions.append(Partition(path=path, format=fmt, first=first, last=last))
+    return partitions
+
+
+def source_signature(source: str | Path) -> Tuple[Tuple[str, int, int], ...]:
+    """(path, size, mtime_ns) of every data file behind `source`. Changes
+    when a file is added, removed or rewritten; missing files are left out."""
+    signature = []
+    for partition in discover(source):
+        try:
+            stat = partition.path.stat()
+        except OSError:
+            continue
+        signature.append((str(partition.path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+@dataclass(frozen=True)
+class DateRange:
+    """Dates a run needs: fixed `start` / `end` (inclusive) and/or the last
+    `last_days` days up to the newest data."""
+
+    start: Optional[pd.Timestamp] = None
+    end: Optional[pd.Timestamp] = None
+    last_days: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, block: Optional[Dict[str, Any]]) -> "DateRange":
+        block = block or {}
+        return cls(
+            start=pd.Timestamp(block["start"]) if block.get("start") else None,
+            end=pd.Timestamp(block["end"]) if block.get("end") else None,
+            last_days=int(block["last_days"]) if block.get("last_days") else None,
+        )
+
+    def resolve(self, latest: Optional[pd.Timestamp]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Concrete (start, end); `last_days` counts back from `end`, or
+        from `latest` (the newest partition) when no end is set."""
+        start, end = self.start, self.end
+        if self.last_days:
+            anchor = end if end is not None else latest
+            if anchor is not None:
+                window_start = anchor - pd.Timedelta(days=self.last_days - 1)
+                start = window_start if start is None else max(start, window_start)
+        return start, end
+
+
+def select(
+    partitions: List[Partition],
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+) -> List[Partition]:
+    """Partitions that may hold rows dated within [start, end]."""
+    return [p for p in partitions if p.overlaps(start, end)]
+
+
+def latest_date(partitions: List[Partition]) -> Optional[pd.Timestamp]:
+    dated = [p.last for p in partitions if p.last is not None]
+    return max(dated) if dated else None
+
+
+def read_columnar(partition: Partition) -> pd.DataFrame:
+    """Read a Parquet or Feather partition (requires pyarrow)."""
+    try:
+        if partition.format == "parquet":
+            return pd.read_parquet(partition.path)
+        return pd.read_feather(partition.path)
+    except ImportError as exc:  # pragma: no cover - depends on the environment
+        raise RuntimeError(
+            f"Reading {partition.format} partitions requires pyarrow (pip install pyarrow): {partition.path}"
+        ) from exc
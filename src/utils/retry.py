@@ -1,18 +1,45 @@
+import asyncio
+import contextvars
 import functools
+import random
 import time
-from typing import Any, Callable, Type, Tuple
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type, Tuple
 
 
 class RetryError(RuntimeError):
     """Raised when a retried operation fails permanently."""
 
 
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Backoff settings from the config `retry` block."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    backoff_factor: float = 2.0
+    jitter: float = 0.1  # async_retry only
+
+    @classmethod
+    def from_config(cls, block: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        block = block or {}
+        default = cls()
+        return cls(
+            max_attempts=int(block.get("max_attempts", default.max_attempts)),
+            base_delay=float(block.get("base_delay", default.base_delay)),
+            backoff_factor=float(block.get("backoff_factor", default.backoff_factor)),
+            jitter=float(block.get("jitter", default.jitter)),
+        )
+
+
 def retry(
     *,
     max_attempts: int = 3,
     base_delay: float = 0.2,
     backoff_factor: float = 2.0,
     exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+    giveup: Tuple[Type[BaseException], ...] = (),
     on_retry: Callable[[int, BaseException], None] | None = None,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     """Simple exponential backoff retry decorator.
@@ -20,6 +47,8 @@ def retry(
     - `max_attempts`: total attempts including the first one.
     - `base_delay`: delay before the second attempt.
     - `backoff_factor`: multiplier for each subsequent delay.
+    - `giveup`: exceptions re-raised at once, without further attempts
+      (e.g. `CircuitOpenError`).
     """
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
@@ -31,6 +60,8 @@ def retry(
             while attempt < max_attempts:
                 try:
                     return func(*args, **kwargs)
+                except giveup:
+                    raise
                 except exceptions as exc:  # type: ignore[misc]
                     last_exc = exc
                     attempt += 1
@@ -45,3 +76,150 @@ def retry(
         return wrapper
 
     return decorator
+
+
+# Global cap on concurrently running async calls. asyncio primitives belong to
+# one event loop, so one semaphore is kept per running loop.
+_global_limit: int = 16
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def set_global_concurrency(limit: int) -> None:
+    """Set the global async concurrency limit (applies to loops started later)."""
+    global _global_limit
+    if limit < 1:
+        raise ValueError("concurrency limit must be >= 1")
+    _global_limit = limit
+    _semaphores.clear()
+
+
+def global_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(_global_limit)
+        _semaphores[loop] = sem
+    return sem
+
+
+class _Attempt:
+    """Threads an attempt left running when it was cancelled."""
+
+    __slots__ = ("pending",)
+
+    def __init__(self) -> None:
+        self.pending: List["asyncio.Future[Any]"] = []
+
+
+_attempt: "contextvars.ContextVar[Optional[_Attempt]]" = contextvars.ContextVar("_attempt", default=None)
+
+
+async def run_in_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """`asyncio.to_thread` for work started inside `async_retry`.
+
+    A thread cannot be cancelled: when the attempt times out the call keeps
+    running. The attempt records it so its concurrency slot is released only
+    once the thread returns, and the global limit bounds the calls really in
+    flight, not just the ones still awaited.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    future = loop.run_in_executor(None, call)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        attempt = _attempt.get()
+        if attempt is not None:
+            attempt.pending.append(future)
+        raise
+
+
+def _release_after(sem: asyncio.Semaphore, pending: List["asyncio.Future[Any]"]) -> None:
+    running = [f for f in pending if not f.done()]
+    if not running:
+        sem.release()
+        return
+    remaining = len(running)
+
+    def done(future: "asyncio.Future[Any]") -> None:
+        nonlocal remaining
+        if not future.cancelled():
+            future.exception()  # the attempt already failed; nothing awaits this result
+        remaining -= 1
+        if remaining == 0:
+            sem.release()
+
+    for future in running:
+        future.add_done_callback(done)
+
+
+def async_retry(
+    *,
+    max_attempts: int = 3,
+    base_delay: float = 0.2,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.1,
+    timeout: float | None = None,
+    exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+    giveup: Tuple[Type[BaseException], ...] = (),
+    on_retry: Callable[[int, BaseException], None] | None = None,
+    limit_concurrency: bool = True,
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Async counterpart of `retry` that never blocks the event loop.
+
+    - `jitter`: each backoff delay is scaled by a random factor in
+      `[1 - jitter, 1 + jitter]` so concurrent callers do not retry in lockstep.
+    - `timeout`: per-attempt limit in seconds; a timed-out attempt counts as a
+      failure and is retried.
+    - `limit_concurrency`: hold the global semaphore (`set_global_concurrency`)
+      while an attempt runs. It is released during backoff, so sleeping
+      callers do not occupy slots, except by a timed-out attempt whose
+      `run_in_thread` call is still running: that slot is released when the
+      thread returns.
+    """
+
+    retry_on = tuple(exceptions) + (asyncio.TimeoutError,)
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            attempt = 0
+            delay = base_delay
+            last_exc: BaseException | None = None
+            while attempt < max_attempts:
+                try:
+                    if limit_concurrency:
+                        return await _limited_attempt(func, args, kwargs, timeout)
+                    return await asyncio.wait_for(func(*args, **kwargs), timeout)
+                except giveup:
+                    raise
+                except retry_on as exc:  # type: ignore[misc]
+                    last_exc = exc
+                    attempt += 1
+                    if attempt >= max_attempts:
+                        break
+                    if on_retry is not None:
+                        on_retry(attempt, exc)
+                    await asyncio.sleep(delay * random.uniform(1 - jitter, 1 + jitter))
+                    delay *= backoff_factor
+            raise RetryError(f"Function {func.__name__} failed after {max_attempts} attempts") from last_exc
+
+        return wrapper
+
+    return decorator
+
+
+async def _limited_attempt(
+    func: Callable[..., Awaitable[Any]], args: Tuple[Any, ...], kwargs: Dict[str, Any], timeout: float | None
+) -> Any:
+    sem = global_semaphore()
+    await sem.acquire()
+    attempt = _Attempt()
+    token = _attempt.set(attempt)  # copied into the task `wait_for` creates
+    try:
+        return await asyncio.wait_for(func(*args, **kwargs), timeout)
+    finally:
+        _attempt.reset(token)
+        _release_after(sem, attempt.pending)
@@ -1,38 +1,105 @@
-from dataclasses import dataclass
-from typing import List, Set
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 import pandas as pd
+from pandas.api import types as ptypes
 
 
-EXPECTED_COLUMNS: Set[str] = {
-    "campaign_name",
-    "adset_name",
-    "date",
-    "spend",
-    "impressions",
-    "clicks",
-    "ctr",
-    "purchases",
-    "revenue",
-    "roas",
-    "creative_type",
-    "creative_message",
-    "audience_type",
-    "platform",
-    "country",
+# Typed column spec. Low-cardinality strings are categoricals (far smaller than
+# object columns and much faster as group keys), counts use 32-bit ints and
+# money / ratio columns stay float64 so sums keep full precision.
+COLUMN_DTYPES: Dict[str, str] = {
+    "campaign_name": "category",
+    "adset_name": "category",
+    "date": "datetime64[ns]",
+    "spend": "float64",
+    "impressions": "int32",
+    "clicks": "int32",
+    "ctr": "float64",
+    "purchases": "int32",
+    "revenue": "float64",
+    "roas": "float64",
+    "creative_type": "category",
+    "creative_message": "category",
+    "audience_type": "category",
+    "platform": "category",
+    "country": "category",
 }
 
+EXPECTED_COLUMNS: Set[str] = set(COLUMN_DTYPES)
+
 
 @dataclass
 class SchemaValidationResult:
     ok: bool
     missing: List[str]
     extra: List[str]
+    # column -> "expected <spec>, got <actual>"
+    dtype_mismatches: Dict[str, str] = field(default_factory=dict)
+    # set when the file could not be read at all
+    error: Optional[str] = None
+
+
+def read_csv_options(columns: Iterable[str]) -> Dict[str, Any]:
+    """`pd.read_csv` keyword arguments that apply the spec to `columns`.
+
+    Only columns that are actually present are listed, because `parse_dates`
+    rejects unknown names.
+    """
+    present = [c for c in columns if c in COLUMN_DTYPES]
+    dtypes = {c: COLUMN_DTYPES[c] for c in present if not COLUMN_DTYPES[c].startswith("datetime")}
+    dates = [c for c in present if COLUMN_DTYPES[c].startswith("datetime")]
+    return {"dtype": dtypes, "parse_dates": dates}
+
+
+def coerce_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Best-effort conversion of `df` to the spec.
 
+    Columns that cannot be converted are left as they are so that
+    `validate_schema` can report them instead of the load failing outright.
+    Integer columns holding missing values fall back to float64.
+    """
+    out = df
+    for col, spec in COLUMN_DTYPES.items():
+        if col not in out.columns or str(out[col].dtype) == spec:
+            continue
+        if out is df:
+            out = df.copy()
+        try:
+            if spec.startswith("datetime"):
+                out[col] = pd.to_datetime(out[col])
+            elif spec == "category":
+                out[col] = out[col].astype("category")
+            else:
+                numeric = pd.to_numeric(out[col])
+                try:
+                    out[col] = numeric.astype(spec)
+                except (ValueError, TypeError):
+                    out[col] = numeric.astype("float64")
+        except (ValueError, TypeError):
+            continue
+    return out
 
-def validate_schema(df: pd.DataFrame) -> SchemaValidationResult:
+
+def _dtype_matches(series: pd.Series, spec: str) -> bool:
+    if spec.startswith("datetime"):
+        return ptypes.is_datetime64_any_dtype(series)
+    if spec == "category":
+        return isinstance(series.dtype, pd.CategoricalDtype) or ptypes.is_object_dtype(series)
+    return ptypes.is_numeric_dtype(series) and not ptypes.is_bool_dtype(series)
+
+
+def validate_schema(df: pd.DataFrame, check_dtypes: bool = True) -> SchemaValidationResult:
     cols = set(df.columns)
     missing = sorted(list(EXPECTED_COLUMNS - cols))
     extra = sorted(list(cols - EXPECTED_COLUMNS))
-    ok = len(missing) == 0
-    return SchemaValidationResult(ok=ok, missing=missing, extra=extra)
+
+    mismatches: Dict[str, str] = {}
+    if check_dtypes:
+        for col in sorted(cols & EXPECTED_COLUMNS):
+            spec = COLUMN_DTYPES[col]
+            if not _dtype_matches(df[col], spec):
+                mismatches[col] = f"expected {spec}, got {df[col].dtype}"
+
+    ok = len(missing) == 0 and len(mismatches) == 0
+    return SchemaValidationResult(ok=ok, missing=missing, extra=extra, dtype_mismatches=mismatches)
@@ -0,0 +1,477 @@
+import itertools
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.aggregation import RATIO_METRICS, ROW_COUNT
+
+# Columns a segment can be cut by, in report order.
+SEGMENT_DIMENSIONS: List[str] = [
+    "campaign_name",
+    "adset_name",
+    "creative_type",
+    "audience_type",
+    "platform",
+    "country",
+]
+
+MISSING_LABEL = "(missing)"
+
+_MEASURES = ("spend", "revenue", "clicks", "impressions")
+
+
+# inclusive (first day, last day)
+Window = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def split_periods(dates: Any, current_days: Optional[int] = None) -> Tuple[Window, Window]:
+    """(before, after) windows over `dates` (at least two distinct days).
+
+    The last `current_days` days against the same number of days before
+    them; without `current_days`, the later half of the distinct dates
+    against the earlier half.
+    """
+    days = np.sort(pd.unique(np.asarray(dates, dtype="datetime64[ns]")))
+    if current_days:
+        end = pd.Timestamp(days[-1])
+        after_start = end - pd.Timedelta(days=current_days - 1)
+        before_start = after_start - pd.Timedelta(days=current_days)
+        return (before_start, after_start - pd.Timedelta(days=1)), (after_start, end)
+    half = len(days) // 2
+    return (
+        (pd.Timestamp(days[0]), pd.Timestamp(days[half - 1])),
+        (pd.Timestamp(days[half]), pd.Timestamp(days[-1])),
+    )
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1.0), np.nan)
+
+
+def _number(value: Any) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+@dataclass
+class SegmentChange:
+    """Period-over-period change of one segment.
+
+    `contribution` is the segment's share of the account ROAS change in ROAS
+    points: `revenue_after / spend_after_total - revenue_before /
+    spend_before_total`. Over the segments of one dimension set the
+    contributions add up to the total change. It splits into `rate_effect`
+    (the segment's own ROAS moved) and `mix_effect` (its share of spend
+    moved).
+    """
+
+    segment: Dict[str, str]
+    spend_before: float
+    spend_after: float
+    roas_before: Optional[float]
+    roas_after: Optional[float]
+    ctr_before: Optional[float]
+    ctr_after: Optional[float]
+    contribution: float
+    rate_effect: float
+    mix_effect: float
+    share: Optional[float]  # contribution / total ROAS change
+
+    @property
+    def label(self) -> str:
+        return ", ".join(f"{k}={v}" for k, v in self.segment.items())
+
+    @property
+    def roas_delta(self) -> Optional[float]:
+        if self.roas_before is None or self.roas_after is None:
+            return None
+        return self.roas_after - self.roas_before
+
+    @property
+    def ctr_delta(self) -> Optional[float]:
+        if self.ctr_before is None or self.ctr_after is None:
+            return None
+        return self.ctr_after - self.ctr_before
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "segment": dict(self.segment),
+            "spend_before": self.spend_before,
+            "spend_after": self.spend_after,
+            "roas_before": self.roas_before,
+            "roas_after": self.roas_after,
+            "roas_delta": self.roas_delta,
+            "ctr_before": self.ctr_before,
+            "ctr_after": self.ctr_after,
+            "ctr_delta": self.ctr_delta,
+            "contribution": self.contribution,
+            "rate_effect": self.rate_effect,
+            "mix_effect": self.mix_effect,
+            "share": self.share,
+        }
+
+
+@dataclass
+class SegmentScan:
+    """Result of `SegmentScanner.scan`.
+
+    `segments` holds every scanned segment, ranked: one column per
+    dimension (NaN where the segment is not cut by it) plus the period sums
+    and deltas. `top` holds the leading, non-overlapping segments.
+    """
+
+    period_before: Tuple[str, str]
+    period_after: Tuple[str, str]
+    roas_before: Optional[float]
+    roas_after: Optional[float]
+    ctr_before: Optional[float]
+    ctr_after: Optional[float]
+    segments: pd.DataFrame
+    top: List[SegmentChange] = field(default_factory=list)
+
+    @property
+    def roas_delta(self) -> Optional[float]:
+        if self.roas_before is None or self.roas_after is None:
+            return None
+        return self.roas_after - self.roas_before
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary for the Insight Agent (JSON-serializable; no full table)."""
+        return {
+            "period_before": list(self.period_before),
+            "period_after": list(self.period_after),
+            "roas_before": self.roas_before,
+            "roas_after": self.roas_after,
+            "roas_delta": self.roas_delta,
+            "ctr_before": self.ctr_before,
+            "ctr_after": self.ctr_after,
+            "segments_scanned": len(self.segments),
+            "top_segments": [c.to_dict() for c in self.top],
+        }
+
+
+@dataclass
+class SegmentSums:
+    """Per-segment period sums before ranking (`SegmentScanner.sums`).
+
+    `segments` has the `order` and dimension columns plus `<measure>_before`
+    / `<measure>_after`; `totals` maps each measure to its [before, after]
+    account totals.
+    """
+
+    period_before: Window
+    period_after: Window
+    dimensions: List[str]
+    totals: Dict[str, np.ndarray]
+    segments: pd.DataFrame
+
+
+def merge_sums(parts: Sequence[SegmentSums]) -> SegmentSums:
+    """Combine the sums of disjoint row sets scanned with the same periods."""
+    first = parts[0]
+    keys = ["order", *first.dimensions]
+    segments = pd.concat([p.segments for p in parts], ignore_index=True)
+    if len(parts) > 1 and len(segments):
+        # a segment seen in several parts adds up; one seen once is unchanged
+        segments = segments.groupby(keys, dropna=False, sort=False).sum().reset_index()
+        # back to the scan's combination order, which breaks ranking ties
+        bits = segments[first.dimensions].notna().to_numpy() @ (1 << np.arange(len(first.dimensions)))
+        position = {
+            sum(1 << first.dimensions.index(d) for d in combo): i
+            for i, combo in enumerate(
+                c for order in range(1, len(first.dimensions) + 1) for c in itertools.combinations(first.dimensions, order)
+            )
+        }
+        segments = segments.iloc[np.argsort(np.vectorize(position.get)(bits), kind="stable")].reset_index(drop=True)
+    return SegmentSums(
+        period_before=first.period_before,
+        period_after=first.period_after,
+        dimensions=first.dimensions,
+        totals={m: sum(p.totals[m] for p in parts) for m in first.totals},
+        segments=segments,
+    )
+
+
+class SegmentScanner:
+    """Period-over-period ROAS / CTR deltas for every segment.
+
+    Segments are the values of each dimension and of every combination of
+    up to `max_order` dimensions (`platform=instagram`, `platform=instagram,
+    country=US`, ...). The scan reads a table of additive sums keyed by date
+    and all dimensions (`base_key`, built by `AggregationEngine`, so it works
+    the same on a whole frame, streamed chunks or incremental state). Each
+    dimension is factorized once; every combination is then one integer
+    code per row and its period sums are `np.bincount` calls, so tens of
+    thousands of segments cost a few array passes.
+
+    Periods: the last `current_days` days against the same number of days
+    before them, or, without `current_days`, the later half of the dates
+    against the earlier half.
+
+    A segment whose change is almost entirely (`drill_down`, as a share of
+    its contribution) carried by one finer segment is reported as that
+    finer segment: `platform=instagram, country=GB` rather than
+    `platform=instagram`.
+    """
+
+    def __init__(
+        self,
+        dimensions: Optional[Sequence[str]] = None,
+        max_order: int = 2,
+        top_k: int = 5,
+        min_spend_share: float = 0.01,
+        current_days: Optional[int] = None,
+        date_column: str = "date",
+        drill_down: float = 0.9,
+    ) -> None:
+        if max_order < 1:
+            raise ValueError("max_order must be at least 1")
+        self.dimensions = list(dimensions if dimensions is not None else SEGMENT_DIMENSIONS)
+        self.max_order = max_order
+        self.top_k = top_k
+        self.min_spend_share = min_spend_share
+        self.current_days = current_days
+        self.date_column = date_column
+        self.drill_down = drill_down
+
+    @property
+    def base_key(self) -> Tuple[str, ...]:
+        """Aggregation key of the table `scan` expects."""
+        return (self.date_column, *self.dimensions)
+
+    def periods(self, dates: Any) -> Tuple[Window, Window]:
+        """(before, after) windows the scan compares for these dates."""
+        return split_periods(dates, self.current_days)
+
+    def scan(self, base: pd.DataFrame) -> Optional[SegmentScan]:
+        """Scan a `base_key` table (index or columns) of additive sums.
+
+        Row-level frames work too: without a row count column each row
+        counts once. Returns None when there are fewer than two dates or no spend in
+        either period.
+        """
+        if base.index.name is not None:
+            base = base.reset_index()
+        columns = set(base.columns) | {n for n in base.index.names if n is not None}
+        if self.date_column not in columns:
+            return None
+        dates = pd.Series(_column(base, self.date_column)).astype("datetime64[ns]")
+        if dates.nunique() < 2:
+            return None
+        sums = self.sums(base, self.periods(dates.unique()))
+        return self.finish(sums) if sums is not None else None
+
+    def sums(self, base: pd.DataFrame, periods: Tuple[Window, Window]) -> Optional[SegmentSums]:
+        """Period sums of every segment of `base` for the given windows.
+
+        The first half of `scan`. Sums are additive, so tables of disjoint
+        rows (e.g. shards of one dataset) can be summed separately with the
+        same `periods` and combined with `merge_sums` before `finish`.
+        """
+        if base.index.name is not None:
+            base = base.reset_index()
+        columns = set(base.columns) | {n for n in base.index.names if n is not None}
+        if self.date_column not in columns or any(m not in base.columns for m in _MEASURES):
+            return None
+        before, after = periods
+        values = np.asarray(_column(base, self.date_column), dtype="datetime64[ns]")
+        period = np.full(len(values), -1, dtype=np.int64)
+        period[(values >= before[0].to_datetime64()) & (values <= before[1].to_datetime64())] = 0
+        period[(values >= after[0].to_datetime64()) & (values <= after[1].to_datetime64())] = 1
+
+        keep = period >= 0
+        period = period[keep]
+        measures = {m: base[m].to_numpy(dtype="float64")[keep] for m in _MEASURES}
+        measures[ROW_COUNT] = (
+            base[ROW_COUNT].to_numpy(dtype="float64")[keep] if ROW_COUNT in base.columns else np.ones(len(period))
+        )
+        totals = {m: np.bincount(period, weights=values, minlength=2) for m, values in measures.items()}
+
+        dims = [d for d in self.dimensions if d in columns]
+        codes: Dict[str, np.ndarray] = {}
+        labels: Dict[str, np.ndarray] = {}
+        for d in dims:
+            c, labels[d] = _encode(base, d)
+            codes[d] = c[keep]
+
+        frames = [
+            self._scan_combination(combo, codes, labels, period, measures)
+            for order in range(1, min(self.max_order, len(dims)) + 1)
+            for combo in itertools.combinations(dims, order)
+        ]
+        segments = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["order", *dims])
+        return SegmentSums(period_before=before, period_after=after, dimensions=dims, totals=totals, segments=segments)
+
+    def finish(self, sums: SegmentSums) -> Optional[SegmentScan]:
+        """Rank the segments of `sums` and pick the top ones; None when
+        either period has no spend."""
+        totals, dims = sums.totals, sums.dimensions
+        if totals["spend"][0] <= 0 or totals["spend"][1] <= 0:
+            return None
+        segments = self._rank(sums.segments.copy(), totals, dims)
+        roas = _ratio(totals["revenue"], totals["spend"])
+        ctr = _ratio(totals["clicks"], totals["impressions"])
+        before, after = sums.period_before, sums.period_after
+        return SegmentScan(
+            period_before=(before[0].strftime("%Y-%m-%d"), before[1].strftime("%Y-%m-%d")),
+            period_after=(after[0].strftime("%Y-%m-%d"), after[1].strftime("%Y-%m-%d")),
+            roas_before=_number(roas[0]),
+            roas_after=_number(roas[1]),
+            ctr_before=_number(ctr[0]),
+            ctr_after=_number(ctr[1]),
+            segments=segments,
+            top=self._select_top(segments, dims),
+        )
+
+    @staticmethod
+    def _scan_combination(
+        combo: Tuple[str, ...],
+        codes: Dict[str, np.ndarray],
+        labels: Dict[str, np.ndarray],
+        period: np.ndarray,
+        measures: Dict[str, np.ndarray],
+    ) -> pd.DataFrame:
+        shape = tuple(len(labels[d]) for d in combo)
+        combined = np.ravel_multi_index([codes[d] for d in combo], shape)
+        segment, uniques = pd.factorize(combined)
+        slots = segment.astype(np.int64) * 2 + period
+        n = len(uniques)
+        frame: Dict[str, Any] = {"order": np.full(n, len(combo), dtype=np.int64)}
+        for d, idx in zip(combo, np.unravel_index(uniques, shape)):
+            frame[d] = labels[d][idx]
+        for m, values in measures.items():
+            sums = np.bincount(slots, weights=values, minlength=2 * n).reshape(n, 2)
+            frame[f"{m}_before"], frame[f"{m}_after"] = sums[:, 0], sums[:, 1]
+        return pd.DataFrame(frame)
+
+    def _rank(self, segments: pd.DataFrame, totals: Dict[str, np.ndarray], dims: List[str]) -> pd.DataFrame:
+        if segments.empty:
+            return segments
+        spend0, spend1 = totals["spend"]
+        total_roas0, total_roas1 = totals["revenue"] / totals["spend"]
+        delta = total_roas1 - total_roas0
+
+        for metric in ("roas", "ctr"):
+            numerator, denominator = RATIO_METRICS[metric]
+            for side in ("before", "after"):
+                segments[f"{metric}_{side}"] = _ratio(
+                    segments[f"{numerator}_{side}"].to_numpy(), segments[f"{denominator}_{side}"].to_numpy()
+                )
+            segments[f"{metric}_delta"] = segments[f"{metric}_after"] - segments[f"{metric}_before"]
+
+        weight0 = segments["spend_before"].to_numpy() / spend0
+        weight1 = segments["spend_after"].to_numpy() / spend1
+        contribution = segments["revenue_after"].to_numpy() / spend1 - segments["revenue_before"].to_numpy() / spend0
+        # a segment without spend in one period changed only by mix
+        rate = np.nan_to_num(weight1 * segments["roas_delta"].to_numpy(), nan=0.0)
+        segments["contribution"] = contribution
+        segments["rate_effect"] = rate
+        segments["mix_effect"] = contribution - rate
+        segments["share"] = contribution / delta if delta != 0 else np.nan
+        segments["spend_share"] = (weight0 + weight1) / 2
+
+        # toward the direction of the total change first; ties: coarser
+        # segments, then stable label order
+        direction = -1.0 if delta < 0 else 1.0
+        segments["score"] = contribution * direction if delta != 0 else np.abs(contribution)
+        segments = segments.sort_values(["score", "order"], ascending=[False, True], kind="mergesort")
+        columns = ["order", *dims]
+        return segments[columns + [c for c in segments.columns if c not in columns]].reset_index(drop=True)
+
+    def _select_top(self, segments: pd.DataFrame, dims: List[str]) -> List[SegmentChange]:
+        """The best-ranked segments, skipping any that is nested in (or
+        contains) one already picked, or that covers exactly the same rows
+        under another name (an adset with a single audience), so the list
+        names distinct causes."""
+        if segments.empty or self.top_k <= 0:
+            return []
+        candidates = segments[(segments["spend_share"] >= self.min_spend_share) & (segments["score"] > 0)]
+        picked: List[Dict[str, str]] = []
+        seen_sums = set()
+        top: List[SegmentChange] = []
+        for row in candidates.itertuples(index=False):
+            row = self._drill_down(candidates, row, dims)
+            cut = {d: str(v) for d, v in _cut(row, dims).items()}
+            sums = (row.spend_before, row.spend_after, row.revenue_before, row.revenue_after, row.rows_before, row.rows_after)
+            if sums in seen_sums or any(_nested(cut, other) for other in picked):
+                continue
+            picked.append(cut)
+            seen_sums.add(sums)
+            top.append(
+                SegmentChange(
+                    segment=cut,
+                    spend_before=float(row.spend_before),
+                    spend_after=float(row.spend_after),
+                    roas_before=_number(row.roas_before),
+                    roas_after=_number(row.roas_after),
+                    ctr_before=_number(row.ctr_before),
+                    ctr_after=_number(row.ctr_after),
+                    contribution=float(row.contribution),
+                    rate_effect=float(row.rate_effect),
+                    mix_effect=float(row.mix_effect),
+                    share=_number(row.share),
+                )
+            )
+            if len(top) == self.top_k:
+                break
+        return top
+
+    def _drill_down(self, candidates: pd.DataFrame, row: Any, dims: List[str]) -> Any:
+        """The finest segment inside `row` that carries at least `drill_down`
+        of its score (`row` itself when there is none)."""
+        if row.order >= self.max_order:
+            return row
+        rows = candidates["rows_before"].to_numpy() + candidates["rows_after"].to_numpy()
+        mask = (
+            (candidates["order"].to_numpy() > row.order)
+            & (candidates["score"].to_numpy() >= self.drill_down * row.score)
+            # same rows under one more label is not a finer segment
+            & (rows < row.rows_before + row.rows_after)
+        )
+        for d, value in _cut(row, dims).items():
+            mask &= (candidates[d] == value).to_numpy()
+        if not mask.any():
+            return row
+        finer = candidates[mask]
+        # deepest first, then the largest score (candidates are ranked)
+        return next(finer.iloc[[int(np.argmax(finer["order"].to_numpy()))]].itertuples(index=False))
+
+
+def _cut(row: Any, dims: List[str]) -> Dict[str, Any]:
+    return {d: getattr(row, d) for d in dims if not pd.isna(getattr(row, d))}
+
+
+def _column(base: pd.DataFrame, name: str) -> Any:
+    if isinstance(base.index, pd.MultiIndex) and name in base.index.names:
+        return base.index.get_level_values(name)
+    return base[name]
+
+
+def _encode(base: pd.DataFrame, name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer codes and labels for one dimension. A `MultiIndex` level
+    already carries them; columns are factorized. Missing labels get a code
+    of their own (`MISSING_LABEL`) so NaN can mean "not cut by it"."""
+    if isinstance(base.index, pd.MultiIndex) and name in base.index.names:
+        level = base.index.names.index(name)
+        codes, uniques = base.index.codes[level], base.index.levels[level]
+    else:
+        codes, uniques = pd.factorize(base[name])
+    codes = np.where(codes < 0, len(uniques), codes).astype(np.int64)
+    return codes, np.append(np.asarray(uniques, dtype=object), MISSING_LABEL)
+
+
+def _nested(a: Dict[str, str], b: Dict[str, str]) -> bool:
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    return all(large.get(k) == v for k, v in small.items())
+
+
+def scanner_from_config(config: Dict[str, Any]) -> Optional[SegmentScanner]:
+    """`SegmentScanner` for the config `segments` block; None when disabled."""
+    block = dict(config.get("segments", {}))
+    if not block.pop("enabled", True):
+        return None
+    return SegmentScanner(date_column=config.get("data", {}).get("date_column", "date"), **block)
@@ -0,0 +1,255 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.utils.aggregation import RATIO_METRICS
+from src.utils.cube import AggregateCube
+from src.utils.segments import split_periods
+
+
+CLAIM_METRICS = ("roas", "ctr")
+CLAIM_DIRECTIONS = ("decrease", "increase")
+
+# what claims are tested on: a frame of sums or rows, or the aggregate cube
+ClaimTable = Union[pd.DataFrame, AggregateCube]
+
+
+@dataclass
+class Claim:
+    """What a hypothesis asserts, in a form the Evaluator Agent can test.
+
+    `metric` moved in `direction` for `segment` (dimension -> value; empty
+    for the whole account) between the `before` and `after` windows
+    (inclusive ISO dates; None uses the default split of the date range).
+    """
+
+    metric: str
+    direction: str
+    segment: Dict[str, str] = field(default_factory=dict)
+    before: Optional[Tuple[str, str]] = None
+    after: Optional[Tuple[str, str]] = None
+
+
+def claim_to_dict(c: Claim) -> Dict[str, Any]:
+    return {
+        "metric": c.metric,
+        "direction": c.direction,
+        "segment": dict(c.segment),
+        "before": list(c.before) if c.before is not None else None,
+        "after": list(c.after) if c.after is not None else None,
+    }
+
+
+def claim_from_dict(item: Dict[str, Any]) -> Claim:
+    """Parse `claim_to_dict` output; raises ValueError on anything else."""
+    if not isinstance(item, dict):
+        raise ValueError("claim must be an object")
+    metric, direction = item.get("metric"), item.get("direction")
+    if metric not in CLAIM_METRICS:
+        raise ValueError(f"claim metric must be one of {CLAIM_METRICS}, got {metric!r}")
+    if direction not in CLAIM_DIRECTIONS:
+        raise ValueError(f"claim direction must be one of {CLAIM_DIRECTIONS}, got {direction!r}")
+    segment = item.get("segment") or {}
+    if not isinstance(segment, dict):
+        raise ValueError("claim segment must be an object")
+
+    def window(key: str) -> Optional[Tuple[str, str]]:
+        value = item.get(key)
+        if value is None:
+            return None
+        if not isinstance(value, (list, tuple)) or len(value) != 2:
+            raise ValueError(f"claim {key} must be [first_day, last_day]")
+        return (str(value[0]), str(value[1]))
+
+    return Claim(
+        metric=metric,
+        direction=direction,
+        segment={str(k): str(v) for k, v in segment.items()},
+        before=window("before"),
+        after=window("after"),
+    )
+
+
+@dataclass
+class ClaimTests:
+    """Results of `bootstrap_claims`; every array has one entry per claim.
+
+    `support` is the share of bootstrap resamples in which the change goes
+    the claimed way (NaN when the claim has no data in a window). `ci_low` /
+    `ci_high` bound the change at the requested level.
+    """
+
+    before: np.ndarray
+    after: np.ndarray
+    delta: np.ndarray
+    ci_low: np.ndarray
+    ci_high: np.ndarray
+    support: np.ndarray
+    days_before: np.ndarray
+    days_after: np.ndarray
+    n_resamples: int
+
+
+def _measure_columns(table: ClaimTable) -> pd.Index:
+    if isinstance(table, AggregateCube):
+        return table.cuboids[()].columns
+    return table.columns
+
+
+def _segment_sums(
+    table: ClaimTable, dims: Tuple[str, ...], measures: List[str], date_column: str
+) -> Optional[pd.DataFrame]:
+    """`measures` summed by date and `dims`; None when the table has no
+    such dimension. A cube answers from its smallest covering cuboid."""
+    if isinstance(table, AggregateCube):
+        if any(d not in table.dimensions for d in dims):
+            return None
+        _, cuboid = table.cuboid_for(dims)
+        return cuboid.groupby(level=[date_column, *dims], observed=True)[measures].sum()
+    if any(d not in table.columns for d in dims):
+        return None
+    return table.groupby([date_column, *dims], observed=True)[measures].sum()
+
+
+def _daily_sums(
+    table: ClaimTable, claims: Sequence[Claim], days: pd.DatetimeIndex, date_column: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-day numerator and denominator of each claim's metric, shape
+    (days, claims); zero where a segment has no rows.
+
+    One groupby per distinct set of segment dimensions, not per claim: the
+    segments of all claims sharing a dimension set are looked up with one
+    `reindex`.
+    """
+    numerator = np.zeros((len(days), len(claims)))
+    denominator = np.zeros((len(days), len(claims)))
+    columns = _measure_columns(table)
+    measures = sorted({c for claim in claims for c in RATIO_METRICS[claim.metric] if c in columns})
+    position = {m: i for i, m in enumerate(measures)}
+    if not measures:
+        return numerator, denominator
+
+    by_dims: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+    for i, claim in enumerate(claims):
+        by_dims[tuple(claim.segment)].append(i)
+
+    for dims, idx in by_dims.items():
+        grouped = _segment_sums(table, dims, measures, date_column)
+        if grouped is None:
+            continue  # segment cut by a column the data does not have: no data
+        keys = [np.repeat(days.to_numpy(), len(idx))]
+        keys += [np.tile(np.array([claims[i].segment[d] for i in idx], dtype=object), len(days)) for d in dims]
+        if dims:
+            # labels compare as strings: claims come from JSON
+            grouped.index = grouped.index.set_levels(
+                [grouped.index.levels[k].astype(str) for k in range(1, len(dims) + 1)],
+                level=list(range(1, len(dims) + 1)),
+            )
+            lookup = pd.MultiIndex.from_arrays(keys)
+        else:
+            lookup = pd.Index(keys[0])
+        values = grouped.reindex(lookup, fill_value=0.0).to_numpy(dtype="float64")
+        values = values.reshape(len(days), len(idx), len(measures))
+
+        columns = np.arange(len(idx))
+        num_col = np.array([position.get(RATIO_METRICS[claims[i].metric][0], -1) for i in idx])
+        den_col = np.array([position.get(RATIO_METRICS[claims[i].metric][1], -1) for i in idx])
+        has = (num_col >= 0) & (den_col >= 0)
+        target = np.asarray(idx)[has]
+        numerator[:, target] = values[:, columns[has], num_col[has]]
+        denominator[:, target] = values[:, columns[has], den_col[has]]
+    return numerator, denominator
+
+
+def _window_masks(
+    claims: Sequence[Claim], days: pd.DatetimeIndex
+) -> Tuple[np.ndarray, np.ndarray]:
+    default_before, default_after = split_periods(days)
+    bounds = np.empty((4, len(claims)), dtype="datetime64[ns]")
+    for i, claim in enumerate(claims):
+        before = claim.before or default_before
+        after = claim.after or default_after
+        bounds[:, i] = [np.datetime64(pd.Timestamp(v), "ns") for v in (*before, *after)]
+    d = days.to_numpy()[:, None]
+    return (d >= bounds[0]) & (d <= bounds[1]), (d >= bounds[2]) & (d <= bounds[3])
+
+
+def bootstrap_claims(
+    table: ClaimTable,
+    claims: Sequence[Claim],
+    date_column: str = "date",
+    n_resamples: int = 2000,
+    level: float = 0.95,
+    seed: int = 42,
+) -> ClaimTests:
+    """Bootstrap every claim at once.
+
+    `table` holds additive sums (or raw rows) with the date column, the
+    claims' segment columns and the metric numerators / denominators, or is
+    an `AggregateCube`, whose cuboids are used directly. Days
+    are the resampling unit: each resample draws one Poisson(1) weight per
+    day (a Poisson bootstrap) and that same draw is applied to every claim,
+    so all metrics of all claims for all resamples come out of four matrix
+    products of shape (resamples x days) @ (days x claims).
+    """
+    n = len(claims)
+    if n == 0 or not len(table):
+        empty = np.full(n, np.nan)
+        zeros = np.zeros(n, dtype=np.int64)
+        return ClaimTests(empty, empty, empty, empty, empty, empty, zeros, zeros, n_resamples)
+
+    if isinstance(table, AggregateCube):
+        dates = table.cuboids[()].index.get_level_values(date_column)
+    else:
+        if isinstance(table.index, pd.MultiIndex) or table.index.name is not None:
+            table = table.reset_index()
+        dates = table[date_column]
+    days = pd.DatetimeIndex(np.sort(pd.to_datetime(dates).unique()))
+    numerator, denominator = _daily_sums(table, claims, days, date_column)
+    in_before, in_after = _window_masks(claims, days) if len(days) >= 2 else (
+        np.zeros((len(days), n), dtype=bool),
+        np.zeros((len(days), n), dtype=bool),
+    )
+    parts = [numerator * in_before, denominator * in_before, numerator * in_after, denominator * in_after]
+
+    def metric(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(den > 0, num / np.where(den > 0, den, 1.0), np.nan)
+
+    before = metric(parts[0].sum(axis=0), parts[1].sum(axis=0))
+    after = metric(parts[2].sum(axis=0), parts[3].sum(axis=0))
+
+    rng = np.random.default_rng(seed)
+    weights = rng.poisson(1.0, size=(n_resamples, len(days))).astype("float64")
+    num_b, den_b, num_a, den_a = (weights @ p for p in parts)
+    deltas = metric(num_a, den_a) - metric(num_b, den_b)  # (resamples, claims)
+
+    valid = ~np.isnan(deltas)
+    direction = np.array([1.0 if c.direction == "increase" else -1.0 for c in claims])
+    signed = np.where(valid, deltas * direction, 0.0)
+    agree = (signed > 0) + 0.5 * ((signed == 0) & valid)
+    counted = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        support = np.where(counted > 0, agree.sum(axis=0) / counted, np.nan)
+    support = np.where(np.isnan(before) | np.isnan(after), np.nan, support)
+
+    tail = (1.0 - level) / 2 * 100
+    ci = np.full((2, n), np.nan)
+    has_data = counted > 0
+    if has_data.any():
+        ci[:, has_data] = np.nanpercentile(deltas[:, has_data], [tail, 100 - tail], axis=0)
+
+    return ClaimTests(
+        before=before,
+        after=after,
+        delta=after - before,
+        ci_low=ci[0],
+        ci_high=ci[1],
+        support=support,
+        days_before=in_before.sum(axis=0),
+        days_after=in_after.sum(axis=0),
+        n_resamples=n_resamples,
+    )
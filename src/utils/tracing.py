@@ -0,0 +1,234 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from src.utils.logging_utils import log_event
+
+MEMORY_MODES = ("rss", "tracemalloc", "off")
+
+
+@dataclass
+class Span:
+    """One timed section of a run.
+
+    `cpu_ms` is process CPU time, so it includes other threads working in
+    parallel. `mem_bytes` is the RSS growth over the span (`rss` mode) or
+    the peak traced allocation above the span's starting point
+    (`tracemalloc` mode); both are process-wide.
+    """
+
+    name: str
+    span_id: int = 0
+    parent_id: Optional[int] = None
+    run_id: Optional[str] = None
+    query_id: Optional[str] = None
+    agent: str = "Orchestrator"
+    rows: Optional[int] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    start_us: float = 0.0
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    mem_bytes: Optional[int] = None
+    thread_id: int = 0
+    # tracemalloc bookkeeping
+    _mem_start: int = 0
+    _mem_peak: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "run_id": self.run_id,
+            "query_id": self.query_id,
+            "wall_ms": self.wall_ms,
+            "cpu_ms": self.cpu_ms,
+            "mem_bytes": self.mem_bytes,
+            "rows": self.rows,
+            **self.attrs,
+        }
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Tracer:
+    """Collects nested spans for one run.
+
+    Spans nest through a context variable, so parents follow plan steps into
+    worker threads (when submitted with `contextvars.copy_context`) and into
+    asyncio tasks. Each finished span is logged as a `span` event and kept
+    for `export_chrome_trace`: all of them by default, the latest
+    `max_spans` when set (0 keeps none), so a long-lived process does not
+    accumulate spans without bound.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        run_id: Optional[str] = None,
+        memory: str = "rss",
+        max_spans: Optional[int] = None,
+    ) -> None:
+        if memory not in MEMORY_MODES:
+            raise ValueError(f"Unknown memory mode {memory!r}; expected one of {MEMORY_MODES}")
+        self.logger = logger
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.memory = memory
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._open: List[Span] = []
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+        if memory == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def close(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _fold_peak(self) -> int:
+        """Credit the traced peak since the last reset to every open span."""
+        current, peak = tracemalloc.get_traced_memory()
+        for sp in self._open:
+            sp._mem_peak = max(sp._mem_peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _begin(self, sp: Span) -> None:
+        if self.memory == "rss":
+            sp._mem_start = _rss_bytes() or 0
+        elif self.memory == "tracemalloc":
+            with self._lock:
+                sp._mem_start = sp._mem_peak = self._fold_peak()
+                self._open.append(sp)
+
+    def _end(self, sp: Span) -> None:
+        if self.memory == "rss":
+            end = _rss_bytes()
+            sp.mem_bytes = None if end is None else end - sp._mem_start
+        elif self.memory == "tracemalloc":
+            with self._lock:
+                self._fold_peak()
+                self._open.remove(sp)
+            sp.mem_bytes = sp._mem_peak - sp._mem_start
+        with self._lock:
+            self.spans.append(sp)
+        log_event(
+            self.logger,
+            agent=sp.agent,
+            stage="trace",
+            event="span",
+            runtime_ms=sp.wall_ms,
+            extra=sp.to_dict(),
+        )
+
+    def export_chrome_trace(self, path: str | Path) -> Path:
+        """Write finished spans in the Chrome trace event format
+        (chrome://tracing, Perfetto)."""
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": sp.name,
+                "cat": sp.agent,
+                "ph": "X",
+                "ts": sp.start_us,
+                "dur": sp.wall_ms * 1000.0,
+                "pid": os.getpid(),
+                "tid": sp.thread_id,
+                "args": {k: v for k, v in sp.to_dict().items() if k != "span" and v is not None},
+            }
+            for sp in spans
+        ]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": self.run_id}}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+        return path
+
+
+_tracer: contextvars.ContextVar[Optional[Tracer]] = contextvars.ContextVar("tracer", default=None)
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+@contextmanager
+def using(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Report spans opened inside the block to `tracer` (None disables)."""
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(
+    name: str,
+    *,
+    agent: Optional[str] = None,
+    query_id: Optional[str] = None,
+    rows: Optional[int] = None,
+    **attrs: Any,
+) -> Iterator[Span]:
+    """Time a section under the current span.
+
+    A no-op (apart from the yielded `Span`) when no tracer is active, so
+    library code can be instrumented unconditionally. Set `rows` (or extra
+    `attrs`) on the yielded span to record them.
+    """
+    tracer = _tracer.get()
+    parent = _current.get()
+    sp = Span(
+        name=name,
+        agent=agent or (parent.agent if parent is not None else "Orchestrator"),
+        query_id=query_id or (parent.query_id if parent is not None else None),
+        rows=rows,
+        attrs=attrs,
+    )
+    if tracer is None:
+        yield sp
+        return
+
+    sp.span_id = next(tracer._ids)
+    sp.parent_id = parent.span_id if parent is not None else None
+    sp.run_id = tracer.run_id
+    sp.thread_id = threading.get_ident()
+    token = _current.set(sp)
+    tracer._begin(sp)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    sp.start_us = (start_wall - tracer._origin) * 1_000_000.0
+    try:
+        yield sp
+    finally:
+        sp.wall_ms = (time.perf_counter() - start_wall) * 1000.0
+        sp.cpu_ms = (time.process_time() - start_cpu) * 1000.0
+        _current.reset(token)
+        tracer._end(sp)
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+COMPRESSIONS = (None, "gzip")
+
+
+def compressed_path(path: str | Path, compression: Optional[str]) -> Path:
+    """`path` with the suffix of `compression` appended (`.gz` for gzip)."""
+    path = Path(path)
+    if compression is None:
+        return path
+    if compression == "gzip":
+        return path.with_name(path.name + ".gz")
+    raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+
+
+@contextmanager
+def atomic_path(path: str | Path) -> Iterator[Path]:
+    """A temporary path next to `path`, renamed over it when the block exits
+    cleanly and removed otherwise; for writers that take a file name.
+
+    The name carries the process and thread id, so concurrent writers of
+    the same `path` never share a temporary file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def atomic_open(path: str | Path, compression: Optional[str] = None) -> Iterator[TextIO]:
+    """Open a text stream whose content replaces `path` only on success.
+
+    Writes go to a temporary file next to `path`, which is renamed over it
+    when the block exits cleanly and removed otherwise, so readers never see
+    a half-written artifact. With `compression="gzip"` the stream is
+    gzip-compressed; pass the final name (see `compressed_path`).
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+    with atomic_path(path) as tmp:
+        f: TextIO
+        if compression == "gzip":
+            f = gzip.open(tmp, "wt", encoding="utf-8")  # type: ignore[assignment]
+        else:
+            f = tmp.open("w", encoding="utf-8")
+        with f:
+            yield f
+
+
+def write_json_array(f: TextIO, items: Iterable[Any], indent: int = 2) -> int:
+    """Write `items` as a JSON array one element at a time.
+
+    The output is byte-identical to `json.dump(list(items), f, indent=indent)`
+    but the list is never built. Returns the number of items written.
+    """
+    pad = " " * indent
+    count = 0
+    for item in items:
+        f.write("[\n" if count == 0 else ",\n")
+        # json.dumps escapes newlines inside strings, so every "\n" here is
+        # structural and can take the extra nesting level
+        f.write(pad + json.dumps(item, indent=indent).replace("\n", "\n" + pad))
+        count += 1
+    f.write("[]" if count == 0 else "\n]")
+    return count
+
+
+def write_jsonl(f: TextIO, items: Iterable[Any]) -> int:
+    """One compact JSON document per line; returns the number written."""
+    count = 0
+    for item in items:
+        f.write(json.dumps(item))
+        f.write("\n")
+        count += 1
+    return count
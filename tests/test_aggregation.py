@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from src.utils.aggregation import AggregationEngine, merge_aggregates
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "date": ["2024-01-01", "2024-01-01", "2024-01-02", "2024-01-02"],
+            "campaign_name": pd.Categorical(["A", "B", "A", "B"]),
+            "spend": [100.0, 10.0, 50.0, 50.0],
+            "revenue": [100.0, 50.0, 200.0, 50.0],
+            "impressions": [1000, 100, 1000, 1000],
+            "clicks": [10, 5, 20, 10],
+            "purchases": [1, 1, 2, 1],
+        }
+    )
+
+
+def test_aggregation_ratios_are_ratio_of_sums():
+    engine = AggregationEngine()
+    tables = engine.partial(_frame())
+
+    # spend-weighted: (100 + 50) / (100 + 10), not mean(1.0, 5.0)
+    assert engine.ratio(tables["date"], "roas").to_dict() == pytest.approx(
+        {"2024-01-01": 150 / 110, "2024-01-02": 250 / 100}
+    )
+    assert engine.ratio(tables["campaign_name"], "ctr").to_dict() == pytest.approx(
+        {"A": 30 / 2000, "B": 15 / 1100}
+    )
+    assert tables["date"]["rows"].tolist() == [2, 2]
+
+
+def test_aggregation_partials_merge_to_full_result():
+    df = _frame()
+    engine = AggregationEngine()
+
+    full = engine.partial(df)
+    merged = merge_aggregates(
+        engine.partial(df.iloc[:1]), engine.partial(df.iloc[1:3]), engine.partial(df.iloc[3:])
+    )
+
+    for key in ("date", "campaign_name"):
+        pd.testing.assert_frame_equal(merged[key].sort_index(), full[key].sort_index())
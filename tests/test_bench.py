@@ -0,0 +1,42 @@
+import pandas as pd
+
+from src.bench.generator import DatasetSpec, SyntheticAdsGenerator, generate_csv
+from src.bench.suite import compare, run_suite
+from src.utils.schema import read_csv_options, validate_schema
+
+
+def test_generator_is_deterministic_schema_valid_and_skewed(tmp_path):
+    spec = DatasetSpec(rows=5_000, campaigns=20, adsets_per_campaign=4, days=30, seed=7)
+    path = generate_csv(tmp_path / "ads.csv", spec, chunk_size=1_500)
+    again = generate_csv(tmp_path / "again.csv", spec, chunk_size=1_500)
+    assert path.read_bytes() == again.read_bytes()
+
+    header = pd.read_csv(path, nrows=0)
+    df = pd.read_csv(path, **read_csv_options(header.columns))
+    assert len(df) == 5_000
+    assert validate_schema(df).ok
+    assert df["campaign_name"].nunique() <= 20 and df["date"].nunique() <= 30
+    # Zipf skew: the top campaign carries far more than a uniform 1/20 share
+    assert df["campaign_name"].value_counts(normalize=True).iloc[0] > 0.2
+
+    other_seed = SyntheticAdsGenerator(DatasetSpec(rows=100, seed=8)).frame()
+    assert not other_seed.equals(SyntheticAdsGenerator(DatasetSpec(rows=100, seed=7)).frame())
+
+
+def test_suite_records_cases_and_flags_regressions(tmp_path):
+    current = run_suite(rows=[500], repeat=1, workdir=tmp_path)
+    names = [r["name"] for r in current["results"]]
+    assert names == [
+        "data_agent.load_and_validate",
+        "aggregate_state.save_load",
+        "insight_agent.generate",
+        "evaluator_agent.evaluate",
+        "creative_agent.generate_frame",
+        "run_pipeline",
+    ]
+    assert all(r["rows_per_s"] > 0 and r["peak_mb"] >= 0 for r in current["results"])
+
+    faster = {**current, "results": [{**r, "seconds": r["seconds"] / 2} for r in current["results"]]}
+    slow_cases = [c["name"] for c in compare(current, faster, min_seconds=0.0) if c["regressed"]]
+    assert slow_cases == names
+    assert not any(c["regressed"] for c in compare(current, current))
@@ -0,0 +1,80 @@
+import logging
+import time
+
+import pytest
+
+from src.agents.insight_agent import InsightAgent
+from src.llm.client import LLMClient
+from src.llm.prompts import PromptLibrary
+from src.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from src.utils.retry import RetryPolicy
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _fail() -> None:
+    raise ConnectionError("backend down")
+
+
+def test_breaker_opens_on_rolling_window_and_recovers_through_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, window_seconds=10, reset_timeout=5, clock=clock)
+
+    # failures spread wider than the window never open the circuit
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+        clock.now += 11
+    assert breaker.state == CLOSED
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+    clock.now += 5
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # everyone else still fails fast
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+class DownBackend:
+    calls = 0
+
+    def complete(self, payload):
+        DownBackend.calls += 1
+        raise ConnectionError("backend down")
+
+
+def test_open_circuit_falls_back_without_calling_or_sleeping():
+    logger = logging.getLogger("test-circuit")
+    breaker = CircuitBreaker("InsightAgent", logger, failure_threshold=3, reset_timeout=60)
+    agent = InsightAgent(
+        logger,
+        llm_client=LLMClient(DownBackend(), prompts=PromptLibrary("prompts")),
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+        breaker=breaker,
+    )
+    summary = {"roas_by_date": {"2024-01-01": 3.0, "2024-01-02": 2.0}}
+
+    first = agent.generate("why", summary)
+    assert DownBackend.calls == 3 and breaker.state == OPEN
+    assert first[0].id == "h1"
+
+    start = time.perf_counter()
+    second = agent.generate("why", summary)
+    assert time.perf_counter() - start < 0.01
+    assert DownBackend.calls == 3
+    assert [h.statement for h in second] == [h.statement for h in first]
@@ -2,6 +2,7 @@ import logging
 import pandas as pd
 
 from src.agents.creative_agent import CreativeAgent
+from src.utils.memo import JsonMemo
 
 
 def test_creative_agent_generates_for_low_ctr_low_roas():
@@ -21,3 +22,82 @@ def test_creative_agent_generates_for_low_ctr_low_roas():
     recs = agent.generate(df)
     assert len(recs) == 1
     assert "Limited time offer" in recs[0].new_headline
+
+
+def test_creative_agent_frame_matches_per_row_output():
+    logger = logging.getLogger("test_creative")
+    df = pd.DataFrame(
+        {
+            "campaign_name": pd.Categorical(["A", "B", "C", "D"]),
+            "adset_name": ["a1", "b1", None, "d1"],
+            "creative_message": ["  Buy now ", "", None, "Great deal"],
+            "audience_type": pd.Categorical(["broad", None, "retargeting", "broad"]),
+            "ctr": [0.001, 0.002, 0.05, 0.003],
+            "roas": [0.5, 3.0, 0.2, 5.0],
+        }
+    )
+    agent = CreativeAgent(logger, low_ctr_threshold=0.01, low_roas_threshold=1.0)
+
+    frame = agent.generate_frame(df)
+    expected = [agent._generate_for_row(row) for _, row in df.iterrows()]
+
+    assert agent.from_frame(frame) == expected
+    assert agent.frame_to_dict(frame) == agent.to_dict(expected)
+
+    # columns missing from the input fall back to the same defaults
+    minimal = df[["ctr", "roas"]]
+    assert agent.generate(minimal) == [agent._generate_for_row(row) for _, row in minimal.iterrows()]
+
+
+def test_creative_agent_dedupes_by_creative_and_memoizes(tmp_path):
+    logger = logging.getLogger("test_creative")
+    df = pd.DataFrame(
+        {
+            "campaign_name": ["A", "A", "A", "B"],
+            "adset_name": ["a1", "a1", "a1", "b1"],
+            "creative_message": ["Buy now", "Buy now", "Buy now", "Hello"],
+            "audience_type": ["broad", "broad", "broad", "broad"],
+            "date": pd.to_datetime(["2024-01-03", "2024-01-01", "2024-01-02", "2024-01-01"]),
+            "ctr": [0.001, 0.002, 0.05, 0.003],
+            "roas": [0.5, 3.0, 0.2, 5.0],
+        }
+    )
+    memo = tmp_path / "memo.json"
+    agent = CreativeAgent(
+        logger, low_ctr_threshold=0.01, low_roas_threshold=1.0, dedupe=True, memo_path=str(memo)
+    )
+
+    recs = agent.generate(df)
+    assert [(r.campaign_name, r.row_count, r.first_date, r.last_date) for r in recs] == [
+        ("A", 3, "2024-01-01", "2024-01-03"),
+        ("B", 1, "2024-01-01", "2024-01-01"),
+    ]
+    assert recs[0].new_headline == "A: Limited time offer"
+    assert memo.exists()
+
+    # a fresh agent reads the persisted memo and returns the same output
+    again = CreativeAgent(
+        logger, low_ctr_threshold=0.01, low_roas_threshold=1.0, dedupe=True, memo_path=str(memo)
+    )
+    assert len(again.memo) == 2
+    assert again.generate(df) == recs
+
+
+def test_memo_keeps_the_most_recently_used_entries(tmp_path):
+    memo = JsonMemo(tmp_path / "memo.json", max_entries=2)
+    memo.put("a", 1)
+    memo.put("b", 2)
+    assert memo.get("a") == 1  # "b" is now the least recently used
+    memo.put("c", 3)
+    memo.save()
+
+    reloaded = JsonMemo(tmp_path / "memo.json", max_entries=2)
+    assert (reloaded.get("a"), reloaded.get("b"), reloaded.get("c")) == (1, None, 3)
+    assert [p.name for p in tmp_path.iterdir()] == ["memo.json"]  # no temp file left behind
+
+    # a run that only reads still persists the order it used the entries in
+    reloaded.get("a")  # "c" is now the least recently used
+    reloaded.save()
+    again = JsonMemo(tmp_path / "memo.json", max_entries=2)
+    again.put("d", 4)
+    assert (again.get("a"), again.get("c"), again.get("d")) == (1, None, 4)
@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.agents.data_agent import DataAgent
+from src.utils.aggregation import key_name
+from src.utils.cube import CUBE_DIMENSIONS, CubeStore
+from src.utils.significance import Claim, bootstrap_claims
+
+
+def test_cube_answers_slices_like_a_groupby_on_rows(tmp_path):
+    agent = DataAgent(cube_store=CubeStore(tmp_path / "cube"))
+    summary = agent.load_and_validate("data/sample_fb_ads.csv")
+    df, cube = summary.full_df, summary.cube
+    assert cube is not None and cube.dimensions == [d for d in CUBE_DIMENSIONS if d in df.columns]
+
+    # rollup: the platform cuboid answers, not the base
+    assert cube.cuboid_for(["platform"])[0] == ("platform",)
+    by_platform = cube.query(by=["platform"])
+    expected = df.groupby("platform", observed=True)[["spend", "revenue"]].sum()
+    assert by_platform["spend"].to_dict() == pytest.approx(expected["spend"].to_dict())
+    assert by_platform["roas"].to_dict() == pytest.approx((expected["revenue"] / expected["spend"]).to_dict())
+
+    # slice + dice: one country, a date window, by creative type
+    rows = df[(df["country"].astype(str) == "US") & (df["date"] >= "2024-03-10") & (df["date"] <= "2024-03-20")]
+    sliced = cube.query(by=["creative_type"], where={"country": "US"}, start="2024-03-10", end="2024-03-20")
+    assert sliced["revenue"].to_dict() == pytest.approx(
+        rows.groupby("creative_type", observed=True)["revenue"].sum().to_dict()
+    )
+    # no `by`: one total row
+    assert cube.query()["spend"].iloc[0] == pytest.approx(df["spend"].sum())
+
+
+def test_cube_round_trips_and_refreshes_incrementally(tmp_path):
+    lines = Path("data/sample_fb_ads.csv").read_text(encoding="utf-8").splitlines()
+    header, rows = lines[0], lines[1:]
+    src = tmp_path / "export.csv"
+    store = CubeStore(tmp_path / "cube")
+    agent = DataAgent(incremental=True, state_path=str(tmp_path / "state.json"), cube_store=store)
+
+    src.write_text("\n".join([header] + [r for r in rows if "2024-03-" in r]) + "\n", encoding="utf-8")
+    agent.load_and_validate(str(src))
+    src.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+    refreshed = agent.load_and_validate(str(src)).cube
+
+    full = DataAgent(cube_store=CubeStore(tmp_path / "full")).load_and_validate("data/sample_fb_ads.csv").cube
+    loaded = store.load()
+    assert loaded is not None and sorted(loaded.cuboids) == sorted(full.cuboids)
+    for cube in (refreshed, loaded):
+        assert cube.last_date == full.last_date
+        pd.testing.assert_frame_equal(
+            cube.query(by=["date", "platform"]), full.query(by=["date", "platform"]), check_index_type=False
+        )
+
+    # the base is persisted once, by the cube store; the previous generation is kept for readers
+    assert key_name(store.base_key) not in json.loads((tmp_path / "state.json").read_text(encoding="utf-8"))["aggregates"]
+    assert len(list((tmp_path / "cube").glob("cuboid-000.*.arrow"))) == 2
+    assert "creative_message" not in loaded.dimensions
+
+    # a batch run over other rows replaces the cube: the state no longer matches it and is rebuilt
+    (tmp_path / "march.csv").write_text("\n".join([header] + [r for r in rows if "2024-03-" in r]) + "\n", encoding="utf-8")
+    DataAgent(cube_store=store).load_and_validate(str(tmp_path / "march.csv"))
+    rebuilt = agent.load_and_validate(str(src))
+    assert rebuilt.overview["rows"] == len(rows)
+    pd.testing.assert_frame_equal(
+        rebuilt.cube.query(by=["platform"]), full.query(by=["platform"]), check_index_type=False
+    )
+
+    # claims are tested on the cube without touching rows
+    claims = [Claim("roas", "decrease"), Claim("roas", "decrease", segment={"platform": "instagram"})]
+    on_cube = bootstrap_claims(loaded, claims, n_resamples=200)
+    on_rows = bootstrap_claims(DataAgent().load_and_validate("data/sample_fb_ads.csv").full_df, claims, n_resamples=200)
+    assert on_cube.delta == pytest.approx(on_rows.delta, nan_ok=True)
@@ -1,7 +1,13 @@
+import json
 from pathlib import Path
 
+import pandas as pd
+import pytest
+
 from src.agents.data_agent import DataAgent
-from src.utils.schema import EXPECTED_COLUMNS
+from src.utils.aggregation import key_name
+from src.utils.segments import SegmentScanner
+from src.utils.schema import COLUMN_DTYPES, EXPECTED_COLUMNS
 
 
 def test_data_agent_loads_and_summarizes(tmp_path):
@@ -17,3 +23,265 @@ def test_data_agent_loads_and_summarizes(tmp_path):
     assert summary.roas_by_date  # non-empty
     assert summary.ctr_by_date
     assert summary.schema_result.ok
+
+
+def test_data_agent_streaming_matches_full_load():
+    path = "data/sample_fb_ads.csv"
+    full = DataAgent(low_ctr_threshold=0.01, low_roas_threshold=1.0).load_and_validate(path)
+    streamed = DataAgent(
+        streaming=True, chunk_size=2, low_ctr_threshold=0.01, low_roas_threshold=1.0
+    ).load_and_validate(path)
+
+    assert streamed.schema_result.ok
+    assert streamed.full_df.empty
+    assert streamed.roas_by_date == pytest.approx(full.roas_by_date)
+    assert streamed.ctr_by_date == pytest.approx(full.ctr_by_date)
+    assert streamed.top_roas_campaigns == pytest.approx(full.top_roas_campaigns)
+    assert streamed.bottom_roas_campaigns == pytest.approx(full.bottom_roas_campaigns)
+    assert len(streamed.low_ctr_rows) == len(full.low_ctr_rows)
+    assert streamed.overview["rows"] == full.overview["rows"]
+
+
+def test_streaming_keeps_only_the_worst_low_rows_per_adset(tmp_path):
+    import yaml
+
+    from src.bench.generator import generate_csv, spec_from_config
+
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    path = str(tmp_path / "ads.csv")
+    generate_csv(path, spec_from_config(config, 3_000))
+    full = DataAgent(low_ctr_threshold=0.01, low_roas_threshold=1.0).load_and_validate(path)
+    keys = ["campaign_name", "adset_name"]
+    low = full.low_ctr_rows
+    expected = low.sort_values(["roas", "ctr"], kind="stable").groupby(keys, observed=True).head(2)
+    _write_partitions(full.full_df, tmp_path / "csv")
+
+    for source in (path, str(tmp_path / "csv")):
+        streamed = DataAgent(
+            streaming=True, chunk_size=100, low_ctr_threshold=0.01, low_roas_threshold=1.0, max_low_rows_per_adset=2
+        ).load_and_validate(source)
+        kept = streamed.low_ctr_rows
+        assert kept.groupby(keys, observed=True).size().max() <= 2
+        assert len(kept) == len(expected) < len(low)
+        assert sorted(kept["roas"]) == pytest.approx(sorted(expected["roas"]))
+        assert streamed.overview["rows"] == full.overview["rows"]
+
+
+def test_data_agent_cache_reuses_and_invalidates(tmp_path):
+    pytest.importorskip("pyarrow")
+    src = tmp_path / "sample.csv"
+    src.write_text(Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"), encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    first = DataAgent(cache_dir=str(cache_dir)).load_and_validate(str(src))
+    agent = DataAgent(cache_dir=str(cache_dir))
+    assert agent.cache.load(str(src)) is not None
+    second = agent.load_and_validate(str(src))
+    assert second.roas_by_date == first.roas_by_date
+
+    # appending a row changes size/mtime/hash, so the entry must be ignored
+    lines = src.read_text(encoding="utf-8").splitlines()
+    src.write_text("\n".join(lines + [lines[-1]]) + "\n", encoding="utf-8")
+    assert agent.cache.load(str(src)) is None
+    assert len(agent.load_and_validate(str(src)).full_df) == len(first.full_df) + 1
+
+    # concurrent stores of the same source each write their own temp files
+    from concurrent.futures import ThreadPoolExecutor
+
+    df = first.full_df
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: agent.cache.store(str(src), df), range(8)))
+    assert len(agent.cache.load(str(src))) == len(df)
+    assert sorted(p.suffix for p in cache_dir.iterdir()) == [".feather", ".json"]
+
+
+def test_data_agent_applies_typed_schema():
+    summary = DataAgent().load_and_validate("data/sample_fb_ads.csv")
+    df = summary.full_df
+
+    for col, spec in COLUMN_DTYPES.items():
+        assert str(df[col].dtype) == spec, col
+    assert summary.schema_result.dtype_mismatches == {}
+    assert all(isinstance(k, str) for k in summary.roas_by_date)
+
+
+def test_validate_schema_reports_dtype_mismatch(tmp_path):
+    lines = Path("data/sample_fb_ads.csv").read_text(encoding="utf-8").splitlines()
+    lines[1] = lines[1].replace(",100,10000,", ",lots,10000,", 1)
+    bad = tmp_path / "bad.csv"
+    bad.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    summary = DataAgent().load_and_validate(str(bad))
+
+    assert not summary.schema_result.ok
+    assert summary.schema_result.missing == []
+    assert "spend" in summary.schema_result.dtype_mismatches
+
+
+def test_data_agent_incremental_merges_new_days(tmp_path):
+    lines = Path("data/sample_fb_ads.csv").read_text(encoding="utf-8").splitlines()
+    header, rows = lines[0], lines[1:]
+    src = tmp_path / "export.csv"
+    state = tmp_path / "state.json"
+    agent = DataAgent(incremental=True, state_path=str(state), chunk_size=2, segment_scanner=SegmentScanner())
+
+    # first run: March only
+    march = [r for r in rows if "2024-03-" in r]
+    src.write_text("\n".join([header] + march) + "\n", encoding="utf-8")
+    first = agent.load_and_validate(str(src))
+    assert first.overview["new_rows"] == len(march)
+
+    # second run: full export, March rows must not be counted twice
+    src.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+    second = agent.load_and_validate(str(src))
+    full = DataAgent(segment_scanner=SegmentScanner()).load_and_validate("data/sample_fb_ads.csv")
+
+    assert second.overview["new_rows"] == len(rows) - len(march)
+    assert len(second.full_df) == len(rows) - len(march)
+    assert second.overview["rows"] == len(rows)
+    assert second.roas_by_date == pytest.approx(full.roas_by_date)
+    assert second.top_roas_campaigns == pytest.approx(full.top_roas_campaigns)
+    # segment sums survive the persisted state (composite-key table)
+    assert second.segment_scan.to_dict() == pytest.approx(full.segment_scan.to_dict())
+
+    # with pyarrow that table is a Feather sidecar; only the previous generation is kept
+    pytest.importorskip("pyarrow")
+    agent.load_and_validate(str(src))
+    tables = json.loads(state.read_text(encoding="utf-8"))["aggregates"]
+    assert [k for k, t in tables.items() if "file" in t] == [key_name(SegmentScanner().base_key)]
+    assert len(list(tmp_path.glob("state.*.arrow"))) == 2
+
+
+def test_incremental_csv_parses_only_the_appended_bytes(tmp_path):
+    import logging
+
+    from src.utils import tracing
+    from src.utils.tracing import Tracer
+
+    lines = Path("data/sample_fb_ads.csv").read_text(encoding="utf-8").splitlines()
+    header, rows = lines[0], lines[1:]
+    march = [r for r in rows if "2024-03-" in r]
+    april = [r for r in rows if "2024-04-" in r]
+    src = tmp_path / "export.csv"
+    agent = DataAgent(incremental=True, state_path=str(tmp_path / "state.json"), chunk_size=2)
+    tracer = Tracer(logging.getLogger("test-data-agent"), memory="off")
+
+    def run():
+        with tracing.using(tracer):
+            summary = agent.load_and_validate(str(src))
+        scan = [sp for sp in tracer.spans if sp.name == "data.scan_chunks"][-1]
+        return summary, scan
+
+    src.write_text("\n".join([header] + march) + "\n", encoding="utf-8")
+    run()
+    with src.open("a", encoding="utf-8") as f:
+        f.write("\n".join(april) + "\n")
+    appended, scan = run()
+    full = DataAgent().load_and_validate("data/sample_fb_ads.csv")
+    assert scan.attrs["offset"] > 0 and scan.attrs["parsed_rows"] == len(april)
+    assert appended.overview["rows"] == len(rows) and len(appended.full_df) == len(april)
+    assert appended.roas_by_date == pytest.approx(full.roas_by_date)
+
+    # nothing new: nothing parsed
+    unchanged, scan = run()
+    assert scan.attrs["parsed_rows"] == 0 and unchanged.overview["rows"] == len(rows)
+
+    # a rewritten file is parsed in full; dates already ingested are still skipped
+    src.write_text("\n".join([header] + rows[::-1]) + "\n", encoding="utf-8")
+    rewritten, scan = run()
+    assert scan.attrs["offset"] == 0 and scan.attrs["parsed_rows"] == len(rows)
+    assert rewritten.overview["rows"] == len(rows)
+
+
+def _write_partitions(df, root, fmt="csv"):
+    for day, rows in df.groupby(df["date"].dt.strftime("%Y-%m-%d")):
+        folder = root / f"date={day}"
+        folder.mkdir(parents=True)
+        if fmt == "csv":
+            rows.to_csv(folder / "acct_1.csv", index=False)
+        else:
+            rows.reset_index(drop=True).to_parquet(folder / "acct_1.parquet")
+
+
+def test_data_agent_reads_partitions_in_date_range(tmp_path):
+    from src.utils.partitions import DateRange
+
+    single = DataAgent().load_and_validate("data/sample_fb_ads.csv")
+    df = single.full_df
+    _write_partitions(df, tmp_path / "csv")
+    (tmp_path / "csv" / "notes.txt").write_text("not data", encoding="utf-8")
+
+    for mode in ({}, {"streaming": True}):
+        whole = DataAgent(**mode).load_and_validate(str(tmp_path / "csv"))
+        assert whole.schema_result.ok
+        assert whole.partitions == {"total": 5, "read": 5, "skipped_bad": 0}
+        assert whole.roas_by_date == pytest.approx(single.roas_by_date)
+        assert whole.overview["rows"] == len(df)
+
+    # the last 2 partitions: the others are never opened
+    days = sorted(df["date"].dt.strftime("%Y-%m-%d").unique())
+    recent = DataAgent(date_range=DateRange(start=pd.Timestamp(days[-2]))).load_and_validate(
+        str(tmp_path / "csv" / "*" / "*.csv")
+    )
+    assert recent.partitions["read"] == 2
+    assert len(recent.file_schemas) == 2
+    assert sorted(recent.roas_by_date) == days[-2:]
+    latest = pd.Timestamp(days[-1])
+    assert DateRange(last_days=7).resolve(latest) == (latest - pd.Timedelta(days=6), None)
+
+    pytest.importorskip("pyarrow")
+    _write_partitions(df, tmp_path / "parquet", fmt="parquet")
+    columnar = DataAgent().load_and_validate(str(tmp_path / "parquet"))
+    assert columnar.roas_by_date == pytest.approx(single.roas_by_date)
+
+
+def test_incremental_partitions_ingest_everything_and_window_the_summary(tmp_path):
+    from src.utils.partitions import DateRange
+
+    df = DataAgent().load_and_validate("data/sample_fb_ads.csv").full_df
+    days = sorted(df["date"].unique())[:5]
+    # 7 rows over 5 daily partitions: two on each of the first two days
+    df = pd.concat([df[df["date"] == day].head(2 if n < 2 else 1) for n, day in enumerate(days)])
+    _write_partitions(df, tmp_path / "parts")
+    source = str(tmp_path / "parts")
+    recent = DateRange(start=pd.Timestamp(days[3]))  # the last two partitions
+
+    def run(state, date_range=None):
+        agent = DataAgent(
+            incremental=True, state_path=str(tmp_path / state), date_range=date_range, segment_scanner=SegmentScanner()
+        )
+        return agent.load_and_validate(source)
+
+    # a windowed run on a fresh state still ingests every partition
+    assert run("a.json", recent).overview["rows"] == 2
+    full = run("a.json")
+    assert full.overview["rows"] == 7
+    assert full.overview["date_min"] == days[0].strftime("%Y-%m-%d")
+
+    # a windowed run on a full state summarises the window only
+    run("b.json")
+    windowed = run("b.json", recent)
+    batch = DataAgent(date_range=recent, segment_scanner=SegmentScanner()).load_and_validate(source)
+    assert windowed.overview["rows"] == batch.overview["rows"] == 2
+    assert windowed.roas_by_date == pytest.approx(batch.roas_by_date)
+    assert windowed.top_roas_campaigns == pytest.approx(batch.top_roas_campaigns)
+    assert windowed.segment_scan.to_dict() == pytest.approx(batch.segment_scan.to_dict())
+    # and leaves the state's last date alone
+    assert run("b.json").overview["rows"] == 7
+
+
+def test_data_agent_reports_schema_per_partition(tmp_path):
+    df = DataAgent().load_and_validate("data/sample_fb_ads.csv").full_df
+    _write_partitions(df, tmp_path)
+    bad = next(tmp_path.glob("*/acct_1.csv"))
+    pd.read_csv(bad).drop(columns=["spend"]).to_csv(bad, index=False)
+
+    failed = DataAgent().load_and_validate(str(tmp_path))
+    assert not failed.schema_result.ok
+    assert failed.schema_result.missing == ["spend"]
+    assert [p for p, r in failed.file_schemas.items() if not r.ok] == [str(bad)]
+
+    skipped = DataAgent(on_bad_file="skip").load_and_validate(str(tmp_path))
+    assert skipped.schema_result.ok
+    assert skipped.partitions["skipped_bad"] == 1
+    assert skipped.overview["rows"] < len(df)
@@ -1,8 +1,12 @@
 import logging
+
+import numpy as np
 import pandas as pd
+import pytest
 
 from src.agents.insight_agent import Hypothesis
 from src.agents.evaluator_agent import EvaluatorAgent
+from src.utils.significance import Claim, bootstrap_claims, claim_from_dict, claim_to_dict
 
 
 def test_evaluator_agent_evaluates_trend():
@@ -29,3 +33,91 @@ def test_evaluator_agent_evaluates_trend():
     evaluated = agent.evaluate(df, hypotheses)
     assert evaluated[0].validation_result == "supported"
     assert evaluated[0].confidence_score > 0.5
+
+
+def test_evaluator_agent_uses_precomputed_trend():
+    agent = EvaluatorAgent(logging.getLogger("test_eval"))
+    hypotheses = [
+        Hypothesis(
+            id="h1",
+            statement="ROAS improved over time, possibly due to better audience targeting or creatives.",
+            mechanism="",
+            expected_signals="",
+            confidence="medium",
+        )
+    ]
+
+    # an empty frame proves the evaluator does not rescan raw rows
+    evaluated = agent.evaluate(
+        pd.DataFrame(), hypotheses, roas_by_date={"2024-01-10": 4.0, "2024-01-01": 2.0}
+    )
+    assert evaluated[0].validation_result == "supported"
+
+
+def _daily_segments() -> pd.DataFrame:
+    """20 noisy days; instagram ROAS halves in the second half, facebook
+    stays flat."""
+    rng = np.random.default_rng(7)
+    rows = []
+    for day in pd.date_range("2024-01-01", periods=20):
+        for platform in ("facebook", "instagram"):
+            spend = 100.0
+            base = 3.0 if platform == "facebook" or day.day <= 10 else 1.5
+            rows.append(
+                {
+                    "date": day,
+                    "platform": platform,
+                    "spend": spend,
+                    "revenue": spend * base * rng.uniform(0.9, 1.1),
+                    "clicks": 50,
+                    "impressions": 5000,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def test_bootstrap_tests_all_claims_in_one_pass():
+    claims = [
+        Claim("roas", "decrease", {"platform": "instagram"}),
+        Claim("roas", "increase", {"platform": "instagram"}),
+        Claim("roas", "decrease", {"platform": "facebook"}),
+        Claim("roas", "decrease", {}),
+        Claim("roas", "decrease", {"platform": "tiktok"}),
+    ] * 100
+    tests = bootstrap_claims(_daily_segments(), claims, n_resamples=500)
+
+    assert tests.support.shape == (500,)
+    assert tests.support[0] == pytest.approx(1.0)
+    assert tests.support[1] == pytest.approx(0.0)
+    assert 0.05 < tests.support[2] < 0.95  # flat: noise only
+    assert tests.ci_low[0] < tests.delta[0] < tests.ci_high[0] < 0
+    assert tests.delta[0] == pytest.approx(-1.5, abs=0.25)
+    assert np.isnan(tests.support[4])  # segment without rows
+    assert list(tests.days_before[:2]) == [10, 10]
+
+
+def test_evaluator_scores_claims_from_segment_aggregates():
+    agent = EvaluatorAgent(logging.getLogger("test_eval"), n_resamples=500)
+    hypotheses = [
+        Hypothesis("s1", "Instagram ROAS fell.", "", "", "high", Claim("roas", "decrease", {"platform": "instagram"})),
+        Hypothesis("s2", "Facebook ROAS fell.", "", "", "low", Claim("roas", "decrease", {"platform": "facebook"})),
+        Hypothesis("s3", "Instagram ROAS rose.", "", "", "low", Claim("roas", "increase", {"platform": "instagram"})),
+        Hypothesis("g", "Results vary.", "", "", "low"),
+    ]
+    table = _daily_segments().groupby(["date", "platform"]).sum()
+
+    evaluated = agent.evaluate(pd.DataFrame(), hypotheses, segment_table=table)
+
+    assert [e.validation_result for e in evaluated] == ["supported", "inconclusive", "rejected", "inconclusive"]
+    assert evaluated[0].confidence_score == pytest.approx(1.0)
+    assert evaluated[2].confidence_score == pytest.approx(0.0)
+    assert evaluated[0].stats["before"] == pytest.approx(3.0, abs=0.1)
+    assert evaluated[0].stats["after"] == pytest.approx(1.5, abs=0.1)
+    assert evaluated[3].stats is None
+
+
+def test_claim_round_trips_and_rejects_unknown_metrics():
+    claim = Claim("ctr", "increase", {"country": "US"}, ("2024-01-01", "2024-01-07"), ("2024-01-08", "2024-01-14"))
+    assert claim_from_dict(claim_to_dict(claim)) == claim
+    with pytest.raises(ValueError):
+        claim_from_dict({"metric": "cpm", "direction": "increase"})
@@ -0,0 +1,80 @@
+import logging
+import threading
+
+import pandas as pd
+import pytest
+
+from src.agents.data_agent import DataSummary
+from src.agents.planner_agent import Plan, PlanStep
+from src.orchestrator.executor import ExecutionContext, PlanExecutionError, PlanExecutor
+from src.utils.schema import SchemaValidationResult
+
+
+def _ctx() -> ExecutionContext:
+    empty = pd.DataFrame()
+    summary = DataSummary(
+        roas_by_date={},
+        ctr_by_date={},
+        top_roas_campaigns={},
+        bottom_roas_campaigns={},
+        low_ctr_rows=empty,
+        full_df=empty,
+        schema_result=SchemaValidationResult(ok=True, missing=[], extra=[]),
+    )
+    return ExecutionContext(user_query="q", data_summary=summary)
+
+
+def test_executor_runs_independent_steps_concurrently():
+    # both branches wait on the barrier, so the run only finishes if they overlap
+    barrier = threading.Barrier(2, timeout=5)
+    order: list[str] = []
+
+    def branch(name: str):
+        def handler(ctx: ExecutionContext) -> None:
+            barrier.wait()
+            order.append(name)
+
+        return handler
+
+    plan = Plan(
+        overall_goal="test",
+        steps=[
+            PlanStep(id="root", agent="A", action="root", depends_on=[]),
+            PlanStep(id="left", agent="B", action="left", depends_on=["root"]),
+            PlanStep(id="right", agent="C", action="right", depends_on=["root"]),
+            PlanStep(id="join", agent="D", action="join", depends_on=["left", "right"]),
+        ],
+    )
+    executor = PlanExecutor(
+        {
+            "root": lambda ctx: order.append("root"),
+            "left": branch("left"),
+            "right": branch("right"),
+            "join": lambda ctx: order.append("join"),
+        },
+        logging.getLogger("test_executor"),
+    )
+    ctx = executor.run(plan, _ctx())
+
+    assert order[0] == "root" and order[-1] == "join"
+    assert set(ctx.step_timings) == {"root", "left", "right", "join"}
+
+
+def test_executor_rejects_cycles_and_surfaces_step_errors():
+    logger = logging.getLogger("test_executor")
+    cyclic = Plan(
+        overall_goal="test",
+        steps=[
+            PlanStep(id="a", agent="A", action="noop", depends_on=["b"]),
+            PlanStep(id="b", agent="B", action="noop", depends_on=["a"]),
+        ],
+    )
+    with pytest.raises(PlanExecutionError, match="cycle"):
+        PlanExecutor({"noop": lambda ctx: None}, logger).run(cyclic, _ctx())
+
+    def boom(ctx: ExecutionContext) -> None:
+        raise ValueError("boom")
+
+    failing = Plan(overall_goal="test", steps=[PlanStep(id="a", agent="A", action="boom", depends_on=[])])
+    with pytest.raises(PlanExecutionError, match="boom"):
+        PlanExecutor({"boom": boom}, logger).run(failing, _ctx())
@@ -1,6 +1,9 @@
+import asyncio
 from pathlib import Path
 
-from src.orchestrator.main import run_pipeline
+import yaml
+
+from src.orchestrator.main import arun_batch, run_batch, run_pipeline
 
 
 def test_full_pipeline_runs(tmp_path, monkeypatch):
@@ -27,3 +30,185 @@ def test_full_pipeline_runs(tmp_path, monkeypatch):
     assert (tmp_path / "reports" / "insights.json").exists()
     assert (tmp_path / "reports" / "creatives.json").exists()
     assert (tmp_path / "reports" / "report.md").exists()
+
+    # another output format replaces the earlier files instead of sitting beside them
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    config["output"].update(creatives_format="jsonl", compression="gzip")
+    Path("config/config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    run_pipeline("Analyze ROAS drop", config_path="config/config.yaml")
+    assert sorted(p.name for p in (tmp_path / "reports").iterdir()) == [
+        "creatives.jsonl.gz",
+        "insights.json.gz",
+        "report.md",
+    ]
+
+
+def test_batch_runs_each_query_against_one_load(tmp_path, monkeypatch):
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(
+        Path("config/config.yaml").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    (tmp_path / "data" / "sample_fb_ads.csv").write_text(
+        Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    (tmp_path / "queries.jsonl").write_text(
+        '{"query_id": "roas-drop", "user_query": "Analyze ROAS drop"}\n'
+        '\n'
+        '{"query": "Why did CTR fall?"}\n',
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    summary = run_batch("queries.jsonl", config_path="config/config.yaml")
+
+    assert summary["queries"] == 2
+    assert [r["query_id"] for r in summary["results"]] == ["roas-drop", "q0002"]
+    for query_id in ("roas-drop", "q0002"):
+        out = tmp_path / "reports" / "batch" / query_id
+        assert (out / "insights.json").exists()
+        assert (out / "creatives.json").exists()
+        assert (out / "report.md").exists()
+    assert (tmp_path / "reports" / "batch" / "batch_summary.json").exists()
+    # step timings are part of execute_plan_ms, not added on top of it
+    assert 0 < summary["queries_ms"] <= summary["total_ms"]
+
+
+def test_async_batch_matches_sequential_batch(tmp_path, monkeypatch):
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(
+        Path("config/config.yaml").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    (tmp_path / "data" / "sample_fb_ads.csv").write_text(
+        Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    (tmp_path / "queries.jsonl").write_text(
+        "".join(f'{{"query_id": "q{i}", "user_query": "Analyze ROAS drop {i}"}}\n' for i in range(4)),
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    run_batch("queries.jsonl", config_path="config/config.yaml", output_dir="seq")
+    summary = asyncio.run(
+        arun_batch("queries.jsonl", config_path="config/config.yaml", output_dir="async", max_concurrent_queries=3)
+    )
+
+    assert [r["query_id"] for r in summary["results"]] == ["q0", "q1", "q2", "q3"]
+    for i in range(4):
+        for name in ("insights.json", "creatives.json"):
+            assert (tmp_path / "async" / f"q{i}" / name).read_text() == (tmp_path / "seq" / f"q{i}" / name).read_text()
+
+
+def test_sharded_pipeline_matches_single_process(tmp_path, monkeypatch):
+    import pytest
+    import yaml
+
+    pytest.importorskip("pyarrow")
+    from src.bench.generator import generate_csv, spec_from_config
+
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    monkeypatch.chdir(tmp_path)
+    generate_csv(tmp_path / "ads.csv", spec_from_config(config, 3_000))
+    config["data"]["path"] = "ads.csv"
+
+    outputs = {}
+    for mode in ("plain", "sharded"):
+        config["sharding"] = {"enabled": mode == "sharded", "key": "country", "workers": 2, "shards": 3}
+        for key in ("insights_json", "creatives_json", "report_md"):
+            config["paths"][key] = f"{mode}/{Path(config['paths'][key]).name}"
+        (tmp_path / f"{mode}.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+        run_pipeline("Analyze ROAS drop", config_path=f"{mode}.yaml")
+        report = (tmp_path / mode / "report.md").read_text(encoding="utf-8")
+        outputs[mode] = (
+            (tmp_path / mode / "insights.json").read_text(encoding="utf-8"),
+            (tmp_path / mode / "creatives.json").read_text(encoding="utf-8"),
+            [line for line in report.splitlines() if "_ms" not in line],
+        )
+
+    assert outputs["sharded"] == outputs["plain"]
+
+
+def test_service_answers_queries_and_reloads_changed_data(tmp_path, monkeypatch):
+    import json
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.orchestrator.service import AnalystService
+
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(
+        Path("config/config.yaml").read_text(encoding="utf-8"),
+        encoding="utf-8",
+    )
+    lines = Path("data/sample_fb_ads.csv").read_text(encoding="utf-8").splitlines()
+    data = tmp_path / "data" / "sample_fb_ads.csv"
+    data.write_text("\n".join(lines[:-5]) + "\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    def post(url, body):
+        request = urllib.request.Request(url + "/query", data=json.dumps(body).encode("utf-8"), method="POST")
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    with AnalystService("config/config.yaml", port=0, reload_interval=0) as service:
+        with ThreadPoolExecutor(4) as pool:
+            answers = list(pool.map(lambda i: post(service.url, {"user_query": "Analyze ROAS drop", "query_id": f"q{i}"}), range(4)))
+        assert [a["query_id"] for a in answers] == ["q0", "q1", "q2", "q3"]
+        assert all(a["insights"] == answers[0]["insights"] for a in answers)
+
+        run_pipeline("Analyze ROAS drop", config_path="config/config.yaml")
+        assert answers[0]["insights"] == json.loads(Path("reports/insights.json").read_text(encoding="utf-8"))
+        assert answers[0]["creatives"] == json.loads(Path("reports/creatives.json").read_text(encoding="utf-8"))
+
+        assert not service.reload_if_changed()
+        data.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        assert service.reload_if_changed()
+        with urllib.request.urlopen(service.url + "/health") as response:
+            health = json.loads(response.read())
+        assert health["rows"] == len(lines) - 1 and health["reloads"] == 1
+
+
+def test_service_applies_the_window_a_query_names(tmp_path, monkeypatch):
+    import json
+
+    import pandas as pd
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.orchestrator import service as service_module
+    from src.orchestrator.service import AnalystService
+
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    config["data"]["path"] = "data/parts"
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    df = pd.read_csv("data/sample_fb_ads.csv")
+    for day, rows in df.groupby("date"):
+        folder = tmp_path / "data" / "parts" / f"date={day}"
+        folder.mkdir(parents=True)
+        rows.to_csv(folder / "acct_1.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+
+    with AnalystService("config/config.yaml", port=0, reload_interval=0) as service:
+        everything = service.answer("Analyze ROAS drop")
+        windowed = service.answer("Analyze ROAS drop over the last 7 days")
+        again = service.answer("Why did ROAS fall in the last 7 days?")
+
+        # concurrent queries over many windows keep the view cache within its bound
+        monkeypatch.setattr(service_module, "_MAX_WINDOWS", 3)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda n: service.answer(f"ROAS over the last {n} days"), range(1, 17)))
+        assert len(service._loaded.windows) == 3
+
+    # the same answer as a run that only reads the last 7 days
+    run_pipeline("Analyze ROAS drop over the last 7 days", config_path="config/config.yaml")
+    assert windowed["insights"] == json.loads(Path("reports/insights.json").read_text(encoding="utf-8"))
+    assert windowed["creatives"] == json.loads(Path("reports/creatives.json").read_text(encoding="utf-8"))
+    assert windowed["insights"] != everything["insights"]
+    assert len(again["creatives"]) == len(windowed["creatives"])
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.agents.insight_agent import InsightAgent
+from src.llm.cache import ResponseCache
+from src.llm.client import HTTPBackend, LLMClient
+from src.llm.prompts import PromptLibrary
+from src.llm.stub_server import StubLLMServer
+
+
+def test_llm_client_caches_and_coalesces_identical_requests(tmp_path):
+    with StubLLMServer(latency_ms=50) as server:
+        client = LLMClient(HTTPBackend(server.url), cache=ResponseCache(tmp_path / "llm"))
+
+        # concurrent identical requests share one backend call
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent = list(pool.map(lambda _: client.complete("same"), range(8)))
+        assert len(set(concurrent)) == 1
+        assert server.request_count == 1
+
+        results = client.complete_many(["same", "other", "other"])
+        assert results[0] == concurrent[0] and results[1] == results[2] != results[0]
+        assert server.request_count == 2
+
+        # a fresh client over the same cache directory answers from disk
+        fresh = LLMClient(HTTPBackend(server.url), cache=ResponseCache(tmp_path / "llm"))
+        assert fresh.complete("same") == results[0]
+        assert server.request_count == 2
+        assert fresh.stats()["cache_hits"] == 1
+
+
+def test_response_cache_expires_and_evicts_lru(tmp_path):
+    cache = ResponseCache(tmp_path, ttl_seconds=60, max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    old = time.time() - 10
+    os.utime(tmp_path / "a.json", (old, old))
+    os.utime(tmp_path / "b.json", (old - 5, old - 5))
+    assert cache.get("a") == "A"  # touches "a", so "b" is now least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+
+    expired = ResponseCache(tmp_path, ttl_seconds=0)
+    time.sleep(0.01)
+    assert expired.get("c") is None
+
+
+def test_insight_agent_uses_llm_client(tmp_path):
+    hypotheses = [
+        {
+            "id": "llm-1",
+            "statement": "ROAS decreased on Instagram.",
+            "mechanism": "Audience saturation.",
+            "expected_signals": "Falling CTR.",
+            "confidence": "medium",
+        }
+    ]
+    with StubLLMServer(responder=lambda payload: json.dumps(hypotheses)) as server:
+        client = LLMClient(HTTPBackend(server.url), prompts=PromptLibrary("prompts"))
+        agent = InsightAgent(logging.getLogger("test_llm"), llm_client=client)
+        result = agent.generate("Analyze ROAS drop", {"roas_by_date": {"2024-01-01": 2.0}})
+
+    assert [h.id for h in result] == ["llm-1"]
+    assert "Analyze ROAS drop" in client.render("insight", {"user_query": "Analyze ROAS drop"})
+
+
+def test_default_stub_answers_agent_prompts_in_their_format(caplog):
+    from src.agents.evaluator_agent import EvaluatorAgent
+
+    roas_by_date = {"2024-03-01": 5.0, "2024-03-15": 4.0, "2024-04-01": 2.0, "2024-04-15": 1.5}
+    with StubLLMServer() as server:
+        client = LLMClient(HTTPBackend(server.url), prompts=PromptLibrary("prompts"))
+        logger = logging.getLogger("test_llm")
+        hypotheses = InsightAgent(logger, llm_client=client).generate("Analyze ROAS drop", {"roas_by_date": roas_by_date})
+        verdicts = EvaluatorAgent(logger, llm_client=client).evaluate(pd.DataFrame(), hypotheses, roas_by_date)
+
+    # the model path, not the deterministic fallback
+    assert [h.id for h in hypotheses] == ["stub-1"] and hypotheses[0].claim.direction == "decrease"
+    assert [(v.id, v.validation_result) for v in verdicts] == [("stub-1", "inconclusive")]
+    assert not [r for r in caplog.records if "fallback" in getattr(r, "extra_fields", {}).get("event", "")]
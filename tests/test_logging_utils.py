@@ -0,0 +1,49 @@
+import json
+import logging
+import queue
+
+from src.utils import logging_utils
+from src.utils.logging_utils import BoundedQueueHandler, JsonLogFormatter, log_event, setup_logger
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def test_queue_handler_drops_when_full_and_formats_later():
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue, overflow="drop")
+    logger = _logger("test-queued", handler)
+
+    for i in range(5):
+        log_event(logger, agent="A", stage="s", event="e", extra={"i": i})
+
+    assert handler.dropped == 3
+    records = [log_queue.get_nowait() for _ in range(2)]
+    lines = [json.loads(JsonLogFormatter().format(r)) for r in records]
+    assert [line["i"] for line in lines] == [0, 1]
+    assert lines[0]["event"] == "e" and lines[0]["ts"].endswith("Z")
+
+
+def test_setup_logger_queued_rotation_flushes_on_shutdown(tmp_path, monkeypatch):
+    path = tmp_path / "app.log"
+    logger = logging.getLogger("kasparro")
+    # start from an unconfigured logger; restored by monkeypatch afterwards
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(logging_utils, "_listener", None)
+
+    setup_logger(str(path), queued=True, max_bytes=2000, backup_count=2)
+    for i in range(200):
+        log_event(logger, agent="A", stage="s", event="e", extra={"i": i})
+    logging_utils.shutdown_logging()
+    for handler in logger.handlers:
+        handler.close()
+
+    assert path.stat().st_size <= 2000
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["app.log", "app.log.1", "app.log.2"]
+    last = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    assert last["i"] == 199
@@ -7,3 +7,10 @@ def test_planner_builds_four_steps():
     assert len(plan.steps) == 4
     agents = [s.agent for s in plan.steps]
     assert agents == ["DataAgent", "InsightAgent", "EvaluatorAgent", "CreativeAgent"]
+
+
+def test_planner_reads_date_window_from_query():
+    planner = PlannerAgent()
+    assert planner.requested_days("Why did ROAS drop over the last 7 days?") == 7
+    assert planner.requested_days("ROAS in the past 2 weeks") == 14
+    assert planner.requested_days("Analyze ROAS drop") is None
@@ -0,0 +1,157 @@
+import os
+import shutil
+from pathlib import Path
+
+import yaml
+
+from src.orchestrator import main
+from src.orchestrator.main import run_pipeline
+from src.orchestrator.result_cache import ResultCache, normalize_query, result_key
+
+
+def test_result_cache_evicts_least_recently_used_past_the_size_bound(tmp_path):
+    files = {}
+    for role in ("insights", "report"):
+        files[role] = tmp_path / f"{role}.out"
+        files[role].write_text("x" * 400, encoding="utf-8")
+    cache = ResultCache(tmp_path / "cache", max_bytes=2800)
+
+    for n, key in enumerate(("a", "b", "c")):
+        assert cache.put(key, files)
+        os.utime(tmp_path / "cache" / key / "meta.json", (n, n))
+    assert cache.restore("a", lambda role, name: tmp_path / "out" / name) is not None  # "a" is now recent
+    assert cache.put("d", files)
+
+    # three entries of ~900 bytes fit in 2800, four do not: the least recently used goes
+    assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == ["a", "c", "d"]
+    assert cache.stats()["bytes"] <= 2800
+    assert (tmp_path / "out" / "insights.out").read_text(encoding="utf-8") == "x" * 400
+
+    big = tmp_path / "big.out"
+    big.write_bytes(b"x" * 3000)
+    assert not cache.put("big", {"report": big})  # larger than the whole cache
+
+
+def test_normalize_query():
+    assert normalize_query("  Analyze ROAS   drop? ") == normalize_query("analyze roas drop")
+    assert normalize_query("Analyze CTR") != normalize_query("Analyze ROAS")
+
+
+def test_result_key_covers_the_configured_prompts_dir(tmp_path):
+    for name, text in (("a", "Plan the analysis."), ("b", "Plan it differently.")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "planner.md").write_text(text, encoding="utf-8")
+
+    def key(prompts_dir):
+        return result_key("Analyze ROAS drop", "data", {"paths": {"prompts_dir": str(prompts_dir)}})
+
+    assert key(tmp_path / "a") == key(tmp_path / "a")
+    assert key(tmp_path / "a") != key(tmp_path / "b")
+
+
+def test_pipeline_serves_repeated_queries_from_the_cache(tmp_path, monkeypatch, caplog):
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    config["result_cache"]["enabled"] = True
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    data = tmp_path / "data" / "sample_fb_ads.csv"
+    data.write_text(Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    reports = [Path("reports") / name for name in ("insights.json", "creatives.json", "report.md")]
+
+    run_pipeline("Analyze ROAS drop", config_path="config/config.yaml")
+    first = [p.read_bytes() for p in reports]
+    for p in reports:
+        p.unlink()
+
+    # a hit restores the artifacts without loading any data
+    def no_load(*args, **kwargs):
+        raise AssertionError("data loaded on a cache hit")
+
+    with monkeypatch.context() as m:
+        m.setattr(main, "prepare_context", no_load)
+        run_pipeline("  analyze roas drop ", config_path="config/config.yaml")
+    assert [p.read_bytes() for p in reports] == first
+
+    # changed data and changed thresholds are misses
+    data.write_text(data.read_text(encoding="utf-8") + data.read_text(encoding="utf-8").splitlines()[1] + "\n", encoding="utf-8")
+    run_pipeline("Analyze ROAS drop", config_path="config/config.yaml")
+    config["thresholds"]["low_ctr"] = 0.02
+    Path("config/config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    run_pipeline("Analyze ROAS drop", config_path="config/config.yaml")
+
+    events = [r.extra_fields["event"] for r in caplog.records if hasattr(r, "extra_fields")]
+    assert [e for e in events if e.startswith("result_cache")] == [
+        "result_cache_miss",
+        "result_cache_stored",
+        "result_cache_hit",
+        "result_cache_miss",
+        "result_cache_stored",
+        "result_cache_miss",
+        "result_cache_stored",
+    ]
+    assert len(list(Path("cache/results").iterdir())) == 3
+
+
+def test_batch_queries_hit_the_cache_on_rerun(tmp_path, monkeypatch):
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    config["result_cache"]["enabled"] = True
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config" / "config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    (tmp_path / "data" / "sample_fb_ads.csv").write_text(
+        Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"), encoding="utf-8"
+    )
+    (tmp_path / "queries.jsonl").write_text(
+        '{"query_id": "a", "user_query": "Analyze ROAS drop"}\n{"query_id": "b", "user_query": "Why did CTR fall?"}\n',
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    main.run_batch("queries.jsonl", config_path="config/config.yaml")
+    first = {q: (Path("reports/batch") / q / "insights.json").read_bytes() for q in ("a", "b")}
+    summary = main.run_batch("queries.jsonl", config_path="config/config.yaml")
+
+    assert [list(r["metrics"]) for r in summary["results"]] == [["result_cache_ms"], ["result_cache_ms"]]
+    assert {q: (Path("reports/batch") / q / "insights.json").read_bytes() for q in ("a", "b")} == first
+
+
+def test_a_query_that_fell_back_does_not_stop_others_being_cached(tmp_path, monkeypatch, caplog):
+    from src.llm.stub_server import StubLLMServer, agent_responder
+    from src.utils.circuit_breaker import reset_breakers
+
+    def responder(payload):
+        # the model fails for the CTR question only
+        return "not json" if "CTR fall" in payload["prompt"] else agent_responder(payload)
+
+    config = yaml.safe_load(Path("config/config.yaml").read_text(encoding="utf-8"))
+    config["result_cache"]["enabled"] = True
+    config["retry"]["base_delay"] = 0.0
+    config["circuit_breaker"]["failure_threshold"] = 100  # the failures must not open the circuit
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "sample_fb_ads.csv").write_text(
+        Path("data/sample_fb_ads.csv").read_text(encoding="utf-8"), encoding="utf-8"
+    )
+    shutil.copytree("prompts", tmp_path / "prompts")
+    (tmp_path / "queries.jsonl").write_text(
+        '{"query_id": "ctr", "user_query": "Why did CTR fall?"}\n{"query_id": "roas", "user_query": "Analyze ROAS drop"}\n',
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+    reset_breakers()
+    try:
+        with StubLLMServer(responder=responder) as server:
+            config["llm"].update(enabled=True, endpoint=server.url)
+            Path("config/config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+            main.run_batch("queries.jsonl", config_path="config/config.yaml")
+            summary = main.run_batch("queries.jsonl", config_path="config/config.yaml")
+    finally:
+        reset_breakers()
+
+    skipped = [r.extra_fields for r in caplog.records if getattr(r, "extra_fields", {}).get("event") == "result_cache_skipped"]
+    # only the failing question, on each run
+    assert len(skipped) == 2 and all("InsightAgent" in e["fallbacks"] for e in skipped)
+    # the healthy query was cached on the first run despite the other one failing
+    assert [list(r["metrics"]) == ["result_cache_ms"] for r in summary["results"]] == [False, True]
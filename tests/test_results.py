@@ -0,0 +1,39 @@
+import io
+import json
+
+from src.agents.evaluator_agent import EvaluatedHypothesis
+from src.agents.insight_agent import Hypothesis
+from src.orchestrator.results import HypothesisStore
+from src.utils.writers import write_json_array
+
+
+def _hyp(i: int) -> Hypothesis:
+    return Hypothesis(id=f"h{i}", statement=f"s{i}", mechanism="m", expected_signals="e", confidence="low")
+
+
+def _eval(i: int, result: str = "supported") -> EvaluatedHypothesis:
+    return EvaluatedHypothesis(id=f"h{i}", statement=f"s{i}", validation_result=result, confidence_score=0.5, evidence="")
+
+
+def test_store_joins_evaluations_by_id_in_insertion_order():
+    store = HypothesisStore()
+    store.add_hypotheses(_hyp(i) for i in range(5000))
+    # verdicts arrive in another order, one is missing, one is repeated
+    store.record_evaluations([_eval(i) for i in reversed(range(1, 5000))] + [_eval(3, "rejected")])
+
+    items = list(store.insight_items())
+    assert [item["id"] for item in items] == [f"h{i}" for i in range(5000)]
+    assert items[0]["evaluated"] is None
+    assert items[3]["evaluated"]["validation_result"] == "supported"  # first verdict wins
+    assert items[4999]["evaluated"]["id"] == "h4999"
+
+    store.add_hypotheses([_hyp(7)])
+    assert len(store) == 5000 and store.duplicates == 1
+
+
+def test_write_json_array_matches_json_dump():
+    items = [{"a": 1, "b": [1, 2, {"c": "line\nbreak"}]}, {"d": None}, {}]
+    for case in (items, []):
+        streamed = io.StringIO()
+        assert write_json_array(streamed, iter(case)) == len(case)
+        assert streamed.getvalue() == json.dumps(case, indent=2)
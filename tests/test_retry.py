@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.retry import RetryError, async_retry, run_in_thread, set_global_concurrency
+
+
+def test_async_retry_times_out_each_attempt_and_retries():
+    calls = []
+
+    @async_retry(max_attempts=3, base_delay=0.01, timeout=0.05)
+    async def flaky():
+        calls.append(time.perf_counter())
+        if len(calls) < 3:
+            await asyncio.sleep(1)  # hangs past the timeout
+        return "ok"
+
+    assert asyncio.run(flaky()) == "ok"
+    assert len(calls) == 3
+
+    @async_retry(max_attempts=2, base_delay=0.01, timeout=0.01)
+    async def hangs():
+        await asyncio.sleep(1)
+
+    with pytest.raises(RetryError):
+        asyncio.run(hangs())
+
+
+def test_global_semaphore_caps_concurrent_attempts():
+    set_global_concurrency(2)
+    active = peak = 0
+
+    @async_retry(max_attempts=1)
+    async def call():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+
+    async def many():
+        await asyncio.gather(*(call() for _ in range(8)))
+
+    try:
+        asyncio.run(many())
+    finally:
+        set_global_concurrency(16)
+    assert peak == 2
+
+
+def test_timed_out_thread_keeps_its_concurrency_slot_until_it_returns():
+    set_global_concurrency(1)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def blocking_call():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.1)  # outlives the 0.02 s attempt timeout
+        with lock:
+            active -= 1
+
+    @async_retry(max_attempts=2, base_delay=0.0, jitter=0.0, timeout=0.02)
+    async def call():
+        return await run_in_thread(blocking_call)
+
+    async def many():
+        return await asyncio.gather(*(call() for _ in range(3)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(many())
+    finally:
+        set_global_concurrency(16)
+    assert all(isinstance(r, RetryError) for r in results)
+    # every attempt timed out, but the retries never ran beside a thread still in flight
+    assert peak == 1
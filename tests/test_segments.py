@@ -0,0 +1,105 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.agents.insight_agent import InsightAgent
+from src.utils.aggregation import AggregationEngine, key_name, merge_aggregates
+from src.utils.segments import SegmentScanner, merge_sums
+
+
+def _frame() -> pd.DataFrame:
+    """Four days; in the last two, instagram in GB loses half its revenue."""
+    rows = []
+    for day in pd.date_range("2024-01-01", periods=4):
+        for platform in ("facebook", "instagram"):
+            for country in ("US", "GB"):
+                drop = day.day > 2 and platform == "instagram" and country == "GB"
+                rows.append(
+                    {
+                        "date": day,
+                        "platform": platform,
+                        "country": country,
+                        "spend": 100.0,
+                        "revenue": 150.0 if drop else 300.0,
+                        "clicks": 10,
+                        "impressions": 1000,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def test_scan_finds_the_segment_behind_the_drop():
+    scanner = SegmentScanner(dimensions=["platform", "country"], top_k=3)
+    scan = scanner.scan(_frame())
+
+    assert scan.period_before == ("2024-01-01", "2024-01-02")
+    assert scan.roas_delta == pytest.approx(-150 / 400)
+    # within one dimension the contributions add up to the total change
+    platform = scan.segments[scan.segments["order"].eq(1) & scan.segments["platform"].notna()]
+    assert platform["contribution"].sum() == pytest.approx(scan.roas_delta)
+
+    top = scan.top[0]
+    assert top.segment == {"platform": "instagram", "country": "GB"}
+    assert top.roas_before == pytest.approx(3.0) and top.roas_after == pytest.approx(1.5)
+    assert top.share == pytest.approx(1.0)
+    # its parents (platform=instagram, country=GB) are nested in it and skipped
+    assert all(not set(c.segment.items()) < set(top.segment.items()) for c in scan.top[1:])
+
+
+def test_scan_of_streamed_aggregates_matches_row_level_scan():
+    df = _frame()
+    scanner = SegmentScanner(dimensions=["platform", "country"])
+    engine = AggregationEngine(keys=[scanner.base_key])
+    merged = merge_aggregates(*(engine.partial(df.iloc[i : i + 5]) for i in range(0, len(df), 5)))
+
+    streamed = scanner.scan(merged[key_name(scanner.base_key)])
+    direct = scanner.scan(df)
+    assert streamed.to_dict() == pytest.approx(direct.to_dict())
+    assert len(streamed.segments) == 2 + 2 + 4
+
+
+def test_segment_sums_of_shards_merge_to_the_whole_scan():
+    df = _frame()
+    scanner = SegmentScanner(dimensions=["platform", "country"])
+    periods = scanner.periods(df["date"].unique())
+    # shard by country: platform segments span both shards and are summed
+    shards = [scanner.sums(part, periods) for _, part in df.groupby("country")]
+
+    sharded = scanner.finish(merge_sums(shards))
+    direct = scanner.scan(df)
+    assert sharded.to_dict() == pytest.approx(direct.to_dict())
+    assert sharded.segments["contribution"].to_numpy() == pytest.approx(direct.segments["contribution"].to_numpy())
+
+
+def test_scan_scales_to_many_segments():
+    rng = np.random.default_rng(0)
+    n = 200_000
+    df = pd.DataFrame(
+        {
+            "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, n), unit="D"),
+            "campaign_name": rng.integers(0, 5_000, n).astype(str),
+            "country": rng.integers(0, 20, n).astype(str),
+            "spend": rng.uniform(1, 100, n),
+            "revenue": rng.uniform(1, 300, n),
+            "clicks": rng.integers(0, 50, n),
+            "impressions": rng.integers(100, 5_000, n),
+        }
+    )
+    scan = SegmentScanner(dimensions=["campaign_name", "country"], top_k=10).scan(df)
+    assert len(scan.segments) > 50_000
+    assert len(scan.top) == 10
+
+
+def test_insight_agent_turns_top_segments_into_hypotheses():
+    scan = SegmentScanner(dimensions=["platform", "country"], top_k=2).scan(_frame())
+    hypotheses = InsightAgent(logging.getLogger("test_segments")).generate(
+        "Why did ROAS drop?", {"roas_by_date": {}, "segment_changes": scan.to_dict()}
+    )
+
+    # the two parents of the dropping segment are nested in it: one hypothesis
+    assert [h.id for h in hypotheses] == ["s1"]
+    assert "platform=instagram, country=GB" in hypotheses[0].statement
+    assert "fell from 3.00 to 1.50" in hypotheses[0].statement
+    assert hypotheses[0].confidence == "high"
@@ -0,0 +1,70 @@
+import json
+import logging
+
+from src.agents.planner_agent import Plan, PlanStep
+from src.orchestrator.executor import ExecutionContext, PlanExecutor
+from src.orchestrator.main import build_tracer
+from src.utils import tracing
+from src.utils.tracing import Tracer, span
+
+
+def test_spans_nest_across_plan_threads_and_export_chrome_trace(tmp_path):
+    logger = logging.getLogger("test-tracing")
+    tracer = Tracer(logger, run_id="run-1", memory="tracemalloc")
+    plan = Plan(
+        overall_goal="q",
+        steps=[
+            PlanStep(id="a", agent="A", action="alloc", depends_on=[]),
+            PlanStep(id="b", agent="B", action="alloc", depends_on=["a"]),
+        ],
+    )
+
+    def alloc(ec: ExecutionContext) -> None:
+        with span("work", rows=3):
+            ec.step_timings.setdefault("blob", len(bytearray(2_000_000)))
+
+    try:
+        with tracing.using(tracer), span("query", query_id="q1"):
+            PlanExecutor({"alloc": alloc}, logger).run(plan, ExecutionContext(user_query="q", data_summary=None))
+    finally:
+        tracer.close()
+
+    by_name = {}
+    for sp in tracer.spans:
+        by_name.setdefault(sp.name, []).append(sp)
+    (query,) = by_name["query"]
+    assert query.parent_id is None and query.run_id == "run-1"
+    steps = by_name["step.a"] + by_name["step.b"]
+    assert {s.parent_id for s in steps} == {query.span_id}
+    assert {s.parent_id for s in by_name["work"]} == {s.span_id for s in steps}
+    assert all(s.query_id == "q1" and s.agent in ("A", "B") for s in by_name["work"])
+    assert by_name["work"][0].rows == 3
+    # the 2 MB temporary shows up in the step's peak, and in its parent's
+    assert by_name["work"][0].mem_bytes >= 1_900_000
+    assert query.mem_bytes >= 1_900_000
+
+    trace = json.loads(tracer.export_chrome_trace(tmp_path / "trace.json").read_text())
+    events = trace["traceEvents"]
+    assert len(events) == len(tracer.spans)
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+
+def test_span_is_a_no_op_without_a_tracer():
+    with span("idle") as sp:
+        sp.rows = 1
+    assert sp.span_id == 0 and sp.run_id is None
+
+
+def test_tracer_keeps_spans_only_for_the_chrome_trace():
+    logger = logging.getLogger("test-tracing")
+    tracer = Tracer(logger, memory="off", max_spans=2)
+    for name in ("a", "b", "c"):
+        with tracing.using(tracer), span(name):
+            pass
+    assert [sp.name for sp in tracer.spans] == ["b", "c"]
+
+    config = {"tracing": {"enabled": True, "memory": "off", "chrome_trace": None}}
+    service_tracer = build_tracer(config, logger)
+    with tracing.using(service_tracer), span("query"):
+        pass
+    assert len(service_tracer.spans) == 0
@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+from src.orchestrator.main import _report_lines
+from src.utils.writers import atomic_open, compressed_path, write_json_array, write_jsonl
+
+
+def test_atomic_open_keeps_previous_file_on_error(tmp_path):
+    path = tmp_path / "insights.json"
+    path.write_text("old", encoding="utf-8")
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(path) as f:
+            f.write("half written")
+            raise RuntimeError("boom")
+
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["insights.json"]  # temp file removed
+
+
+def test_gzip_and_jsonl_roundtrip(tmp_path):
+    items = [{"id": i, "text": f"line {i}\nnext"} for i in range(50)]
+
+    path = compressed_path(tmp_path / "creatives.json", "gzip")
+    assert path.name == "creatives.json.gz"
+    with atomic_open(path, "gzip") as f:
+        write_json_array(f, iter(items))
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert json.load(f) == items
+
+    with atomic_open(tmp_path / "creatives.jsonl") as f:
+        assert write_jsonl(f, iter(items)) == 50
+    lines = (tmp_path / "creatives.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == items
+
+
+def _creative(i):
+    return {
+        "campaign_name": f"C{i}",
+        "adset_name": "A",
+        "old_message": "old",
+        "new_headline": "h",
+        "new_primary_text": "p",
+        "new_cta": "Shop",
+        "rationale": "r",
+    }
+
+
+def test_report_caps_sections_and_leaves_rest_of_iterator():
+    hypotheses = [
+        {"id": f"H{i}", "statement": "s", "validation_result": "supported", "confidence_score": 0.5, "evidence": ""}
+        for i in range(5)
+    ]
+    creatives = iter([_creative(i) for i in range(7)])
+
+    report = "".join(
+        _report_lines("q", {"rows": 7}, iter(hypotheses), 5, creatives, 7, {}, limit=3, pages=["report.p2.md"])
+    )
+
+    assert "### H2:" in report and "### H3:" not in report
+    assert "_2 more evaluated hypotheses are listed in insights.json._" in report
+    assert "### C2 / A" in report and "### C3 / A" not in report
+    assert "_4 more recommendations: see report.p2.md._" in report
+    # the continuation pages pick up from here
+    assert next(creatives)["campaign_name"] == "C3"